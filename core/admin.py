@@ -5,12 +5,10 @@ from django.contrib import messages
 from django import forms
 from django.conf import settings
 from django.http import JsonResponse
-from django.urls import path
+from django.urls import path, reverse
 from unfold.admin import ModelAdmin, StackedInline
-from .models import Document, Page, Prompt, Schema, Settings
+from .models import Block, Document, Page, Prompt, Schema, Settings, ExtractionJob
 from .forms import PromptForm, SchemaForm
-import fitz  # PyMuPDF
-import base64
 import json
 import logging
 
@@ -18,11 +16,16 @@ logger = logging.getLogger(__name__)
 
 
 class PageInline(StackedInline):
-    """Inline admin for Pages within Document admin with side-by-side PDF and JSON preview"""
+    """Inline admin for Pages within Document admin with side-by-side PDF and JSON preview
+    
+    Each page is rendered as a lightweight stub. The carousel (page_carousel.js)
+    loads the image and JSON of the visible page from DocumentAdmin.page_preview_view,
+    so the change view does not load every page's text and JSON.
+    """
     model = Page
     extra = 0
-    readonly_fields = ['page_number', 'pdf_json_preview', 'created_at', 'updated_at']
-    fields = ['page_number', 'pdf_json_preview', 'text', 'image']
+    readonly_fields = ['page_number', 'pdf_json_preview']
+    fields = ['page_number', 'pdf_json_preview']
     can_delete = True
     show_change_link = True
     # Remove collapse class so pages are visible by default
@@ -35,87 +38,40 @@ class PageInline(StackedInline):
         js = ('admin/js/page_carousel.js',)
     
     def pdf_json_preview(self, obj):
-        """Display PDF page preview and JSON side-by-side"""
+        """Placeholder for the PDF page preview and JSON, filled in by the carousel"""
         if not obj or not obj.pk:
             return mark_safe('<p style="color: #999; padding: 20px;">Save the page first to see preview</p>')
         
-        try:
-            document = obj.document
-            if not document.file:
-                return mark_safe('<p style="color: #999; padding: 20px;">No document file available</p>')
-            
-            if document.file_type != 'pdf':
-                return mark_safe('<p style="color: #999; padding: 20px;">PDF preview only available for PDF documents</p>')
-            
-            # Check if file exists
-            import os
-            if not os.path.exists(document.file.path):
-                return mark_safe('<p style="color: red; padding: 20px;">PDF file not found on disk</p>')
-            
-            # Generate PDF page preview
-            pdf_preview_html = mark_safe('<p style="color: #999;">Loading preview...</p>')
-            try:
-                doc = fitz.open(document.file.path)
-                if obj.page_number <= len(doc):
-                    pdf_page = doc.load_page(obj.page_number - 1)  # page_number is 1-indexed
-                    pix = pdf_page.get_pixmap(matrix=fitz.Matrix(1.5, 1.5))  # 1.5x resolution
-                    img_bytes = pix.tobytes("png")
-                    pdf_preview_data = base64.b64encode(img_bytes).decode('utf-8')
-                    pdf_preview_html = format_html(
-                        '<img src="data:image/png;base64,{}" style="max-width: 100%; width: 100%; height: auto; border: 1px solid #ddd; border-radius: 4px; display: block;" alt="Page {}">',
-                        pdf_preview_data, obj.page_number
-                    )
-                else:
-                    pdf_preview_html = format_html('<p style="color: red;">Page {} does not exist (PDF has {} pages)</p>', obj.page_number, len(doc))
-                doc.close()
-            except Exception as e:
-                logger.error(f"Error generating PDF preview for page {obj.pk}: {str(e)}", exc_info=True)
-                pdf_preview_html = format_html('<p style="color: red;">Error loading PDF preview: {}</p>', str(e))
-            
-            # Generate JSON preview
-            json_preview_html = mark_safe('<p style="color: #999;">No JSON data available</p>')
-            if obj.json_data:
-                try:
-                    json_str = json.dumps(obj.json_data, indent=2, ensure_ascii=False)
-                    escaped_json = escape(json_str)
-                    json_preview_html = format_html(
-                        '<div style="background: #f5f5f5; border: 1px solid #ddd; border-radius: 4px; padding: 12px; max-height: 600px; overflow-y: auto; font-family: monospace; font-size: 12px; width: 100%; box-sizing: border-box;"><pre style="margin: 0; white-space: pre-wrap; word-wrap: break-word;">{}</pre></div>',
-                        escaped_json
-                    )
-                except Exception as e:
-                    json_preview_html = format_html('<p style="color: red;">Error formatting JSON: {}</p>', str(e))
-            
-            # Return side-by-side layout with carousel support - optimized for maximum space usage
-            # Use mark_safe since pdf_preview_html and json_preview_html are already SafeString objects
-            page_num = obj.page_number if obj else 0
-            return mark_safe(f'''
-                <div class="page-preview-carousel-item" data-page-number="{page_num}">
-                    <div style="display: grid; grid-template-columns: 1.2fr 1fr; gap: 25px; margin: 10px 0; padding: 20px; background: #fafafa; border: 1px solid #e0e0e0; border-radius: 8px; width: 100%; box-sizing: border-box;">
-                        <div style="display: flex; flex-direction: column; width: 100%;">
-                            <h4 style="margin: 0 0 12px 0; font-size: 15px; font-weight: 600; color: #333;">PDF Page Preview</h4>
-                            <div style="background: white; padding: 12px; border-radius: 4px; border: 1px solid #ddd; width: 100%; box-sizing: border-box;">
-                                {pdf_preview_html}
-                            </div>
+        preview_url = reverse('admin:core_document_page_preview', args=[obj.document_id, obj.page_number])
+        # Return side-by-side layout with carousel support - optimized for maximum space usage
+        return format_html(
+            '''
+            <div class="page-preview-carousel-item" data-page-number="{}" data-preview-url="{}">
+                <div style="display: grid; grid-template-columns: 1.2fr 1fr; gap: 25px; margin: 10px 0; padding: 20px; background: #fafafa; border: 1px solid #e0e0e0; border-radius: 8px; width: 100%; box-sizing: border-box;">
+                    <div style="display: flex; flex-direction: column; width: 100%;">
+                        <h4 style="margin: 0 0 12px 0; font-size: 15px; font-weight: 600; color: #333;">PDF Page Preview</h4>
+                        <div class="page-preview-image" style="background: white; padding: 12px; border-radius: 4px; border: 1px solid #ddd; width: 100%; box-sizing: border-box;">
+                            <p style="color: #999;">Loading preview...</p>
                         </div>
-                        <div style="display: flex; flex-direction: column; width: 100%;">
-                            <h4 style="margin: 0 0 12px 0; font-size: 15px; font-weight: 600; color: #333;">JSON Data</h4>
-                            <div style="width: 100%; box-sizing: border-box;">
-                                {json_preview_html}
-                            </div>
+                    </div>
+                    <div style="display: flex; flex-direction: column; width: 100%;">
+                        <h4 style="margin: 0 0 12px 0; font-size: 15px; font-weight: 600; color: #333;">JSON Data</h4>
+                        <div class="page-preview-json" style="width: 100%; box-sizing: border-box;">
+                            <p style="color: #999;">Loading JSON...</p>
                         </div>
                     </div>
                 </div>
-            ''')
-        except Exception as e:
-            logger.error(f"Error in pdf_json_preview for page {obj.pk if obj else 'None'}: {str(e)}", exc_info=True)
-            return format_html('<p style="color: red;">Error: {}</p>', str(e))
+            </div>
+            ''',
+            obj.page_number, preview_url
+        )
     
     pdf_json_preview.short_description = 'PDF & JSON Preview'
     
     def get_queryset(self, request):
-        """Override to ensure pages are ordered by page_number"""
+        """Only load what the stubs need, ordered by page_number"""
         qs = super().get_queryset(request)
-        return qs.order_by('page_number')
+        return qs.only('id', 'document_id', 'page_number').order_by('page_number')
 
 
 class DocumentAdminForm(forms.ModelForm):
@@ -169,6 +125,9 @@ class DocumentAdmin(ModelAdmin):
         }
         js = ('admin/js/page_carousel.js', 'admin/js/send_to_llm.js',)
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_page_stats()
+    
     def save_model(self, request, obj, form, change):
         """Override save to ensure file_type and ocr_engine are set before saving"""
         # Set file_type if not already set
@@ -190,7 +149,9 @@ class DocumentAdmin(ModelAdmin):
         
         # Show message about processing
         if obj.file:
-            if obj.pages.exists():
+            if getattr(settings, 'EXTRACTION_ASYNC', True):
+                messages.info(request, f'Document "{obj.title}" saved. Extraction runs in the background - see Extraction Jobs for progress.')
+            elif obj.pages.exists():
                 messages.success(request, f'Document "{obj.title}" saved and processed successfully. {obj.total_pages} pages extracted.')
             else:
                 messages.warning(request, f'Document "{obj.title}" saved, but processing may still be in progress or failed. Check pages.')
@@ -210,7 +171,7 @@ class DocumentAdmin(ModelAdmin):
     
     def reprocess_documents(self, request, queryset):
         """Admin action to reprocess selected documents"""
-        from .views import process_document_file
+        from .jobs import schedule_extraction
         
         processed = 0
         failed = 0
@@ -219,17 +180,18 @@ class DocumentAdmin(ModelAdmin):
             if not document.file:
                 continue
             try:
-                # Delete existing pages
-                document.pages.all().delete()
-                # Reprocess
-                process_document_file(document)
+                # Existing pages are deleted before extraction reruns
+                schedule_extraction(document, reprocess=True)
                 processed += 1
             except Exception as e:
                 failed += 1
                 self.message_user(request, f'Error processing "{document.title}": {str(e)}', level=messages.ERROR)
         
         if processed > 0:
-            self.message_user(request, f'Successfully reprocessed {processed} document(s).', level=messages.SUCCESS)
+            if getattr(settings, 'EXTRACTION_ASYNC', True):
+                self.message_user(request, f'Queued {processed} document(s) for reprocessing.', level=messages.SUCCESS)
+            else:
+                self.message_user(request, f'Successfully reprocessed {processed} document(s).', level=messages.SUCCESS)
         if failed > 0:
             self.message_user(request, f'Failed to process {failed} document(s).', level=messages.WARNING)
     
@@ -249,9 +211,37 @@ class DocumentAdmin(ModelAdmin):
                 self.admin_site.admin_view(self.llm_options_view),
                 name='core_document_llm_options',
             ),
+            path(
+                '<path:object_id>/pages/<int:page_number>/preview/',
+                self.admin_site.admin_view(self.page_preview_view),
+                name='core_document_page_preview',
+            ),
         ]
         return custom_urls + urls
     
+    def page_preview_view(self, request, object_id, page_number):
+        """Return the preview image URL and JSON data of one page for the page carousel"""
+        from django.shortcuts import get_object_or_404
+        
+        document = get_object_or_404(Document.objects.only('id', 'file', 'file_type'), pk=object_id)
+        page = get_object_or_404(
+            Page.objects.defer('text', 'image', 'thumbnails'),
+            document_id=document.pk,
+            page_number=page_number,
+        )
+        
+        thumbnail_url = None
+        if document.file and document.file_type in ('pdf', 'image'):
+            thumbnail_url = page.thumbnail_url('large')
+        
+        return JsonResponse({
+            'success': True,
+            'page_number': page.page_number,
+            'thumbnail_url': thumbnail_url,
+            'json_data': page.json_data or None,
+            'change_url': reverse('admin:core_page_change', args=[page.pk]),
+        })
+    
     def llm_options_view(self, request, object_id):
         """Get available prompts, schemas, and pages for LLM"""
         from django.shortcuts import get_object_or_404
@@ -645,6 +635,45 @@ class PageAdmin(ModelAdmin):
     json_preview.short_description = 'JSON Preview'
 
 
+@admin.register(ExtractionJob)
+class ExtractionJobAdmin(ModelAdmin):
+    """Admin interface for ExtractionJob model"""
+    icon = "pending_actions"
+    list_display = ['document', 'status', 'reprocess', 'attempts', 'worker_id', 'created_at', 'started_at', 'finished_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['document__title', 'worker_id', 'error']
+    readonly_fields = ['document', 'attempts', 'worker_id', 'error', 'created_at', 'updated_at', 'started_at', 'heartbeat_at', 'finished_at']
+    list_select_related = ['document']
+    actions = ['retry_jobs']
+    
+    def retry_jobs(self, request, queryset):
+        """Put failed jobs back in the queue"""
+        count = queryset.filter(status=ExtractionJob.STATUS_FAILED).update(
+            status=ExtractionJob.STATUS_PENDING,
+            attempts=0,
+            reprocess=True,
+            finished_at=None,
+        )
+        self.message_user(request, f'{count} job(s) queued for retry.', messages.SUCCESS)
+    retry_jobs.short_description = "Retry selected failed jobs"
+
+
+@admin.register(Block)
+class BlockAdmin(ModelAdmin):
+    """Admin interface for Block model (read only - blocks are written by extraction)"""
+    icon = "view_quilt"
+    list_display = ['document', 'page', 'ordinal', 'kind', 'type', 'engine', 'confidence']
+    list_filter = ['kind', 'engine']
+    search_fields = ['text']
+    list_select_related = ['document', 'page__document']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Prompt)
 class PromptAdmin(ModelAdmin):
     """Admin interface for Prompt model"""
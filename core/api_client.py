@@ -0,0 +1,175 @@
+"""
+Pooled HTTP client for remote OCR services (DeepSeek OCR API, OLMOCR API)
+
+All requests go through one requests.Session, so connections to each service
+are kept alive and reused. The client also:
+
+- retries connection errors, timeouts and 429/5xx answers with jittered
+  exponential backoff (honouring Retry-After)
+- allows at most REMOTE_OCR_MAX_CONNECTIONS_PER_HOST requests in flight per
+  host from this process
+- remembers which of several candidate endpoints a service answered on, so
+  later pages don't probe the others again
+
+map_concurrently sends the pages of a document REMOTE_OCR_CONCURRENCY at a
+time instead of one by one.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.db import connections
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_BACKOFF = 30
+
+
+def remote_ocr_concurrency():
+    """Return how many pages of a document are sent to a remote OCR service at once"""
+    return max(1, getattr(settings, 'REMOTE_OCR_CONCURRENCY', 8))
+
+
+class ApiClient:
+    """Keep-alive HTTP client with retries and per-host concurrency limits
+
+    Limits are read from settings when the session is first used unless given
+    explicitly.
+    """
+
+    def __init__(self, max_retries=None, backoff=None, max_connections_per_host=None, timeout=None):
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._max_connections_per_host = max_connections_per_host
+        self._timeout = timeout
+        self._session = None
+        self._host_slots = {}
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    @property
+    def max_retries(self):
+        if self._max_retries is not None:
+            return self._max_retries
+        return getattr(settings, 'REMOTE_OCR_MAX_RETRIES', 3)
+
+    @property
+    def backoff(self):
+        if self._backoff is not None:
+            return self._backoff
+        return getattr(settings, 'REMOTE_OCR_BACKOFF', 0.5)
+
+    @property
+    def max_connections_per_host(self):
+        if self._max_connections_per_host is not None:
+            return self._max_connections_per_host
+        return max(1, getattr(settings, 'REMOTE_OCR_MAX_CONNECTIONS_PER_HOST', 8))
+
+    @property
+    def timeout(self):
+        if self._timeout is not None:
+            return self._timeout
+        return (
+            getattr(settings, 'REMOTE_OCR_CONNECT_TIMEOUT', 5),
+            getattr(settings, 'REMOTE_OCR_READ_TIMEOUT', 120),
+        )
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                # Retries are handled in post() so they can back off with jitter
+                adapter = HTTPAdapter(pool_connections=16, pool_maxsize=self.max_connections_per_host, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.max_connections_per_host)
+            return self._host_slots[host]
+
+    def _retry_delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(MAX_BACKOFF, int(retry_after))
+        return min(MAX_BACKOFF, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+    def post(self, url, **kwargs):
+        """POST to url, retrying failed attempts. Returns the last response.
+
+        Raises requests.RequestException if the service could not be reached
+        after every retry. Request bodies must be bytes or strings (not open
+        files) so they can be sent again.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        slot = self._host_slot(url)
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                with slot:
+                    response = self.session.post(url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                reason = type(e).__name__
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                reason = f"HTTP {response.status_code}"
+                response.close()
+            delay = self._retry_delay(attempt, response)
+            logger.warning(f"POST {url} failed ({reason}), retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})")
+            time.sleep(delay)
+
+    def post_first(self, endpoints, **kwargs):
+        """POST to the first of several candidate endpoints that answers 200
+
+        The endpoint that answered is tried first next time. Returns the
+        response, or None if every endpoint answered with an error. Raises
+        requests.RequestException if the service can't be reached.
+        """
+        key = tuple(endpoints)
+        known = self._endpoints.get(key)
+        if known:
+            endpoints = [known] + [endpoint for endpoint in endpoints if endpoint != known]
+        for endpoint in endpoints:
+            response = self.post(endpoint, **kwargs)
+            if response.status_code == 200:
+                self._endpoints[key] = endpoint
+                return response
+        return None
+
+
+# Shared by every remote OCR call in this process
+api_client = ApiClient()
+
+
+def map_concurrently(func, items, workers=None):
+    """Return [func(item) for item in items], running up to workers calls at once"""
+    items = list(items)
+    workers = min(workers or remote_ocr_concurrency(), len(items))
+    if workers <= 1:
+        return [func(item) for item in items]
+
+    def call(item):
+        try:
+            return func(item)
+        finally:
+            # Database connections are per thread; don't leave them open
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='remote-ocr') as executor:
+        return list(executor.map(call, items))
@@ -0,0 +1,170 @@
+"""
+Block index
+
+Layout blocks live in Page.json_data, so finding "all tables from engine X"
+meant loading and filtering every page's JSON in Python. When
+BLOCK_INDEX_ENABLED is set, each written page's blocks are also copied into
+the Block table (one row per block with its type, text, rectangle,
+confidence and engine), where such queries run in the database on indexed
+columns.
+
+Rectangles are stored as x0, y0, x1, y1 in page coordinates. Most engines
+write bboxes as [x, y, width, height]; MinerU's middle JSON uses [x0, y0, x1,
+y1]. The format is read from the page JSON rather than the document's engine,
+since MinerU documents can fall back to the PyMuPDF page loop. When
+the page size is known they are also stored normalized to the page
+(nx0, ny0, nx1, ny1 in 0..1, origin top left) for core.spatial.
+"""
+import logging
+
+from django.conf import settings
+
+from .layout import block_categories, page_blocks
+
+logger = logging.getLogger(__name__)
+
+# Engines whose block bboxes are [x0, y0, x1, y1] rather than [x, y, width, height],
+# for page JSON that doesn't identify its producer
+CORNER_BBOX_ENGINES = {'mineru'}
+
+# Block.kind for blocks that are none of the layout categories
+OTHER_KIND = 'other'
+
+
+def blocks_enabled():
+    return getattr(settings, 'BLOCK_INDEX_ENABLED', True)
+
+
+def block_kind(block):
+    """Return the normalized kind of a block: table, formula, heading, paragraph or other"""
+    for category in block_categories(block):
+        if category != 'bbox':
+            return category
+    return OTHER_KIND
+
+
+def corner_bboxes(json_data, engine=''):
+    """Return True if a page's block bboxes are [x0, y0, x1, y1] rather than [x, y, width, height]"""
+    if isinstance(json_data, dict):
+        if 'extraction_method' in json_data:
+            # extract_pdf_page and the page image engines, including MinerU's fallback
+            return False
+        if 'page_size' in json_data or 'para_blocks' in json_data:
+            # MinerU middle JSON
+            return True
+    return engine in CORNER_BBOX_ENGINES
+
+
+def block_rect(block, corners=False):
+    """Return a block's (x0, y0, x1, y1) rectangle, or None if it has no usable bbox"""
+    bbox = block.get('bbox') or block.get('bounding_box')
+    if not isinstance(bbox, (list, tuple)) or len(bbox) != 4:
+        return None
+    try:
+        x0, y0, a, b = (float(value) for value in bbox)
+    except (TypeError, ValueError):
+        return None
+    if corners:
+        return x0, y0, a, b
+    return x0, y0, x0 + a, y0 + b
+
+
+def page_size(json_data):
+    """Return (width, height) of a page from its JSON data, or None if unknown"""
+    if not isinstance(json_data, dict):
+        return None
+    size = json_data.get('page_size')  # MinerU
+    if isinstance(size, (list, tuple)) and len(size) == 2:
+        width, height = size
+    else:
+        width, height = json_data.get('page_width'), json_data.get('page_height')
+    try:
+        width, height = float(width), float(height)
+    except (TypeError, ValueError):
+        return None
+    if width <= 0 or height <= 0:
+        return None
+    return width, height
+
+
+def normalize_rect(rect, size):
+    """Scale a rectangle to 0..1 page coordinates, ordered and clamped"""
+    width, height = size
+    x0, y0, x1, y1 = rect
+    xs = sorted(min(1.0, max(0.0, x / width)) for x in (x0, x1))
+    ys = sorted(min(1.0, max(0.0, y / height)) for y in (y0, y1))
+    return xs[0], ys[0], xs[1], ys[1]
+
+
+def _confidence(block):
+    value = block.get('confidence', block.get('score'))
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def page_engine(page, default_engine=''):
+    """Return the engine that produced a page's JSON data"""
+    json_data = page.json_data if isinstance(page.json_data, dict) else {}
+    return json_data.get('ocr_engine') or default_engine or ''
+
+
+def build_blocks(page, page_id, document_id, default_engine=''):
+    """Return unsaved Block rows for the layout blocks of a page"""
+    from .models import Block
+
+    engine = page_engine(page, default_engine)
+    size = page_size(page.json_data)
+    corners = corner_bboxes(page.json_data, engine)
+    rows = []
+    for ordinal, block in enumerate(page_blocks(page.json_data, page.page_number)):
+        if not isinstance(block, dict):
+            continue
+        rect = block_rect(block, corners)
+        normalized = normalize_rect(rect, size) if rect and size else (None, None, None, None)
+        rect = rect or (None, None, None, None)
+        rows.append(Block(
+            page_id=page_id,
+            document_id=document_id,
+            ordinal=ordinal,
+            type=(block.get('type') or '')[:50],
+            kind=block_kind(block),
+            text=str(block.get('text') or ''),
+            x0=rect[0],
+            y0=rect[1],
+            x1=rect[2],
+            y1=rect[3],
+            nx0=normalized[0],
+            ny0=normalized[1],
+            nx1=normalized[2],
+            ny1=normalized[3],
+            confidence=_confidence(block),
+            engine=engine[:50],
+        ))
+    return rows
+
+
+def index_page_blocks(document, pages):
+    """Replace the Block rows of pages of a document with their current layout blocks
+
+    pages may be unsaved copies (as buffered by PageWriter); the rows they were
+    written to are looked up by page number. Returns the number of blocks written.
+    """
+    from .models import Block, Page
+
+    if not blocks_enabled() or not pages:
+        return 0
+
+    page_ids = dict(
+        Page.objects.filter(document=document, page_number__in=[page.page_number for page in pages])
+        .values_list('page_number', 'pk')
+    )
+    rows = []
+    for page in pages:
+        if page.page_number in page_ids:
+            rows.extend(build_blocks(page, page_ids[page.page_number], document.pk, document.ocr_engine))
+
+    Block.objects.filter(page_id__in=page_ids.values()).delete()
+    Block.objects.bulk_create(rows, batch_size=getattr(settings, 'BLOCK_WRITE_BATCH_SIZE', 1000))
+    return len(rows)
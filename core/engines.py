@@ -0,0 +1,146 @@
+"""
+OCR engine registry
+
+Each engine declares what it can do and how to call it. process_document_file
+and upload_file dispatch through the registry instead of if/elif chains, and no
+engine loads its model until one of its functions is first called.
+
+Engine functions are looked up on core.ocr_utils at call time, so models stay
+unloaded until used (and tests can patch them).
+"""
+from . import ocr_utils
+
+
+class Engine:
+    """An OCR / text extraction engine and its capabilities
+
+    Attributes:
+        name: Value stored in Document.ocr_engine
+        label: Human readable name for log messages
+        pdf: Can extract PDF files
+        image: Can extract image files
+        whole_document: Extracts the whole PDF in one call; the page loop reads its
+            per-page results from a WholeDocumentResults instead of OCRing page images
+        batch: Can recognise several page images in one call
+        device: 'cpu', 'gpu' (uses CUDA when available) or 'remote' (HTTP service)
+    """
+
+    def __init__(self, name, label, available, extract_pdf_pages=None, ocr_image=None,
+                 extract_image=None, pdf=True, image=True, whole_document=False,
+                 batch=False, device='cpu'):
+        self.name = name
+        self.label = label
+        self._available = available
+        # file_path -> iterable of {'page_number', 'text', 'json_data'}; an empty
+        # result falls back to the traditional page loop
+        self.extract_pdf_pages = extract_pdf_pages
+        # PIL image -> (text, blocks); used for PDF pages without a text layer
+        self.ocr_image = ocr_image
+        # image file path -> text
+        self.extract_image = extract_image
+        self.pdf = pdf
+        self.image = image and extract_image is not None
+        self.whole_document = whole_document
+        self.batch = batch
+        self.device = device
+
+    def __repr__(self):
+        return f"<Engine {self.name}>"
+
+    def is_available(self):
+        """Return True if the engine's dependencies are installed (does not load models)"""
+        try:
+            return bool(self._available())
+        except Exception:
+            return False
+
+
+ENGINES = {}
+
+
+def register_engine(engine):
+    """Add an engine to the registry, replacing any engine with the same name"""
+    ENGINES[engine.name] = engine
+    return engine
+
+
+def get_engine(name):
+    """Return the registered engine for a name (case-insensitive), or None"""
+    return ENGINES.get((name or '').lower())
+
+
+register_engine(Engine(
+    'mineru', 'MinerU',
+    available=lambda: ocr_utils.mineru_available,
+    extract_pdf_pages=lambda path: ocr_utils.extract_pages_with_mineru_json(path),
+    extract_image=lambda path: ocr_utils.extract_text_with_mineru(path, file_type='image'),
+    whole_document=True,
+    device='gpu',
+))
+register_engine(Engine(
+    'pymupdf', 'PyMuPDF',
+    available=lambda: True,
+    extract_pdf_pages=lambda path: ocr_utils.extract_pages_with_pymupdf(path),
+    image=False,
+))
+register_engine(Engine(
+    'pdfplumber', 'pdfplumber',
+    available=lambda: ocr_utils.pdfplumber_available,
+    extract_pdf_pages=lambda path: ocr_utils.extract_pages_with_pdfplumber(path),
+    image=False,
+    whole_document=True,
+))
+register_engine(Engine(
+    'tesseract', 'Tesseract',
+    available=lambda: ocr_utils.tesseract_available(),
+    ocr_image=lambda img: ocr_utils.ocr_image_with_tesseract(img),
+    extract_image=lambda path: ocr_utils.extract_text_with_tesseract(path),
+))
+register_engine(Engine(
+    'deepseek', 'DeepSeek OCR',
+    available=lambda: True,
+    extract_pdf_pages=lambda path: ocr_utils.extract_pages_with_deepseek(path),
+    ocr_image=lambda img: (ocr_utils.extract_text_with_deepseek_from_image(img), []),
+    extract_image=lambda path: ocr_utils.extract_text_with_deepseek(path),
+    device='remote',
+))
+register_engine(Engine(
+    'paddleocr', 'PaddleOCR',
+    available=lambda: ocr_utils.paddleocr_available,
+    extract_pdf_pages=lambda path: ocr_utils.extract_pages_with_paddleocr_layout(path),
+    ocr_image=lambda img: ocr_utils.ocr_image_with_paddleocr(img),
+    extract_image=lambda path: ocr_utils.extract_text_with_paddleocr(path, file_type='image'),
+    device='gpu',
+))
+register_engine(Engine(
+    'trocr', 'TrOCR',
+    available=lambda: ocr_utils.trocr_available,
+    ocr_image=lambda img: ocr_utils.ocr_image_with_trocr(img),
+    extract_image=lambda path: ocr_utils.extract_text_with_trocr(path, file_type='image'),
+    batch=True,
+))
+register_engine(Engine(
+    'donut', 'Donut',
+    available=lambda: ocr_utils.donut_available,
+    extract_pdf_pages=lambda path: ocr_utils.extract_pages_with_donut(path),
+    ocr_image=lambda img: ocr_utils.ocr_image_with_donut(img),
+    extract_image=lambda path: ocr_utils.extract_text_with_donut(path, file_type='image'),
+    batch=True,
+))
+register_engine(Engine(
+    'olmocr', 'OLMOCR',
+    available=lambda: ocr_utils.olmocr_available,
+    extract_pdf_pages=lambda path: ocr_utils.extract_pages_with_olmocr(path),
+    ocr_image=lambda img: (ocr_utils.extract_text_with_olmocr_from_image(img), []),
+    extract_image=lambda path: ocr_utils.extract_text_with_olmocr(path, file_type='image'),
+    device='gpu',
+))
+register_engine(Engine(
+    'lightonocr', 'LightOnOCR',
+    available=lambda: ocr_utils.lightonocr_available,
+    extract_pdf_pages=lambda path: ocr_utils.extract_pages_with_lightonocr(path),
+    ocr_image=lambda img: (ocr_utils.extract_text_with_lightonocr_from_image(img), []),
+    extract_image=lambda path: ocr_utils.extract_text_with_lightonocr(path, file_type='image'),
+    batch=True,
+    device='gpu',
+))
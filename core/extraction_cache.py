@@ -0,0 +1,377 @@
+"""
+Content-addressed extraction cache
+
+Extraction results are stored on disk, keyed by the SHA-256 of the file bytes,
+the OCR engine and the settings that change that engine's output. Re-uploading
+the same file or reprocessing an unchanged document restores its pages from
+the cache instead of running OCR again.
+
+The cache is bounded by EXTRACTION_CACHE_MAX_BYTES; the least recently used
+entries are evicted first.
+
+Page images are memoized separately (memoize_page_ocr, memoize_page_ocr_batch):
+identical rendered pages anywhere in the corpus, such as cover sheets and
+boilerplate disclosures, reuse the OCR output of the first one.
+"""
+import functools
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Bump when the structure of extracted pages changes so stale entries are ignored
+CACHE_VERSION = 1
+
+# Settings that change the output of each engine and are therefore part of the key
+ENGINE_CONFIG_SETTINGS = {
+    'tesseract': ['TESSERACT_CMD', 'TESSERACT_LANG'],
+    'deepseek': ['DEEPSEEK_OCR_USE_OLLAMA', 'DEEPSEEK_OCR_USE_API', 'DEEPSEEK_OCR_API_URL', 'OLLAMA_MODEL'],
+    'olmocr': ['OLMOCR_USE_API', 'OLMOCR_API_URL', 'OLMOCR_MODEL_ID', 'OLMOCR_TARGET_LONGEST_DIM'],
+    'trocr': ['TROCR_MODE'],
+    'donut': ['DONUT_MAX_LENGTH'],
+    'lightonocr': [
+        'LIGHTONOCR_MODEL_ID',
+        'LIGHTONOCR_MAX_NEW_TOKENS',
+        'LIGHTONOCR_TARGET_LONGEST_DIM',
+        'LIGHTONOCR_PROMPT',
+    ],
+}
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def engine_config(engine):
+    """Return the settings that affect an engine's output"""
+    return {
+        name: str(getattr(settings, name, None))
+        for name in ENGINE_CONFIG_SETTINGS.get(engine, [])
+    }
+
+
+def extraction_cache_key(file_path, engine, file_hash=None):
+    """Build the cache key for extracting a file with an engine"""
+    engine = (engine or '').lower()
+    key_data = {
+        'version': CACHE_VERSION,
+        'file': file_hash or file_sha256(file_path),
+        'engine': engine,
+        'config': engine_config(engine),
+    }
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class DiskCache:
+    """JSON values stored as files on disk with size-bounded LRU eviction
+
+    A file's modification time records when it was last used, so hits are
+    touched and the oldest files are evicted first once max_bytes is exceeded.
+    Eviction goes down to low_water of max_bytes, so a full cache is rescanned
+    once per batch of writes rather than on every write.
+    """
+
+    suffix = '.json'
+    low_water = 0.9
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        # Running estimate of the cache size so writes don't rescan the directory;
+        # other processes also write here, so eviction always rescans
+        self._approx_bytes = None
+
+    def _path(self, key):
+        return self.directory / key[:2] / f"{key}{self.suffix}"
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable cache entry {path}: {str(e)}")
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value):
+        """Store a JSON-serialisable value and evict old entries if over the size limit"""
+        self._write(key, lambda f: json.dump(value, f, ensure_ascii=False))
+
+    def _write(self, key, write, binary=False):
+        """Write an entry with write(file) and evict old entries if over the size limit"""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file and rename so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb' if binary else 'w', encoding=None if binary else 'utf-8') as f:
+                write(f)
+                written = f.tell()
+            os.replace(tmp_path, path)
+        except Exception:
+            self._remove(tmp_path)
+            raise
+        
+        if self._approx_bytes is None:
+            self._approx_bytes = self.size()[1]
+        else:
+            self._approx_bytes += written
+        if self.max_bytes and self._approx_bytes > self.max_bytes:
+            self.evict()
+
+    def delete(self, key):
+        self._remove(self._path(key))
+
+    def clear(self):
+        """Remove every entry. Returns the number removed."""
+        removed = 0
+        for path, _, _ in self._entries():
+            self._remove(path)
+            removed += 1
+        self._approx_bytes = 0
+        return removed
+
+    def size(self):
+        """Return (number of entries, total bytes)"""
+        entries = self._entries()
+        return len(entries), sum(size for _, size, _ in entries)
+
+    def evict(self):
+        """Delete least recently used entries once over max_bytes, down to low_water of it"""
+        if not self.max_bytes:
+            return 0
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        if total > self.max_bytes:
+            target = int(self.max_bytes * self.low_water)
+            for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+                if total <= target:
+                    break
+                self._remove(path)
+                total -= size
+                evicted += 1
+            logger.info(f"Evicted {evicted} entries from {self.directory}")
+        self._approx_bytes = total
+        return evicted
+
+    def _entries(self):
+        entries = []
+        if not self.directory.exists():
+            return entries
+        for path in self.directory.glob(f'*/*{self.suffix}'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_disk_caches = {}
+
+
+def _disk_cache(directory, max_bytes, cache_class=DiskCache):
+    """Return a shared cache for a directory so its size estimate is kept between calls"""
+    key = (cache_class, str(directory), max_bytes)
+    if key not in _disk_caches:
+        _disk_caches[key] = cache_class(directory, max_bytes)
+    return _disk_caches[key]
+
+
+def get_extraction_cache():
+    """Return the configured extraction cache, or None if caching is disabled"""
+    if not getattr(settings, 'EXTRACTION_CACHE_ENABLED', True):
+        return None
+    directory = getattr(settings, 'EXTRACTION_CACHE_DIR', None)
+    if not directory:
+        return None
+    return _disk_cache(directory, getattr(settings, 'EXTRACTION_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+
+
+def load_cached_pages(cache_key):
+    """Return the cached page dictionaries for a key, or None on a miss"""
+    cache = get_extraction_cache()
+    if cache is None:
+        return None
+    try:
+        entry = cache.get(cache_key)
+    except OSError as e:
+        logger.warning(f"Extraction cache lookup failed: {str(e)}")
+        return None
+    if not entry:
+        return None
+    return entry.get('pages')
+
+
+def store_cached_pages(cache_key, pages):
+    """Cache extracted page dictionaries (page_number, text, json_data)
+
+    Results without any usable text are not cached, so failed or empty
+    extractions are retried next time.
+    """
+    cache = get_extraction_cache()
+    if cache is None or not pages:
+        return False
+    texts = [(page.get('text') or '').strip() for page in pages]
+    if not any(text and not text.startswith('Error') for text in texts):
+        return False
+    try:
+        cache.set(cache_key, {'pages': pages})
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"Could not store extraction cache entry: {str(e)}")
+        return False
+    return True
+
+
+# Per-engine page OCR memo hits and misses for this process
+_page_ocr_stats = {}
+
+
+def get_page_ocr_cache():
+    """Return the page image OCR memo store, or None if it is disabled"""
+    if not getattr(settings, 'PAGE_OCR_CACHE_ENABLED', True):
+        return None
+    directory = getattr(settings, 'PAGE_OCR_CACHE_DIR', None)
+    if not directory:
+        return None
+    return _disk_cache(directory, getattr(settings, 'PAGE_OCR_CACHE_MAX_BYTES', 1024 ** 3))
+
+
+def page_image_cache_key(img, engine, call_args=()):
+    """Build the memo key for OCRing a rendered page image with an engine"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        'version': CACHE_VERSION,
+        'engine': engine,
+        'config': engine_config(engine),
+        'args': [repr(arg) for arg in call_args],
+        'mode': img.mode,
+        'size': list(img.size),
+    }, sort_keys=True).encode('utf-8'))
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+
+def _record_page_ocr(engine, outcome):
+    stats = _page_ocr_stats.setdefault(engine, {'hits': 0, 'misses': 0})
+    stats[outcome] += 1
+
+
+def page_ocr_cache_stats():
+    """Return {engine: {'hits': n, 'misses': n, 'hit_rate': float}} for this process"""
+    return {
+        engine: dict(stats, hit_rate=stats['hits'] / ((stats['hits'] + stats['misses']) or 1))
+        for engine, stats in _page_ocr_stats.items()
+    }
+
+
+def reset_page_ocr_cache_stats():
+    _page_ocr_stats.clear()
+
+
+def memoize_page_ocr(engine):
+    """Decorator memoizing an OCR function of a PIL image by the image's pixel hash
+
+    The wrapped function must take the image as its first argument and return
+    text. Empty and "Error..." results are not memoized.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(img, *args, **kwargs):
+            cache = get_page_ocr_cache()
+            if cache is None:
+                return func(img, *args, **kwargs)
+            
+            try:
+                key = page_image_cache_key(img, engine, args + tuple(sorted(kwargs.items())))
+                entry = cache.get(key)
+            except Exception as e:
+                logger.warning(f"Page OCR memo lookup failed for {engine}: {str(e)}")
+                return func(img, *args, **kwargs)
+            
+            if entry is not None:
+                _record_page_ocr(engine, 'hits')
+                return entry['text']
+            
+            _record_page_ocr(engine, 'misses')
+            text = func(img, *args, **kwargs)
+            if isinstance(text, str) and text.strip() and not text.startswith('Error'):
+                try:
+                    cache.set(key, {'engine': engine, 'text': text})
+                except (OSError, TypeError, ValueError) as e:
+                    logger.warning(f"Could not store page OCR memo for {engine}: {str(e)}")
+            return text
+        return wrapper
+    return decorator
+
+
+def memoize_page_ocr_batch(engine):
+    """Decorator memoizing a batched OCR function of a list of PIL images
+
+    Shares entries with memoize_page_ocr(engine), so pages OCRed one at a time
+    and in batches hit the same memo. Only the images that miss are passed to
+    the wrapped function, which must return one text per image.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(images, *args, **kwargs):
+            cache = get_page_ocr_cache()
+            if cache is None or not images:
+                return func(images, *args, **kwargs)
+            
+            texts = [None] * len(images)
+            keys = [None] * len(images)
+            for index, img in enumerate(images):
+                try:
+                    keys[index] = page_image_cache_key(img, engine)
+                    entry = cache.get(keys[index])
+                except Exception as e:
+                    logger.warning(f"Page OCR memo lookup failed for {engine}: {str(e)}")
+                    continue
+                if entry is not None:
+                    _record_page_ocr(engine, 'hits')
+                    texts[index] = entry['text']
+            
+            missing = [index for index, text in enumerate(texts) if text is None]
+            for _ in missing:
+                _record_page_ocr(engine, 'misses')
+            if missing:
+                results = func([images[index] for index in missing], *args, **kwargs)
+                for index, text in zip(missing, results):
+                    texts[index] = text
+                    if keys[index] and isinstance(text, str) and text.strip() and not text.startswith('Error'):
+                        try:
+                            cache.set(keys[index], {'engine': engine, 'text': text})
+                        except (OSError, TypeError, ValueError) as e:
+                            logger.warning(f"Could not store page OCR memo for {engine}: {str(e)}")
+            return texts
+        return wrapper
+    return decorator
@@ -0,0 +1,330 @@
+"""
+Background extraction job queue
+
+Saving a document queues an ExtractionJob instead of running OCR inside the
+request. Jobs are claimed and processed by `python manage.py run_extraction_workers`,
+which can be scaled independently of the web tier.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .model_manager import model_manager
+from .models import ExtractionJob
+
+logger = logging.getLogger(__name__)
+
+# Job being run by this worker thread, for heartbeat()
+_current = threading.local()
+
+
+def default_worker_id():
+    """Return an identifier for the current worker process"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_extraction(document, reprocess=False):
+    """Queue a document for extraction and return the job
+
+    An active job for the same document is reused unless pages have to be
+    re-extracted while another worker is already running it.
+    """
+    pending_job = ExtractionJob.objects.filter(
+        document=document,
+        status=ExtractionJob.STATUS_PENDING
+    ).first()
+    if pending_job:
+        if reprocess and not pending_job.reprocess:
+            pending_job.reprocess = True
+            pending_job.save(update_fields=['reprocess', 'updated_at'])
+        return pending_job
+
+    if not reprocess:
+        running_job = ExtractionJob.objects.filter(
+            document=document,
+            status=ExtractionJob.STATUS_RUNNING
+        ).first()
+        if running_job:
+            return running_job
+
+    job = ExtractionJob.objects.create(
+        document=document,
+        reprocess=reprocess,
+        max_attempts=getattr(settings, 'EXTRACTION_JOB_MAX_ATTEMPTS', 3),
+    )
+    logger.info(f"Queued extraction job {job.pk} for document {document.pk} (reprocess={reprocess})")
+    return job
+
+
+def schedule_extraction(document, reprocess=False):
+    """Queue extraction once the current transaction commits
+
+    When EXTRACTION_ASYNC is disabled the document is processed inline instead,
+    which is convenient for development without a running worker. Reprocessing
+    always re-runs extraction rather than restoring pages from the extraction cache.
+    """
+    if getattr(settings, 'EXTRACTION_ASYNC', True):
+        transaction.on_commit(lambda: enqueue_extraction(document, reprocess=reprocess))
+        return
+
+    from .views import process_document_file
+
+    if reprocess:
+        # page_count/text_length are recounted when the delete commits (core.signals)
+        with transaction.atomic():
+            document.pages.all().delete()
+    process_document_file(document, use_cache=not reprocess)
+
+
+def _claim_job(job_id, worker_id):
+    """Claim a pending job by primary key. Returns the job, or None if another worker got it first."""
+    now = timezone.now()
+    claimed = ExtractionJob.objects.filter(
+        pk=job_id,
+        status=ExtractionJob.STATUS_PENDING
+    ).update(
+        status=ExtractionJob.STATUS_RUNNING,
+        worker_id=worker_id,
+        attempts=F('attempts') + 1,
+        started_at=now,
+        heartbeat_at=now,
+        finished_at=None,
+        updated_at=now,
+    )
+    if claimed:
+        return ExtractionJob.objects.select_related('document').get(pk=job_id)
+    return None
+
+
+def claim_next_job(worker_id):
+    """Atomically claim the oldest pending job, or return None if the queue is empty
+
+    The claim is a conditional UPDATE, so concurrent workers never run the same
+    job, on SQLite as well as on databases with row locking.
+    """
+    while True:
+        candidate_id = ExtractionJob.objects.filter(
+            status=ExtractionJob.STATUS_PENDING
+        ).order_by('created_at', 'pk').values_list('pk', flat=True).first()
+        if candidate_id is None:
+            return None
+
+        job = _claim_job(candidate_id, worker_id)
+        if job is not None:
+            return job
+        # Another worker claimed it first - try the next one
+
+
+def claim_mineru_batch(worker_id, job, max_jobs=None):
+    """Claim more pending MinerU jobs to parse in the same do_parse call as job
+
+    Returns job and the extra claimed jobs. The batch stays within
+    MINERU_BATCH_MAX_PAGES pages and MINERU_BATCH_MAX_DOCUMENTS documents (and
+    max_jobs jobs). Jobs for other engines are returned alone.
+    """
+    from .mineru_batch import fits_in_batch, is_mineru_batchable, mineru_batch_limits, pdf_page_count
+
+    max_pages, max_documents = mineru_batch_limits()
+    if max_jobs is not None:
+        max_documents = min(max_documents, max_jobs)
+    if not max_pages or max_documents < 2 or not is_mineru_batchable(job.document):
+        return [job]
+
+    jobs = [job]
+    batch_pages = pdf_page_count(job.document)
+    if not fits_in_batch(batch_pages):
+        return [job]
+    candidates = ExtractionJob.objects.filter(
+        Q(document__ocr_engine__iexact='mineru') | Q(document__ocr_engine=''),
+        status=ExtractionJob.STATUS_PENDING,
+    ).select_related('document').order_by('created_at', 'pk')[:max_documents * 4]
+    for candidate in candidates:
+        if len(jobs) >= max_documents:
+            break
+        if any(candidate.document_id == claimed.document_id for claimed in jobs):
+            continue
+        if not is_mineru_batchable(candidate.document):
+            continue
+        page_count = pdf_page_count(candidate.document)
+        if not fits_in_batch(page_count) or batch_pages + page_count > max_pages:
+            continue
+        claimed = _claim_job(candidate.pk, worker_id)
+        if claimed is not None:
+            jobs.append(claimed)
+            batch_pages += page_count
+
+    if len(jobs) > 1:
+        logger.info(f"Worker {worker_id} claimed {len(jobs)} MinerU jobs ({batch_pages} pages) as one batch")
+    return jobs
+
+
+def _owned(job):
+    """Return a queryset matching job only while this worker's claim on it is current"""
+    return ExtractionJob.objects.filter(
+        pk=job.pk,
+        status=ExtractionJob.STATUS_RUNNING,
+        worker_id=job.worker_id,
+        attempts=job.attempts,
+    )
+
+
+def heartbeat():
+    """Record that the job run by this thread is still making progress
+
+    Called by PageWriter after every page batch, so requeue_stale_jobs only
+    requeues jobs whose worker stopped writing pages. Returns False if the job
+    was requeued and claimed by another worker in the meantime.
+    """
+    job = getattr(_current, 'job', None)
+    if job is None:
+        return True
+    now = timezone.now()
+    if _owned(job).update(heartbeat_at=now, updated_at=now):
+        return True
+    logger.warning(f"Worker {job.worker_id} no longer owns extraction job {job.pk}")
+    return False
+
+
+def run_job(job, prefetched_pages=None):
+    """Run a claimed job and record the outcome. Returns True on success."""
+    from .views import process_document_file
+
+    document = job.document
+    logger.info(f"Worker {job.worker_id} running extraction job {job.pk} for document {document.pk} ({document.title})")
+
+    _current.job = job
+    try:
+        if job.reprocess:
+            with transaction.atomic():
+                document.pages.all().delete()
+        # Reprocessing (admin action, engine change, retries) bypasses the extraction cache
+        process_document_file(document, use_cache=not job.reprocess, prefetched_pages=prefetched_pages)
+    except Exception as e:
+        logger.error(f"Extraction job {job.pk} failed (attempt {job.attempts}/{job.max_attempts}): {str(e)}", exc_info=True)
+        retry = job.attempts < job.max_attempts
+        # A job requeued as stale belongs to the worker that claimed it next
+        _owned(job).update(
+            status=ExtractionJob.STATUS_PENDING if retry else ExtractionJob.STATUS_FAILED,
+            # A failed attempt may have written some pages - clear them on retry
+            reprocess=True,
+            error=str(e),
+            finished_at=None if retry else timezone.now(),
+            updated_at=timezone.now(),
+        )
+        return False
+    finally:
+        _current.job = None
+
+    succeeded = _owned(job).update(
+        status=ExtractionJob.STATUS_SUCCEEDED,
+        error='',
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+    if not succeeded:
+        logger.warning(f"Extraction job {job.pk} finished after it was requeued - leaving it to its new worker")
+        return False
+    logger.info(f"Extraction job {job.pk} succeeded")
+    _log_page_ocr_cache_stats()
+    return True
+
+
+def run_jobs(jobs):
+    """Run claimed jobs, parsing MinerU batches with a single do_parse call first"""
+    from .mineru_batch import prefetch_mineru_pages
+
+    prefetched = {}
+    if len(jobs) > 1:
+        try:
+            prefetched = prefetch_mineru_pages([job.document for job in jobs])
+        except Exception as e:
+            logger.error(f"MinerU batch failed, extracting documents one at a time: {str(e)}", exc_info=True)
+
+    for job in jobs:
+        run_job(job, prefetched_pages=prefetched.get(job.document_id))
+
+
+def _log_page_ocr_cache_stats():
+    """Log this worker's cumulative page OCR memo hit rates"""
+    from .extraction_cache import page_ocr_cache_stats
+
+    for engine, stats in page_ocr_cache_stats().items():
+        logger.info(
+            f"Page OCR memo [{engine}]: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} hit rate)"
+        )
+
+
+def requeue_stale_jobs(stale_after=None):
+    """Return running jobs whose worker disappeared to the queue
+
+    A job is stale when its worker has not sent a heartbeat (see heartbeat) for
+    EXTRACTION_JOB_STALE_SECONDS. Jobs that have used up their attempts are
+    marked as failed instead.
+    """
+    if stale_after is None:
+        stale_after = getattr(settings, 'EXTRACTION_JOB_STALE_SECONDS', 6 * 60 * 60)
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    stale = ExtractionJob.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+        status=ExtractionJob.STATUS_RUNNING,
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=ExtractionJob.STATUS_FAILED,
+        error='Worker stopped responding',
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+    requeued = stale.update(
+        status=ExtractionJob.STATUS_PENDING,
+        reprocess=True,
+        updated_at=timezone.now(),
+    )
+    if requeued or failed:
+        logger.warning(f"Requeued {requeued} stale extraction job(s), failed {failed}")
+    return requeued
+
+
+def run_worker(worker_id=None, once=False, poll_interval=None, max_jobs=None):
+    """Claim and run jobs until stopped
+
+    Args:
+        worker_id: Identifier recorded on claimed jobs (defaults to host:pid)
+        once: Exit as soon as the queue is empty instead of polling
+        poll_interval: Seconds to sleep when the queue is empty
+        max_jobs: Exit after running this many jobs
+
+    Returns:
+        int: Number of jobs run
+    """
+    worker_id = worker_id or default_worker_id()
+    if poll_interval is None:
+        poll_interval = getattr(settings, 'EXTRACTION_WORKER_POLL_INTERVAL', 2.0)
+
+    logger.info(f"Extraction worker {worker_id} started")
+    jobs_run = 0
+    while max_jobs is None or jobs_run < max_jobs:
+        close_old_connections()
+        requeue_stale_jobs()
+        job = claim_next_job(worker_id)
+        if job is None:
+            if once:
+                break
+            model_manager.unload_idle()
+            time.sleep(poll_interval)
+            continue
+        jobs = claim_mineru_batch(worker_id, job, None if max_jobs is None else max_jobs - jobs_run)
+        run_jobs(jobs)
+        jobs_run += len(jobs)
+
+    logger.info(f"Extraction worker {worker_id} stopped after {jobs_run} job(s)")
+    return jobs_run
+
@@ -0,0 +1,85 @@
+"""
+Page layout summaries
+
+OCR engines store a page's layout as a list of blocks in Page.json_data.
+Counting tables, headings and so on used to walk that list once per accessor.
+build_layout_summary walks it once when the page is written and records:
+
+- blocks: number of blocks
+- type_names / types: the distinct block types, and one index into them per block
+- counts: number of blocks in each category
+- offsets: positions of each category's blocks in the block list
+
+The Page accessors read counts and offsets from the stored summary.
+"""
+
+SUMMARY_VERSION = 1
+
+CATEGORIES = ('table', 'formula', 'heading', 'paragraph', 'bbox')
+
+
+def page_blocks(json_data, page_number):
+    """Return the block list of a page's json_data (MinerU: pages -> blocks)"""
+    if not json_data or not isinstance(json_data, dict):
+        return []
+    if 'blocks' in json_data:
+        return json_data['blocks'] or []
+    if isinstance(json_data.get('pages'), list):
+        # If it's a pages array, get blocks from the current page
+        for page in json_data['pages']:
+            if page.get('page_number') == page_number and 'blocks' in page:
+                return page['blocks'] or []
+    return []
+
+
+def block_categories(block):
+    """Return the categories from CATEGORIES a block belongs to"""
+    raw_type = block.get('type') or ''
+    block_type = raw_type.lower()
+    categories = []
+    if raw_type == 'table' or 'table' in block_type:
+        categories.append('table')
+    if raw_type == 'formula' or 'formula' in block_type:
+        categories.append('formula')
+    if 'heading' in block_type or 'title' in block_type or block.get('level'):
+        categories.append('heading')
+    if ('paragraph' in block_type or 'text' in block_type) and raw_type != 'table' and 'formula' not in block_type:
+        categories.append('paragraph')
+    if block.get('bbox') or block.get('bounding_box'):
+        categories.append('bbox')
+    return categories
+
+
+def build_layout_summary(json_data, page_number):
+    """Build the layout summary of a page. Returns {} for pages without JSON data."""
+    if not json_data:
+        return {}
+
+    type_names = []
+    type_index = {}
+    types = []
+    offsets = {category: [] for category in CATEGORIES}
+    for position, block in enumerate(page_blocks(json_data, page_number)):
+        if not isinstance(block, dict):
+            block = {}
+        block_type = block.get('type') or ''
+        if block_type not in type_index:
+            type_index[block_type] = len(type_names)
+            type_names.append(block_type)
+        types.append(type_index[block_type])
+        for category in block_categories(block):
+            offsets[category].append(position)
+
+    return {
+        'version': SUMMARY_VERSION,
+        'blocks': len(types),
+        'type_names': type_names,
+        'types': types,
+        'counts': {category: len(positions) for category, positions in offsets.items()},
+        'offsets': offsets,
+    }
+
+
+def is_current(summary):
+    """Return True if summary was built by this version of build_layout_summary"""
+    return bool(summary) and summary.get('version') == SUMMARY_VERSION
@@ -0,0 +1,104 @@
+"""
+Management command to fill in the stored page_count and text_length of documents
+Usage: python manage.py backfill_page_stats [--all] [--layout] [--blocks] [--batch-size N]
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from django.db.models.functions import Length
+
+from core.blocks import index_page_blocks
+from core.layout import build_layout_summary
+from core.models import Document, Page
+
+
+class Command(BaseCommand):
+    help = 'Store page_count and text_length for documents that were extracted before they were maintained'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recount every document, not only those that were never counted',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of documents to update per query (default: 500)',
+        )
+        parser.add_argument(
+            '--layout',
+            action='store_true',
+            help='Also build the layout summary of pages that do not have one',
+        )
+        parser.add_argument(
+            '--blocks',
+            action='store_true',
+            help='Also fill the Block table for pages that have no blocks indexed',
+        )
+
+    def handle(self, *args, **options):
+        documents = Document.objects.order_by('pk')
+        if not options['all']:
+            documents = documents.filter(page_count__isnull=True)
+        # Counted in the database; page text is never loaded
+        documents = documents.annotate(
+            counted_pages=Count('pages'),
+            counted_length=Sum(Length('pages__text')),
+        ).only('pk', 'page_count', 'text_length')
+
+        batch_size = max(1, options['batch_size'])
+        batch = []
+        updated = 0
+        for document in documents.iterator(chunk_size=batch_size):
+            document.page_count = document.counted_pages
+            document.text_length = document.counted_length or 0
+            batch.append(document)
+            if len(batch) >= batch_size:
+                updated += Document.objects.bulk_update(batch, ['page_count', 'text_length'])
+                batch = []
+        if batch:
+            updated += Document.objects.bulk_update(batch, ['page_count', 'text_length'])
+
+        self.stdout.write(self.style.SUCCESS(f'Updated page statistics for {updated} document(s)'))
+
+        if options['layout']:
+            self.backfill_layout(options['all'], batch_size)
+        if options['blocks']:
+            self.backfill_blocks(options['all'], batch_size)
+
+    def backfill_layout(self, all_pages, batch_size):
+        pages = Page.objects.order_by('pk').only('pk', 'page_number', 'json_data', 'layout_summary')
+        if not all_pages:
+            pages = pages.filter(layout_summary={})
+        batch = []
+        updated = 0
+        for page in pages.iterator(chunk_size=batch_size):
+            page.layout_summary = build_layout_summary(page.json_data, page.page_number)
+            batch.append(page)
+            if len(batch) >= batch_size:
+                updated += Page.objects.bulk_update(batch, ['layout_summary'])
+                batch = []
+        if batch:
+            updated += Page.objects.bulk_update(batch, ['layout_summary'])
+
+        self.stdout.write(self.style.SUCCESS(f'Updated layout summaries for {updated} page(s)'))
+
+    def backfill_blocks(self, all_pages, batch_size):
+        documents = Document.objects.order_by('pk').only('pk', 'ocr_engine')
+        indexed = 0
+        for document in documents.iterator(chunk_size=batch_size):
+            pages = document.pages.order_by('page_number').only('pk', 'document_id', 'page_number', 'json_data')
+            if not all_pages:
+                pages = pages.filter(blocks__isnull=True)
+            # Index in batches to keep memory bounded on large documents
+            batch = []
+            for page in pages.iterator(chunk_size=batch_size):
+                batch.append(page)
+                if len(batch) >= batch_size:
+                    indexed += index_page_blocks(document, batch)
+                    batch = []
+            if batch:
+                indexed += index_page_blocks(document, batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} block(s)'))
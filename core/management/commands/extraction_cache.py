@@ -0,0 +1,59 @@
+"""
+Management command to inspect or clear the extraction caches
+Usage: python manage.py extraction_cache [--clear] [--pages-only | --documents-only | --renders-only]
+"""
+from django.core.management.base import BaseCommand
+
+from core.extraction_cache import get_extraction_cache, get_page_ocr_cache
+from core.render_cache import get_render_cache
+
+
+class Command(BaseCommand):
+    help = 'Show the size of the document extraction cache, page OCR memo and render cache, or clear them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete the cached entries',
+        )
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument(
+            '--pages-only',
+            action='store_true',
+            help='Only act on the page OCR memo',
+        )
+        group.add_argument(
+            '--documents-only',
+            action='store_true',
+            help='Only act on the document extraction cache',
+        )
+        group.add_argument(
+            '--renders-only',
+            action='store_true',
+            help='Only act on the page render cache',
+        )
+
+    def handle(self, *args, **options):
+        only = [name for name in ('pages_only', 'documents_only', 'renders_only') if options[name]]
+        caches = []
+        if not only or 'documents_only' in only:
+            caches.append(('Document extraction cache', get_extraction_cache()))
+        if not only or 'pages_only' in only:
+            caches.append(('Page OCR memo', get_page_ocr_cache()))
+        if not only or 'renders_only' in only:
+            caches.append(('Page render cache', get_render_cache()))
+
+        for label, cache in caches:
+            if cache is None:
+                self.stdout.write(self.style.WARNING(f'{label}: disabled'))
+                continue
+
+            entries, total_bytes = cache.size()
+            self.stdout.write(
+                f'{label}: {entries} entries, {total_bytes / (1024 * 1024):.1f} MB '
+                f'of {cache.max_bytes / (1024 * 1024):.0f} MB ({cache.directory})'
+            )
+            if options['clear']:
+                removed = cache.clear()
+                self.stdout.write(self.style.SUCCESS(f'  Removed {removed} entries'))
@@ -1,8 +1,9 @@
 """
 Management command to reprocess documents and extract pages
-Usage: python manage.py reprocess_documents [--all] [document_id ...]
+Usage: python manage.py reprocess_documents [--all] [--no-cache] [--batch] [document_id ...]
 """
 from django.core.management.base import BaseCommand
+from core.mineru_batch import plan_mineru_batches, prefetch_mineru_pages
 from core.models import Document
 from core.views import process_document_file
 
@@ -16,6 +17,16 @@ class Command(BaseCommand):
             action='store_true',
             help='Reprocess all documents',
         )
+        parser.add_argument(
+            '--no-cache',
+            action='store_true',
+            help='Run extraction again even if the file is in the extraction cache',
+        )
+        parser.add_argument(
+            '--batch',
+            action='store_true',
+            help='Parse MinerU PDFs together, up to MINERU_BATCH_MAX_PAGES pages per MinerU call',
+        )
         parser.add_argument(
             'document_ids',
             nargs='*',
@@ -37,6 +48,16 @@ class Command(BaseCommand):
         processed = 0
         failed = 0
 
+        # Map each MinerU document to the batch it is parsed with
+        batch_of = {}
+        if options['batch']:
+            documents = list(documents)
+            for batch in plan_mineru_batches(documents):
+                for document in batch:
+                    batch_of[document.pk] = batch
+        current_batch = None
+        prefetched = {}
+
         for document in documents:
             if not document.file:
                 self.stdout.write(
@@ -86,9 +107,20 @@ class Command(BaseCommand):
                     document.pages.all().delete()
                     self.stdout.write(f'  Deleted {page_count} existing pages')
                 
+                # Parse this document's MinerU batch the first time one of its documents comes up
+                batch = batch_of.get(document.pk)
+                if batch is not None and batch is not current_batch:
+                    current_batch = batch
+                    self.stdout.write(f'  Parsing MinerU batch of {len(batch)} document(s)...')
+                    prefetched = prefetch_mineru_pages(batch, use_cache=not options['no_cache'])
+                
                 # Process document
                 self.stdout.write('  Running extraction...')
-                process_document_file(document)
+                process_document_file(
+                    document,
+                    use_cache=not options['no_cache'],
+                    prefetched_pages=prefetched.get(document.pk) if batch is not None else None,
+                )
                 
                 # Check results
                 new_page_count = document.pages.count()
@@ -0,0 +1,92 @@
+"""
+Management command to run background extraction workers
+Usage: python manage.py run_extraction_workers [--workers N] [--once] [--max-jobs N]
+"""
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+
+
+def run_worker_process(options):
+    """Entry point for spawned worker processes
+
+    Kept free of module-level model imports so the child can unpickle it
+    before Django is set up.
+    """
+    import django
+    django.setup()
+    from core.jobs import run_worker
+    run_worker(**options)
+
+
+class Command(BaseCommand):
+    help = 'Claim and process queued document extraction jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of worker processes to run (default: 1)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when the queue is empty instead of polling for new jobs',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=None,
+            help='Exit after each worker has run this many jobs',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=None,
+            help='Seconds to wait between polls when the queue is empty',
+        )
+
+    def handle(self, *args, **options):
+        from core.jobs import default_worker_id, run_worker
+        
+        workers = max(1, options['workers'])
+        worker_options = {
+            'once': options['once'],
+            'max_jobs': options['max_jobs'],
+            'poll_interval': options['poll_interval'],
+        }
+
+        if workers == 1:
+            worker_id = default_worker_id()
+            self.stdout.write(f'Starting extraction worker {worker_id}...')
+            jobs_run = run_worker(worker_id=worker_id, **worker_options)
+            self.stdout.write(self.style.SUCCESS(f'Worker finished after {jobs_run} job(s)'))
+            return
+
+        # Each worker gets its own process (and database connection) so that
+        # CPU-bound OCR engines do not share a GIL
+        self.stdout.write(f'Starting {workers} extraction worker processes...')
+        context = multiprocessing.get_context('spawn')
+        processes = []
+        for index in range(workers):
+            process_options = dict(worker_options, worker_id=f'{default_worker_id()}-{index + 1}')
+            process = context.Process(target=run_worker_process, args=(process_options,), daemon=False)
+            process.start()
+            processes.append(process)
+
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Stopping workers...'))
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
+
+        failed = [process for process in processes if process.exitcode not in (0, None)]
+        if failed:
+            self.stdout.write(self.style.ERROR(f'{len(failed)} worker process(es) exited with errors'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All workers finished'))
@@ -0,0 +1,37 @@
+"""
+Management command to run the resident OLMOCR worker
+Usage: python manage.py run_olmocr_worker [--address HOST:PORT]
+"""
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Load the OLMOCR model once and serve OCR requests from extraction processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--address',
+            default=None,
+            help='HOST:PORT or Unix socket path to listen on (default: OLMOCR_WORKER_ADDRESS)',
+        )
+
+    def handle(self, *args, **options):
+        from core.olmocr_worker import OlmocrModel, OlmocrWorkerServer, worker_address
+
+        address = options['address']
+        if address:
+            host, sep, port = address.rpartition(':')
+            address = (host or '127.0.0.1', int(port)) if sep and port.isdigit() else address
+        else:
+            address = worker_address()
+
+        model = OlmocrModel()
+        self.stdout.write(f'Loading OLMOCR model {model.model_id}...')
+        model.load()
+
+        server = OlmocrWorkerServer(model, address)
+        self.stdout.write(self.style.SUCCESS(f'OLMOCR worker listening on {server.address}'))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Stopping OLMOCR worker...'))
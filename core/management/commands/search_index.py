@@ -0,0 +1,37 @@
+"""
+Management command to inspect, rebuild or optimize the page full-text search index
+Usage: python manage.py search_index [--rebuild] [--optimize]
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import Page
+from core.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Show the page search backend, or rebuild / optimize its index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Re-create the index triggers and reindex every page',
+        )
+        parser.add_argument(
+            '--optimize',
+            action='store_true',
+            help='Merge the index segments (SQLite) or vacuum the page table (PostgreSQL)',
+        )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        self.stdout.write(f'Search backend: {backend.name} ({Page.objects.count()} pages)')
+        if backend.name == 'like':
+            self.stdout.write(self.style.WARNING('  No full-text index - searches scan page text with LIKE'))
+
+        if options['rebuild']:
+            backend.rebuild()
+            self.stdout.write(self.style.SUCCESS('  Index rebuilt'))
+        if options['optimize']:
+            backend.optimize()
+            self.stdout.write(self.style.SUCCESS('  Index optimized'))
@@ -0,0 +1,38 @@
+"""
+Management command to inspect or rebuild the block spatial index
+Usage: python manage.py spatial_index [--rebuild]
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.models import Block
+from core.spatial import rebuild_rtree, rtree_installed
+
+
+class Command(BaseCommand):
+    help = 'Show how block region queries are indexed, or rebuild the SQLite R*Tree'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Re-create the R*Tree triggers and reload it from the Block table (SQLite)',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild'] and connection.vendor == 'sqlite':
+            if rebuild_rtree():
+                self.stdout.write(self.style.SUCCESS('Rebuilt the block spatial index'))
+            else:
+                self.stdout.write(self.style.WARNING('This SQLite build has no R*Tree support'))
+
+        if rtree_installed():
+            index = 'SQLite R*Tree'
+        elif connection.vendor == 'postgresql':
+            index = 'PostgreSQL GiST'
+        else:
+            index = 'none'
+        blocks = Block.objects.filter(nx0__isnull=False).count()
+        self.stdout.write(f'Spatial index: {index} ({blocks} blocks with a normalized rectangle)')
+        if index == 'none':
+            self.stdout.write(self.style.WARNING('  Region queries compare the block columns directly'))
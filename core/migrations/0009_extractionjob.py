@@ -0,0 +1,37 @@
+# Generated migration for ExtractionJob model
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_add_lightonocr'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='pending', help_text='Current state of the job', max_length=20)),
+                ('reprocess', models.BooleanField(default=False, help_text='Delete existing pages before extracting')),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Number of times a worker has claimed this job')),
+                ('max_attempts', models.PositiveIntegerField(default=3, help_text='Give up after this many failed attempts')),
+                ('worker_id', models.CharField(blank=True, help_text='Identifier of the worker that claimed the job', max_length=255)),
+                ('error', models.TextField(blank=True, help_text='Error message from the last failed attempt')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='extraction_jobs', to='core.document')),
+            ],
+            options={
+                'verbose_name': 'Extraction Job',
+                'verbose_name_plural': 'Extraction Jobs',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='core_extrac_status_0059b2_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated migration for page thumbnails
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_extractionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict, help_text='Thumbnail files by size name, see core.thumbnails'),
+        ),
+    ]
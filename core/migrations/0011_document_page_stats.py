@@ -0,0 +1,23 @@
+# Generated migration for denormalized document page statistics
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_page_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='page_count',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='text_length',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated migration for stored page layout summaries
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_document_page_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='layout_summary',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Block counts and offsets, see core.layout'),
+        ),
+    ]
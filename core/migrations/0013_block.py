@@ -0,0 +1,43 @@
+# Generated migration for the normalized block table
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_page_layout_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Block',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ordinal', models.PositiveIntegerField(help_text="Position in the page's block list")),
+                ('type', models.CharField(blank=True, help_text='Block type as written by the OCR engine', max_length=50)),
+                ('kind', models.CharField(help_text='table, formula, heading, paragraph or other', max_length=20)),
+                ('text', models.TextField(blank=True)),
+                ('x0', models.FloatField(blank=True, null=True)),
+                ('y0', models.FloatField(blank=True, null=True)),
+                ('x1', models.FloatField(blank=True, null=True)),
+                ('y1', models.FloatField(blank=True, null=True)),
+                ('confidence', models.FloatField(blank=True, null=True)),
+                ('engine', models.CharField(blank=True, max_length=50)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocks', to='core.document')),
+                ('page', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocks', to='core.page')),
+            ],
+            options={
+                'verbose_name': 'Block',
+                'verbose_name_plural': 'Blocks',
+                'ordering': ['page', 'ordinal'],
+                'constraints': [models.UniqueConstraint(fields=('page', 'ordinal'), name='core_block_page_ordinal')],
+                'indexes': [
+                    models.Index(fields=['kind', 'engine'], name='core_block_kind_engine'),
+                    models.Index(fields=['document', 'kind'], name='core_block_document_kind'),
+                    models.Index(fields=['type', 'engine'], name='core_block_type_engine'),
+                ],
+            },
+        ),
+    ]
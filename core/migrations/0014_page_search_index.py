@@ -0,0 +1,38 @@
+# Generated migration for the full-text search index over page text (see core/search.py)
+
+from django.db import DatabaseError, migrations, transaction
+
+from core.search import POSTGRES_INSTALL, POSTGRES_UNINSTALL, SQLITE_INSTALL, SQLITE_REBUILD, SQLITE_UNINSTALL
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                for statement in SQLITE_INSTALL + [SQLITE_REBUILD]:
+                    schema_editor.execute(statement)
+        except DatabaseError:
+            # SQLite built without FTS5 - core.search falls back to LIKE queries
+            pass
+    elif vendor == 'postgresql':
+        for statement in POSTGRES_INSTALL:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_block'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
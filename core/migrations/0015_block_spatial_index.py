@@ -0,0 +1,58 @@
+# Generated migration for the spatial index over normalized block rectangles (see core/spatial.py)
+
+from django.db import DatabaseError, migrations, models, transaction
+
+from core.spatial import POSTGRES_INSTALL, POSTGRES_UNINSTALL, SQLITE_INSTALL, SQLITE_LOAD, SQLITE_UNINSTALL
+
+
+def create_spatial_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                for statement in SQLITE_INSTALL + [SQLITE_LOAD]:
+                    schema_editor.execute(statement)
+        except DatabaseError:
+            # SQLite built without R*Tree - core.spatial falls back to column comparisons
+            pass
+    elif vendor == 'postgresql':
+        for statement in POSTGRES_INSTALL:
+            schema_editor.execute(statement)
+
+
+def drop_spatial_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_page_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='block',
+            name='nx0',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='block',
+            name='ny0',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='block',
+            name='nx1',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='block',
+            name='ny1',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(create_spatial_index, drop_spatial_index),
+    ]
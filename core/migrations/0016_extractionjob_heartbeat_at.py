@@ -0,0 +1,18 @@
+# Generated migration for extraction job heartbeats (see core.jobs.heartbeat)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_block_spatial_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='extractionjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last time the running worker reported progress', null=True),
+        ),
+    ]
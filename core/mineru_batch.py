@@ -0,0 +1,112 @@
+"""
+Multi-document MinerU batching
+
+MinerU's do_parse accepts lists of PDFs, and warming up its layout and OCR
+models costs about as much as parsing a short document. Workers and
+reprocess_documents therefore collect MinerU documents up to
+MINERU_BATCH_MAX_PAGES pages (and MINERU_BATCH_MAX_DOCUMENTS documents),
+parse them in one call, and hand each document its pages through
+process_document_file(prefetched_pages=...).
+"""
+import logging
+
+import fitz  # PyMuPDF
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def mineru_batch_limits():
+    """Return (max_pages, max_documents) for a MinerU batch. max_pages 0 disables batching."""
+    return (
+        getattr(settings, 'MINERU_BATCH_MAX_PAGES', 200),
+        max(1, getattr(settings, 'MINERU_BATCH_MAX_DOCUMENTS', 16)),
+    )
+
+
+def is_mineru_batchable(document):
+    """Return True if a document is a PDF that will be extracted with MinerU"""
+    from . import ocr_utils
+
+    if not document.file or (document.ocr_engine or 'mineru').lower() != 'mineru':
+        return False
+    if not ocr_utils.mineru_available:
+        return False
+    file_type = document.file_type or ('pdf' if document.file.name.lower().endswith('.pdf') else '')
+    return file_type == 'pdf'
+
+
+def fits_in_batch(page_count):
+    """Return True if a PDF is short enough to share a batch
+
+    PDFs longer than MINERU_WINDOW_PAGES are parsed window by window instead
+    (see core.mineru_windows).
+    """
+    from .mineru_windows import mineru_window_pages
+
+    window_pages = mineru_window_pages()
+    return bool(page_count) and (not window_pages or page_count <= window_pages)
+
+
+def pdf_page_count(document):
+    """Return the number of pages in a document's PDF, or None if it can't be opened"""
+    try:
+        with fitz.open(document.file.path) as doc:
+            return len(doc)
+    except Exception:
+        return None
+
+
+def plan_mineru_batches(documents):
+    """Group batchable documents into MinerU batches within the page and document limits
+
+    Yields:
+        list: Documents to parse together, in their original order
+    """
+    max_pages, max_documents = mineru_batch_limits()
+    batch = []
+    batch_pages = 0
+    for document in documents:
+        if not is_mineru_batchable(document):
+            continue
+        page_count = pdf_page_count(document)
+        if not fits_in_batch(page_count):
+            continue
+        if batch and (batch_pages + page_count > max_pages or len(batch) >= max_documents):
+            yield batch
+            batch = []
+            batch_pages = 0
+        batch.append(document)
+        batch_pages += page_count
+    if batch:
+        yield batch
+
+
+def prefetch_mineru_pages(documents, use_cache=True):
+    """Parse documents with one MinerU call and return {document pk: page dictionaries}
+
+    Documents already in the extraction cache are left out; process_document_file
+    restores those from the cache.
+    """
+    from .extraction_cache import load_cached_pages
+    from .ocr_utils import extract_pages_with_mineru_json_batch
+    from .views import document_cache_key
+
+    to_parse = []
+    for document in documents:
+        cache_key = document_cache_key(document) if use_cache else None
+        if cache_key and load_cached_pages(cache_key):
+            continue
+        to_parse.append(document)
+
+    if len(to_parse) < 2:
+        # Nothing to gain over the normal per-document path
+        return {}
+
+    logger.info(f"Parsing {len(to_parse)} documents with MinerU in one batch")
+    results = extract_pages_with_mineru_json_batch([document.file.path for document in to_parse])
+    return {
+        document.pk: pages_data
+        for document, pages_data in zip(to_parse, results)
+        if pages_data
+    }
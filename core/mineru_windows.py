@@ -0,0 +1,150 @@
+"""
+Windowed MinerU extraction for very large PDFs
+
+Parsing a 1,500-page filing in one MinerU call holds the whole document and
+all of its layout results in memory, and a single failure loses every page.
+PDFs longer than MINERU_WINDOW_PAGES are split with fitz into page windows
+that are parsed independently (MINERU_WINDOW_WORKERS at a time), so peak
+memory is bounded by the window size.
+
+Each finished window is checkpointed under MINERU_CHECKPOINT_DIR. When a
+window fails, the next attempt for the same file only parses the windows
+that have no checkpoint yet. Checkpoints are removed once every window has
+succeeded.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import fitz  # PyMuPDF
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def mineru_window_pages():
+    """Return the configured window size in pages (0 disables windowing)"""
+    return max(0, getattr(settings, 'MINERU_WINDOW_PAGES', 100) or 0)
+
+
+def _checkpoint_dir(file_path, window_pages):
+    from .extraction_cache import file_sha256
+
+    base = getattr(settings, 'MINERU_CHECKPOINT_DIR', None) or os.path.join(tempfile.gettempdir(), 'mineru_windows')
+    return Path(base) / f"{file_sha256(file_path)}-{window_pages}"
+
+
+def _rebase_pages(pages_data, start):
+    """Shift page numbers of a window's pages so they count from the start of the document"""
+    for page_info in pages_data:
+        page_info['page_number'] += start
+        json_data = page_info.get('json_data')
+        if isinstance(json_data, dict) and isinstance(json_data.get('page_idx'), int):
+            json_data['page_idx'] += start
+    return pages_data
+
+
+def _parse_window(file_path, start, stop, checkpoint_path):
+    """Parse pages [start, stop) of a PDF with MinerU and checkpoint the result
+
+    Runs in a page worker process when MINERU_WINDOW_WORKERS > 1.
+
+    Returns:
+        list: Page dictionaries numbered from the start of the document, or
+        None if MinerU failed for this window
+    """
+    from .ocr_utils import extract_pages_with_mineru_json_batch
+
+    try:
+        pages_data = _parse_window_pages(file_path, start, stop, extract_pages_with_mineru_json_batch)
+    except Exception as e:
+        logger.error(f"Error parsing pages {start + 1}-{stop} of {file_path} with MinerU: {str(e)}", exc_info=True)
+        return None
+    if not pages_data:
+        return None
+    pages_data = _rebase_pages(pages_data, start)
+
+    # Write to a temporary file and rename so a crash never leaves a partial checkpoint
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(pages_data, f, ensure_ascii=False)
+    os.replace(tmp_path, checkpoint_path)
+    return pages_data
+
+
+def _parse_window_pages(file_path, start, stop, extractor):
+    """Copy pages [start, stop) into a temporary PDF and extract it"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        window_path = os.path.join(temp_dir, f"pages_{start + 1}-{stop}.pdf")
+        source = fitz.open(file_path)
+        window = fitz.open()
+        try:
+            window.insert_pdf(source, from_page=start, to_page=stop - 1)
+            window.save(window_path)
+        finally:
+            window.close()
+            source.close()
+
+        return extractor([window_path])[0]
+
+
+def extract_pages_with_mineru_windows(file_path, window_pages=None, workers=None):
+    """Extract a PDF with MinerU one page window at a time
+
+    Returns:
+        list: Page dictionaries for the whole document, or an empty list if a
+        window still failed after being retried (finished windows stay
+        checkpointed for the next attempt)
+    """
+    from .parallel import run_in_workers
+
+    window_pages = window_pages or mineru_window_pages()
+    if workers is None:
+        workers = getattr(settings, 'MINERU_WINDOW_WORKERS', 1)
+
+    with fitz.open(file_path) as doc:
+        total_pages = len(doc)
+    windows = [(start, min(start + window_pages, total_pages)) for start in range(0, total_pages, window_pages)]
+
+    checkpoint_dir = _checkpoint_dir(file_path, window_pages)
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+
+    results = {}
+    pending = []
+    for start, stop in windows:
+        checkpoint_path = checkpoint_dir / f"{start + 1:05d}-{stop:05d}.json"
+        try:
+            with open(checkpoint_path, 'r', encoding='utf-8') as f:
+                results[start] = json.load(f)
+            continue
+        except (OSError, ValueError):
+            pass
+        pending.append((file_path, start, stop, str(checkpoint_path)))
+
+    logger.info(
+        f"Parsing {total_pages} pages with MinerU in {len(windows)} windows of {window_pages} pages "
+        f"({len(windows) - len(pending)} restored from checkpoints, {workers} worker(s))"
+    )
+
+    failed = []
+    for args, pages_data in zip(pending, run_in_workers(_parse_window, pending, workers)):
+        if pages_data is None:
+            failed.append(args)
+        else:
+            results[args[1]] = pages_data
+
+    # Retry failed windows once, on their own
+    for args in failed:
+        _, start, stop, _ = args
+        logger.warning(f"MinerU failed for pages {start + 1}-{stop}, retrying that window")
+        pages_data = _parse_window(*args)
+        if pages_data is None:
+            logger.error(f"MinerU failed twice for pages {start + 1}-{stop} of {file_path}; finished windows are checkpointed in {checkpoint_dir}")
+            return []
+        results[start] = pages_data
+
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    return [page_info for start, _ in windows for page_info in results[start]]
@@ -0,0 +1,225 @@
+"""
+Model residency manager
+
+Local OCR models (PaddleOCR, TrOCR, Donut, LightOnOCR) are loaded on first use
+and kept in memory for later pages. The manager records how much RAM and
+VRAM each loaded model takes and unloads models when:
+
+- loading another model would push the total over MODEL_MEMORY_BUDGET_MB (RAM)
+  or MODEL_GPU_MEMORY_BUDGET_MB (VRAM). The least recently used models go
+  first, before the new model is loaded, so that its footprint (measured when
+  it was last loaded, or MODEL_FOOTPRINT_ESTIMATES_MB) fits alongside the rest.
+  The budget is checked again once its actual size is known.
+- a model has not been used for MODEL_IDLE_TIMEOUT seconds.
+
+This lets one worker handle documents for every engine without keeping all
+of the models resident.
+"""
+import gc
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+def _rss_bytes():
+    """Return the resident set size of this process, or None if it can't be read"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def model_footprint(value):
+    """Return (ram_bytes, gpu_bytes) held by the torch modules in a loaded model value
+
+    value may be a module or a tuple/list containing modules (processors and
+    other objects are ignored). Returns None if it contains no torch modules.
+    """
+    items = value if isinstance(value, (tuple, list)) else [value]
+    ram_bytes = gpu_bytes = 0
+    found = False
+    for item in items:
+        if not (hasattr(item, 'parameters') and hasattr(item, 'buffers')):
+            continue
+        try:
+            tensors = list(item.parameters()) + list(item.buffers())
+        except Exception:
+            continue
+        found = True
+        for tensor in tensors:
+            size = tensor.numel() * tensor.element_size()
+            if tensor.device.type == 'cpu':
+                ram_bytes += size
+            else:
+                gpu_bytes += size
+    return (ram_bytes, gpu_bytes) if found else None
+
+
+class _LoadedModel:
+    def __init__(self, value, ram_bytes, gpu_bytes):
+        self.value = value
+        self.ram_bytes = ram_bytes
+        self.gpu_bytes = gpu_bytes
+        self.last_used = time.monotonic()
+
+
+class ModelManager:
+    """Keep loaded models within a memory budget and unload idle ones
+
+    Budgets and the idle timeout are read from settings on every call unless
+    given explicitly. A budget or timeout of 0 disables that limit.
+    """
+
+    def __init__(self, memory_budget=None, gpu_memory_budget=None, idle_timeout=None):
+        self._memory_budget = memory_budget
+        self._gpu_memory_budget = gpu_memory_budget
+        self._idle_timeout = idle_timeout
+        self._models = OrderedDict()
+        # name -> (ram_bytes, gpu_bytes) measured at the last load, kept after unloading
+        self._footprints = {}
+        self._lock = threading.RLock()
+
+    @property
+    def memory_budget(self):
+        if self._memory_budget is not None:
+            return self._memory_budget
+        return getattr(settings, 'MODEL_MEMORY_BUDGET_MB', 0) * MB
+
+    @property
+    def gpu_memory_budget(self):
+        if self._gpu_memory_budget is not None:
+            return self._gpu_memory_budget
+        return getattr(settings, 'MODEL_GPU_MEMORY_BUDGET_MB', 0) * MB
+
+    @property
+    def idle_timeout(self):
+        if self._idle_timeout is not None:
+            return self._idle_timeout
+        return getattr(settings, 'MODEL_IDLE_TIMEOUT', 0)
+
+    def expected_footprint(self, name):
+        """Return the (ram_bytes, gpu_bytes) a model is expected to take once loaded"""
+        if name in self._footprints:
+            return self._footprints[name]
+        estimates = getattr(settings, 'MODEL_FOOTPRINT_ESTIMATES_MB', {}) or {}
+        ram_mb, gpu_mb = estimates.get(name, (0, 0))
+        return ram_mb * MB, gpu_mb * MB
+
+    def get(self, name, loader):
+        """Return the loaded model called name, calling loader() to load it if needed
+
+        loader returns the model (any object, e.g. a (processor, model) tuple)
+        or None if it can't be loaded; None is returned and not kept.
+        """
+        with self._lock:
+            self.unload_idle()
+
+            entry = self._models.get(name)
+            if entry is not None:
+                entry.last_used = time.monotonic()
+                self._models.move_to_end(name)
+                return entry.value
+
+            # Make room first - peak memory is the resident models plus the one being loaded
+            self._fit_budget(incoming=self.expected_footprint(name))
+
+            rss_before = _rss_bytes()
+            value = loader()
+            if value is None:
+                return None
+
+            footprint = model_footprint(value)
+            if footprint is None:
+                # Not a torch model (e.g. PaddleOCR) - use the growth in process memory
+                rss_after = _rss_bytes()
+                ram_bytes = max(0, rss_after - rss_before) if rss_before is not None and rss_after is not None else 0
+                footprint = (ram_bytes, 0)
+
+            self._models[name] = _LoadedModel(value, *footprint)
+            self._footprints[name] = footprint
+            logger.info(
+                f"Loaded model {name} (RAM {footprint[0] / MB:.0f} MB, VRAM {footprint[1] / MB:.0f} MB)"
+            )
+            # Safety net for models that turned out larger than expected
+            self._fit_budget(keep=name)
+            return value
+
+    def _fit_budget(self, incoming=(0, 0), keep=None):
+        """Unload least recently used models (other than keep) until they and incoming fit the budgets"""
+        budgets = (('ram_bytes', self.memory_budget), ('gpu_bytes', self.gpu_memory_budget))
+        for (attribute, budget), incoming_bytes in zip(budgets, incoming):
+            if not budget:
+                continue
+            for name in list(self._models):
+                total = sum(getattr(entry, attribute) for entry in self._models.values()) + incoming_bytes
+                if total <= budget:
+                    break
+                if name != keep and getattr(self._models[name], attribute):
+                    self.unload(name, reason='memory budget')
+            total = sum(getattr(entry, attribute) for entry in self._models.values())
+            if keep is not None and total > budget:
+                logger.warning(f"Model {keep} alone exceeds the {attribute.split('_')[0].upper()} budget of {budget / MB:.0f} MB")
+
+    def unload(self, name, reason='requested'):
+        """Unload a model and release its memory. Returns True if it was loaded."""
+        with self._lock:
+            entry = self._models.pop(name, None)
+            if entry is None:
+                return False
+            has_gpu_memory = entry.gpu_bytes > 0
+            del entry
+            gc.collect()
+            if has_gpu_memory and 'torch' in sys.modules:
+                try:
+                    import torch
+                    if torch.cuda.is_available():
+                        torch.cuda.empty_cache()
+                except Exception as e:
+                    logger.warning(f"Could not release CUDA memory after unloading {name}: {str(e)}")
+            logger.info(f"Unloaded model {name} ({reason})")
+            return True
+
+    def unload_idle(self):
+        """Unload models that have not been used for MODEL_IDLE_TIMEOUT seconds. Returns the number unloaded."""
+        timeout = self.idle_timeout
+        if not timeout:
+            return 0
+        with self._lock:
+            cutoff = time.monotonic() - timeout
+            idle = [name for name, entry in self._models.items() if entry.last_used < cutoff]
+            for name in idle:
+                self.unload(name, reason=f'idle for over {timeout}s')
+            return len(idle)
+
+    def unload_all(self):
+        with self._lock:
+            for name in list(self._models):
+                self.unload(name)
+
+    def loaded(self):
+        """Return [{'name', 'ram_bytes', 'gpu_bytes', 'idle_seconds'}] in least recently used order"""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    'name': name,
+                    'ram_bytes': entry.ram_bytes,
+                    'gpu_bytes': entry.gpu_bytes,
+                    'idle_seconds': now - entry.last_used,
+                }
+                for name, entry in self._models.items()
+            ]
+
+
+# Shared by every engine in this process
+model_manager = ModelManager()
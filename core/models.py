@@ -1,8 +1,35 @@
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Length
 from django.urls import reverse
 from django.utils import timezone
 import json
 
+from .layout import build_layout_summary, is_current, page_blocks
+
+
+class DocumentQuerySet(models.QuerySet):
+    def with_page_stats(self):
+        """Annotate page_total and text_total for list views
+
+        Stored page_count/text_length are used where set; rows that were
+        never counted (see the backfill_page_stats command) fall back to a
+        per-row subquery, so text is never sent to Python.
+        """
+        pages = Page.objects.filter(document=OuterRef('pk')).order_by().values('document')
+        return self.annotate(
+            page_total=Coalesce(
+                'page_count',
+                Subquery(pages.annotate(total=Count('pk')).values('total')),
+                0,
+            ),
+            text_total=Coalesce(
+                'text_length',
+                Subquery(pages.annotate(total=Sum(Length('text'))).values('total')),
+                0,
+            ),
+        )
+
 
 class Document(models.Model):
     """Model representing a document that can contain multiple pages"""
@@ -13,6 +40,11 @@ class Document(models.Model):
     ocr_engine = models.CharField(max_length=50, default='mineru')  # mineru, tesseract, deepseek
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by update_page_stats() whenever pages are written; null until first counted
+    page_count = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    text_length = models.PositiveBigIntegerField(blank=True, null=True, editable=False)
+    
+    objects = DocumentQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
@@ -28,12 +60,34 @@ class Document(models.Model):
     @property
     def total_pages(self):
         """Return the total number of pages in this document"""
+        if getattr(self, 'page_total', None) is not None:
+            return self.page_total
+        if self.page_count is not None:
+            return self.page_count
         return self.pages.count()
     
     @property
     def total_text_length(self):
         """Return the total length of all text in all pages"""
-        return sum(len(page.text or '') for page in self.pages.all())
+        if getattr(self, 'text_total', None) is not None:
+            return self.text_total
+        if self.text_length is not None:
+            return self.text_length
+        return self.pages.aggregate(total=Sum(Length('text')))['total'] or 0
+    
+    def update_page_stats(self):
+        """Recount page_count and text_length from the pages table and store them
+        
+        Uses a queryset update so saving stats doesn't touch updated_at or
+        trigger the post_save extraction signal.
+        """
+        stats = self.pages.aggregate(count=Count('pk'), length=Sum(Length('text')))
+        self.page_count = stats['count']
+        self.text_length = stats['length'] or 0
+        # Drop with_page_stats() annotations computed before this recount
+        self.__dict__.pop('page_total', None)
+        self.__dict__.pop('text_total', None)
+        Document.objects.filter(pk=self.pk).update(page_count=self.page_count, text_length=self.text_length)
 
 
 class Page(models.Model):
@@ -47,6 +101,8 @@ class Page(models.Model):
     text = models.TextField(blank=True)
     json_data = models.JSONField(blank=True, null=True, help_text="Structured JSON data from OCR engine")
     image = models.ImageField(upload_to='pages/%Y/%m/%d/', blank=True, null=True)
+    thumbnails = models.JSONField(blank=True, default=dict, help_text="Thumbnail files by size name, see core.thumbnails")
+    layout_summary = models.JSONField(blank=True, default=dict, editable=False, help_text="Block counts and offsets, see core.layout")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -62,6 +118,10 @@ class Page(models.Model):
     def get_absolute_url(self):
         return reverse('document_detail', kwargs={'pk': self.document.pk})
     
+    def thumbnail_url(self, size='large'):
+        """Return the URL serving this page's thumbnail at a size from THUMBNAIL_SIZES"""
+        return reverse('page_thumbnail', kwargs={'pk': self.pk, 'size': size})
+    
     def get_json_preview(self):
         """Return formatted JSON string for display"""
         if self.json_data:
@@ -74,130 +134,175 @@ class Page(models.Model):
         """Generate URL to view this specific page from the PDF"""
         return reverse('page_preview', kwargs={'pk': self.pk})
     
+    def get_layout_summary(self):
+        """Return the page's layout summary (see core.layout)
+        
+        Pages written before summaries were stored get one computed from
+        json_data, kept on the instance for later calls.
+        """
+        if is_current(self.layout_summary):
+            return self.layout_summary
+        if '_layout_summary' not in self.__dict__:
+            self._layout_summary = build_layout_summary(self.json_data, self.page_number)
+        return self._layout_summary
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'json_data' in update_fields:
+            self.layout_summary = build_layout_summary(self.json_data, self.page_number)
+            self.__dict__.pop('_layout_summary', None)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'layout_summary'}
+        super().save(*args, **kwargs)
+    
     def get_blocks(self):
         """Extract all blocks (paragraphs, headings, etc.) from MinerU JSON data"""
-        if not self.json_data:
+        return page_blocks(self.json_data, self.page_number)
+    
+    def _blocks_in(self, category):
+        """Return the blocks of a category, located through the layout summary's offsets"""
+        summary = self.get_layout_summary()
+        positions = summary.get('offsets', {}).get(category) if summary else None
+        if not positions:
             return []
-        
-        blocks = []
-        # MinerU structure: pages -> blocks
-        if 'blocks' in self.json_data:
-            blocks = self.json_data['blocks']
-        elif 'pages' in self.json_data and isinstance(self.json_data['pages'], list):
-            # If it's a pages array, get blocks from the current page
-            for page in self.json_data['pages']:
-                if page.get('page_number') == self.page_number and 'blocks' in page:
-                    blocks = page['blocks']
-                    break
-        
-        return blocks
+        blocks = self.get_blocks()
+        return [blocks[position] for position in positions]
     
     def get_tables(self):
         """Extract all tables from MinerU JSON data"""
-        if not self.json_data:
-            return []
-        
-        tables = []
-        blocks = self.get_blocks()
-        for block in blocks:
-            if block.get('type') == 'table' or 'table' in block.get('type', '').lower():
-                tables.append(block)
-        
-        return tables
+        return self._blocks_in('table')
     
     def get_formulas(self):
         """Extract all formulas/equations from MinerU JSON data"""
-        if not self.json_data:
-            return []
-        
-        formulas = []
-        blocks = self.get_blocks()
-        for block in blocks:
-            if block.get('type') == 'formula' or 'formula' in block.get('type', '').lower():
-                formulas.append(block)
-        
-        return formulas
+        return self._blocks_in('formula')
     
     def get_headings(self):
         """Extract all headings from MinerU JSON data"""
-        if not self.json_data:
-            return []
-        
-        headings = []
-        blocks = self.get_blocks()
-        for block in blocks:
-            block_type = block.get('type', '').lower()
-            if 'heading' in block_type or 'title' in block_type or block.get('level'):
-                headings.append(block)
-        
-        return headings
+        return self._blocks_in('heading')
     
     def get_paragraphs(self):
         """Extract all paragraphs from MinerU JSON data"""
-        if not self.json_data:
-            return []
-        
-        paragraphs = []
-        blocks = self.get_blocks()
-        for block in blocks:
-            block_type = block.get('type', '').lower()
-            if 'paragraph' in block_type or 'text' in block_type:
-                if block.get('type') != 'table' and 'formula' not in block_type:
-                    paragraphs.append(block)
-        
-        return paragraphs
+        return self._blocks_in('paragraph')
     
     def get_bounding_boxes(self):
         """Extract all bounding boxes from MinerU JSON data"""
-        if not self.json_data:
-            return []
-        
-        bboxes = []
-        blocks = self.get_blocks()
-        for block in blocks:
-            if 'bbox' in block or 'bounding_box' in block:
-                bbox = block.get('bbox') or block.get('bounding_box')
-                if bbox:
-                    bboxes.append({
-                        'text': block.get('text', ''),
-                        'type': block.get('type', 'unknown'),
-                        'bbox': bbox
-                    })
-        
-        return bboxes
+        return [
+            {
+                'text': block.get('text', ''),
+                'type': block.get('type', 'unknown'),
+                'bbox': block.get('bbox') or block.get('bounding_box'),
+            }
+            for block in self._blocks_in('bbox')
+        ]
     
-    def get_layout_structure(self):
-        """Get a structured representation of the page layout"""
-        if not self.json_data:
+    def get_layout_structure(self, include_blocks=True):
+        """Get a structured representation of the page layout
+        
+        Counts come from the layout summary. With include_blocks=False the
+        block list is left out, so json_data can be deferred when only the
+        counts are needed.
+        """
+        summary = self.get_layout_summary()
+        if not summary:
             return None
         
-        return {
+        counts = summary['counts']
+        structure = {
             'page_number': self.page_number,
-            'blocks_count': len(self.get_blocks()),
-            'tables_count': len(self.get_tables()),
-            'formulas_count': len(self.get_formulas()),
-            'headings_count': len(self.get_headings()),
-            'paragraphs_count': len(self.get_paragraphs()),
-            'has_layout': bool(self.get_blocks()),
-            'blocks': self.get_blocks()
+            'blocks_count': summary['blocks'],
+            'tables_count': counts['table'],
+            'formulas_count': counts['formula'],
+            'headings_count': counts['heading'],
+            'paragraphs_count': counts['paragraph'],
+            'has_layout': summary['blocks'] > 0,
         }
+        if include_blocks:
+            structure['blocks'] = self.get_blocks()
+        return structure
     
     def extract_text_by_type(self, block_type='paragraph'):
         """Extract text from blocks of a specific type"""
-        if not self.json_data:
+        summary = self.get_layout_summary()
+        if not summary:
             return []
         
-        texts = []
+        wanted = {
+            type_id for type_id, name in enumerate(summary['type_names'])
+            if name.lower() == block_type.lower()
+        }
+        if not wanted:
+            return []
         blocks = self.get_blocks()
-        for block in blocks:
-            if block.get('type', '').lower() == block_type.lower():
-                text = block.get('text', '')
+        texts = []
+        for position, type_id in enumerate(summary['types']):
+            if type_id in wanted:
+                text = blocks[position].get('text', '')
                 if text:
                     texts.append(text)
-        
         return texts
 
 
+class BlockQuerySet(models.QuerySet):
+    def tables(self):
+        return self.filter(kind='table')
+    
+    def headings(self):
+        return self.filter(kind='heading')
+    
+    def from_engine(self, engine):
+        return self.filter(engine=engine)
+    
+    def containing(self, text):
+        return self.filter(text__icontains=text)
+    
+    def on_page(self, page_number):
+        return self.filter(page__page_number=page_number)
+    
+    def in_region(self, x0, y0, x1, y1, contained=False):
+        """Blocks overlapping (or with contained=True, inside) a rectangle in 0..1 page coordinates"""
+        from .spatial import region_filter
+        return self.filter(region_filter(x0, y0, x1, y1, contained=contained))
+
+
+class Block(models.Model):
+    """A layout block of a page, copied from Page.json_data so it can be queried (see core.blocks)"""
+    page = models.ForeignKey(Page, on_delete=models.CASCADE, related_name='blocks')
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='blocks')
+    ordinal = models.PositiveIntegerField(help_text="Position in the page's block list")
+    type = models.CharField(max_length=50, blank=True, help_text="Block type as written by the OCR engine")
+    kind = models.CharField(max_length=20, help_text="table, formula, heading, paragraph or other")
+    text = models.TextField(blank=True)
+    x0 = models.FloatField(blank=True, null=True)
+    y0 = models.FloatField(blank=True, null=True)
+    x1 = models.FloatField(blank=True, null=True)
+    y1 = models.FloatField(blank=True, null=True)
+    # Rectangle relative to the page size (0..1, origin top left), indexed by core.spatial
+    nx0 = models.FloatField(blank=True, null=True)
+    ny0 = models.FloatField(blank=True, null=True)
+    nx1 = models.FloatField(blank=True, null=True)
+    ny1 = models.FloatField(blank=True, null=True)
+    confidence = models.FloatField(blank=True, null=True)
+    engine = models.CharField(max_length=50, blank=True)
+    
+    objects = BlockQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['page', 'ordinal']
+        verbose_name = 'Block'
+        verbose_name_plural = 'Blocks'
+        constraints = [
+            models.UniqueConstraint(fields=['page', 'ordinal'], name='core_block_page_ordinal'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'engine'], name='core_block_kind_engine'),
+            models.Index(fields=['document', 'kind'], name='core_block_document_kind'),
+            models.Index(fields=['type', 'engine'], name='core_block_type_engine'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} block {self.ordinal} on page {self.page_id}"
+
+
 class Prompt(models.Model):
     """Model for storing LLM prompt templates"""
     
@@ -513,4 +618,79 @@ class Settings(models.Model):
     
     def delete(self, *args, **kwargs):
         """Prevent deletion of settings"""
-        pass
\ No newline at end of file
+        pass
+
+class ExtractionJob(models.Model):
+    """Queued extraction of a document, claimed and run by run_extraction_workers"""
+    
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    document = models.ForeignKey(
+        Document,
+        on_delete=models.CASCADE,
+        related_name='extraction_jobs'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        help_text="Current state of the job"
+    )
+    reprocess = models.BooleanField(
+        default=False,
+        help_text="Delete existing pages before extracting"
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of times a worker has claimed this job"
+    )
+    max_attempts = models.PositiveIntegerField(
+        default=3,
+        help_text="Give up after this many failed attempts"
+    )
+    worker_id = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Identifier of the worker that claimed the job"
+    )
+    error = models.TextField(
+        blank=True,
+        help_text="Error message from the last failed attempt"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Last time the running worker reported progress"
+    )
+    
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = 'Extraction Job'
+        verbose_name_plural = 'Extraction Jobs'
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Extraction of {self.document.title} ({self.status})"
+    
+    @property
+    def duration(self):
+        """Return the run time in seconds, or None if the job has not finished"""
+        if self.started_at and self.finished_at:
+            return (self.finished_at - self.started_at).total_seconds()
+        return None
@@ -4,9 +4,15 @@ import requests
 import base64
 from io import BytesIO
 from django.conf import settings
+import importlib.util
 import logging
 import os
-import sys
+import threading
+
+from .extraction_cache import memoize_page_ocr, memoize_page_ocr_batch
+from .api_client import api_client
+from .model_manager import model_manager
+from .render_cache import render_page
 
 logger = logging.getLogger(__name__)
 
@@ -133,172 +139,179 @@ try:
 except ImportError:
     mineru_available = False
 
-# Try to initialize PaddleOCR (will fail gracefully if not available)
-paddleocr_available = False
-paddleocr_reader = None
-try:
-    from paddleocr import PaddleOCR
-    # use_gpu parameter is deprecated in newer versions - PaddleOCR auto-detects GPU
-    # Initialize with basic parameters that are supported across versions
-    paddleocr_reader = PaddleOCR(use_angle_cls=True, lang='en')
-    paddleocr_available = True
-except ImportError:
-    paddleocr_available = False
-except Exception as e:
-    logger.warning(f"PaddleOCR initialization failed: {str(e)}")
-    # Try with minimal parameters if the above fails
+def _module_available(name):
+    """Return True if a module can be imported, without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+# Models are loaded lazily by the _init_* functions below on first use, so importing
+# this module (every web worker and management command) does not load any weights.
+# The *_available flags only say whether the package is installed until then.
+# Loaded models are owned by model_manager, which unloads them when they exceed
+# the memory budget or sit idle.
+
+# PaddleOCR (will fail gracefully if not available)
+paddleocr_available = _module_available('paddleocr')
+
+def _load_paddleocr():
+    global paddleocr_available
+
     try:
-        paddleocr_reader = PaddleOCR(lang='en')
-        paddleocr_available = True
-        logger.info("PaddleOCR initialized with minimal parameters")
-    except Exception as e2:
-        logger.warning(f"PaddleOCR initialization with minimal parameters also failed: {str(e2)}")
+        from paddleocr import PaddleOCR
+        # use_gpu parameter is deprecated in newer versions - PaddleOCR auto-detects GPU
+        # Initialize with basic parameters that are supported across versions
+        return PaddleOCR(use_angle_cls=True, lang='en')
+    except ImportError:
         paddleocr_available = False
+    except Exception as e:
+        logger.warning(f"PaddleOCR initialization failed: {str(e)}")
+        # Try with minimal parameters if the above fails
+        try:
+            reader = PaddleOCR(lang='en')
+            logger.info("PaddleOCR initialized with minimal parameters")
+            return reader
+        except Exception as e2:
+            logger.warning(f"PaddleOCR initialization with minimal parameters also failed: {str(e2)}")
+            paddleocr_available = False
+    return None
+
+def _init_paddleocr():
+    """Lazily initialize PaddleOCR only when needed. Returns the reader or None."""
+    if not paddleocr_available:
+        return None
+    return model_manager.get('paddleocr', _load_paddleocr)
+
+# TrOCR (Transformer OCR) (will fail gracefully if not available)
+trocr_available = _module_available('transformers')
+
+def _load_trocr():
+    global trocr_available
 
-# Try to initialize TrOCR (Transformer OCR) (will fail gracefully if not available)
-trocr_available = False
-trocr_processor = None
-trocr_model = None
-try:
-    from transformers import TrOCRProcessor, VisionEncoderDecoderModel
-    trocr_processor = TrOCRProcessor.from_pretrained('microsoft/trocr-base-printed')
-    trocr_model = VisionEncoderDecoderModel.from_pretrained('microsoft/trocr-base-printed')
-    trocr_available = True
-except ImportError:
-    trocr_available = False
-except Exception as e:
-    logger.warning(f"TrOCR initialization failed: {str(e)}")
-    trocr_available = False
+    try:
+        from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+        processor = TrOCRProcessor.from_pretrained('microsoft/trocr-base-printed')
+        model = VisionEncoderDecoderModel.from_pretrained('microsoft/trocr-base-printed')
+        return processor, model
+    except Exception as e:
+        logger.warning(f"TrOCR initialization failed: {str(e)}")
+        trocr_available = False
+        return None
 
-# Try to initialize Donut (Document Understanding Transformer) (will fail gracefully if not available)
-donut_available = False
-donut_processor = None
-donut_model = None
-try:
-    from transformers import DonutProcessor, VisionEncoderDecoderModel
-    donut_processor = DonutProcessor.from_pretrained('naver-clova-ix/donut-base')
-    donut_model = VisionEncoderDecoderModel.from_pretrained('naver-clova-ix/donut-base')
-    donut_available = True
-except ImportError:
-    donut_available = False
-except Exception as e:
-    logger.warning(f"Donut initialization failed: {str(e)}")
-    donut_available = False
-
-# Try to initialize LightOnOCR (will fail gracefully if not available)
-# Note: We only check imports at import-time; model weights load lazily.
-lightonocr_available = False
-lightonocr_initialized = False
-lightonocr_processor = None
-lightonocr_model = None
-lightonocr_device = None
-lightonocr_dtype = None
-try:
-    # LightOnOCR support may not exist in all transformers releases
-    from transformers import LightOnOcrForConditionalGeneration, LightOnOcrProcessor  # noqa: F401
-    lightonocr_available = True
-except Exception:
-    # Any error here means LightOnOCR is not available in this environment
-    lightonocr_available = False
+def _init_trocr():
+    """Lazily initialize TrOCR only when needed. Returns (processor, model) or (None, None)."""
+    if not trocr_available:
+        return None, None
+    return model_manager.get('trocr', _load_trocr) or (None, None)
 
-def _init_lightonocr():
-    """Lazily initialize LightOnOCR only when needed."""
-    global lightonocr_initialized, lightonocr_processor, lightonocr_model, lightonocr_device, lightonocr_dtype
+# Donut (Document Understanding Transformer) (will fail gracefully if not available)
+donut_available = _module_available('transformers')
 
-    if lightonocr_initialized:
-        return lightonocr_model, lightonocr_processor
+def _load_donut():
+    global donut_available
 
-    lightonocr_initialized = True
+    try:
+        from transformers import DonutProcessor, VisionEncoderDecoderModel
+        processor = DonutProcessor.from_pretrained('naver-clova-ix/donut-base')
+        model = VisionEncoderDecoderModel.from_pretrained('naver-clova-ix/donut-base')
+        return processor, model
+    except Exception as e:
+        logger.warning(f"Donut initialization failed: {str(e)}")
+        donut_available = False
+        return None
 
-    if not lightonocr_available:
+def _init_donut():
+    """Lazily initialize Donut only when needed. Returns (processor, model) or (None, None)."""
+    if not donut_available:
         return None, None
+    return model_manager.get('donut', _load_donut) or (None, None)
+
+# LightOnOCR (will fail gracefully if not available)
+# Note: LightOnOCR support may not exist in all transformers releases. The classes are
+# checked for when the model is first initialized.
+lightonocr_available = _module_available('transformers')
+
+def _load_lightonocr():
+    global lightonocr_available
 
     try:
         import torch
         from transformers import LightOnOcrForConditionalGeneration, LightOnOcrProcessor
+    except Exception as e:
+        # The installed transformers build has no LightOnOCR support
+        logger.warning(f"LightOnOCR is not available: {str(e)}")
+        lightonocr_available = False
+        return None
 
+    try:
         model_id = getattr(settings, "LIGHTONOCR_MODEL_ID", "lightonai/LightOnOCR-2-1B")
 
         if torch.cuda.is_available():
-            lightonocr_device = "cuda"
+            device = "cuda"
             # Prefer BF16 if supported; otherwise FP16
             try:
-                lightonocr_dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+                dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
             except Exception:
-                lightonocr_dtype = torch.float16
+                dtype = torch.float16
         else:
-            lightonocr_device = "cpu"
-            lightonocr_dtype = torch.float32
+            device = "cpu"
+            dtype = torch.float32
 
-        lightonocr_model = LightOnOcrForConditionalGeneration.from_pretrained(
+        model = LightOnOcrForConditionalGeneration.from_pretrained(
             model_id,
-            torch_dtype=lightonocr_dtype,
+            torch_dtype=dtype,
             low_cpu_mem_usage=True,
-        ).to(lightonocr_device)
-        lightonocr_processor = LightOnOcrProcessor.from_pretrained(model_id)
+        ).to(device)
+        processor = LightOnOcrProcessor.from_pretrained(model_id)
 
-        logger.info(f"LightOnOCR initialized: model_id={model_id}, device={lightonocr_device}, dtype={lightonocr_dtype}")
-        return lightonocr_model, lightonocr_processor
+        logger.info(f"LightOnOCR initialized: model_id={model_id}, device={device}, dtype={dtype}")
+        return model, processor
     except Exception as e:
         logger.warning(f"Failed to initialize LightOnOCR: {str(e)}")
-        lightonocr_model = None
-        lightonocr_processor = None
+        lightonocr_available = False
+        return None
+
+def _init_lightonocr():
+    """Lazily initialize LightOnOCR only when needed. Returns (model, processor) or (None, None)."""
+    if not lightonocr_available:
         return None, None
+    return model_manager.get('lightonocr', _load_lightonocr) or (None, None)
 
-# Try to initialize OLMOCR (will fail gracefully if not available)
-olmocr_available = False
-try:
-    # First try importing the module directly
-    try:
-        import olmocr
-        olmocr_available = True
-        logger.debug("OLMOCR module found via import")
-    except ImportError:
-        # If import fails, try checking if command-line interface is available
-        try:
-            import subprocess
-            import sys
-            # Try to run olmocr.pipeline module to check if it's installed
-            result = subprocess.run(
-                [sys.executable, '-m', 'olmocr.pipeline', '--help'],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            # If command exists (even if help shows error), module is available
-            if 'olmocr' in result.stdout.lower() or 'olmocr' in result.stderr.lower() or result.returncode == 0:
-                olmocr_available = True
-                logger.debug("OLMOCR found via command-line check")
-        except (FileNotFoundError, subprocess.TimeoutExpired, Exception):
-            olmocr_available = False
-except Exception as e:
-    logger.debug(f"OLMOCR not available: {str(e)}")
-    olmocr_available = False
+# OLMOCR (will fail gracefully if not available)
+# Only check that the package is installed; local OLMOCR runs in core.olmocr_worker
+olmocr_available = _module_available('olmocr')
 
 
-def extract_text_with_lightonocr_from_image(img):
-    """Extract text from a PIL Image using LightOnOCR-2-1B (Transformers)."""
-    try:
-        model, processor = _init_lightonocr()
-        if model is None or processor is None:
-            return (
-                "Error: LightOnOCR is not available.\n"
-                "This requires a transformers build that includes LightOnOCR support.\n"
-                "Try installing Transformers from source: pip install git+https://github.com/huggingface/transformers"
-            )
+DONUT_UNAVAILABLE = "Error: Donut is not available"
 
-        import torch
+LIGHTONOCR_UNAVAILABLE = (
+    "Error: LightOnOCR is not available.\n"
+    "This requires a transformers build that includes LightOnOCR support.\n"
+    "Try installing Transformers from source: pip install git+https://github.com/huggingface/transformers"
+)
 
-        max_new_tokens = int(getattr(settings, "LIGHTONOCR_MAX_NEW_TOKENS", 2048))
-        prompt = getattr(
-            settings,
-            "LIGHTONOCR_PROMPT",
-            "Please extract and return all text visible in this image. Return only the text.",
-        )
 
-        # LightOnOCR uses a chat-template style multimodal interface.
-        # Prefer typed multimodal content (image + optional instruction).
-        conversation = [
+def _lightonocr_generate(model, processor, images):
+    """Run LightOnOCR generation on a batch of same-sized PIL images and return their texts"""
+    import torch
+
+    max_new_tokens = int(getattr(settings, "LIGHTONOCR_MAX_NEW_TOKENS", 2048))
+    prompt = getattr(
+        settings,
+        "LIGHTONOCR_PROMPT",
+        "Please extract and return all text visible in this image. Return only the text.",
+    )
+    # Left padding keeps every prompt flush against its generated tokens
+    tokenizer = getattr(processor, "tokenizer", None)
+    if tokenizer is not None:
+        tokenizer.padding_side = "left"
+
+    # LightOnOCR uses a chat-template style multimodal interface.
+    # Prefer typed multimodal content (image + optional instruction).
+    conversations = [
+        [
             {
                 "role": "user",
                 "content": [
@@ -307,52 +320,102 @@ def extract_text_with_lightonocr_from_image(img):
                 ],
             }
         ]
+        for img in images
+    ]
 
-        try:
-            inputs = processor.apply_chat_template(
-                conversation,
-                add_generation_prompt=True,
-                tokenize=True,
-                return_dict=True,
-                return_tensors="pt",
-            )
-        except Exception:
-            # Fallback: try without a text instruction (image-only)
-            conversation = [{"role": "user", "content": [{"type": "image", "image": img}]}]
-            inputs = processor.apply_chat_template(
-                conversation,
-                add_generation_prompt=True,
-                tokenize=True,
-                return_dict=True,
-                return_tensors="pt",
-            )
+    try:
+        inputs = processor.apply_chat_template(
+            conversations,
+            add_generation_prompt=True,
+            tokenize=True,
+            return_dict=True,
+            return_tensors="pt",
+            padding=True,
+        )
+    except Exception:
+        # Fallback: try without a text instruction (image-only)
+        conversations = [[{"role": "user", "content": [{"type": "image", "image": img}]}] for img in images]
+        inputs = processor.apply_chat_template(
+            conversations,
+            add_generation_prompt=True,
+            tokenize=True,
+            return_dict=True,
+            return_tensors="pt",
+            padding=True,
+        )
 
-        # Move tensors to device and cast floats
-        device = lightonocr_device or ("cuda" if torch.cuda.is_available() else "cpu")
-        dtype = lightonocr_dtype or (torch.float16 if device == "cuda" else torch.float32)
-        inputs = {k: (v.to(device=device, dtype=dtype) if v.is_floating_point() else v.to(device)) for k, v in inputs.items()}
+    # Move tensors to device and cast floats
+    device = model.device
+    dtype = model.dtype
+    inputs = {k: (v.to(device=device, dtype=dtype) if v.is_floating_point() else v.to(device)) for k, v in inputs.items()}
+
+    with torch.inference_mode():
+        output_ids = model.generate(**inputs, max_new_tokens=max_new_tokens)
+
+    # Slice out the newly generated tokens
+    generated_ids = output_ids[:, inputs["input_ids"].shape[1] :]
+    output_texts = processor.batch_decode(generated_ids, skip_special_tokens=True)
+    return [(output_text or "").strip() for output_text in output_texts]
 
-        with torch.inference_mode():
-            output_ids = model.generate(**inputs, max_new_tokens=max_new_tokens)
 
-        # Slice out the newly generated tokens
-        generated_ids = output_ids[0, inputs["input_ids"].shape[1] :]
-        output_text = processor.decode(generated_ids, skip_special_tokens=True)
-        return (output_text or "").strip()
+@memoize_page_ocr('lightonocr')
+def extract_text_with_lightonocr_from_image(img):
+    """Extract text from a PIL Image using LightOnOCR-2-1B (Transformers)."""
+    try:
+        model, processor = _init_lightonocr()
+        if model is None or processor is None:
+            return LIGHTONOCR_UNAVAILABLE
+        return _lightonocr_generate(model, processor, [img])[0]
     except Exception as e:
         logger.error(f"Error with LightOnOCR from image: {str(e)}", exc_info=True)
         return f"Error with LightOnOCR: {str(e)}"
 
 
+@memoize_page_ocr_batch('lightonocr')
+def extract_text_with_lightonocr_from_images(images, batch_size=None):
+    """Extract text from several PIL Images with batched LightOnOCR generation
+
+    Images are grouped by size, so pages rendered with the same aspect ratio
+    share a batch without padding and give the same output as
+    extract_text_with_lightonocr_from_image. Each group runs in batches of
+    LIGHTONOCR_BATCH_SIZE.
+
+    Returns:
+        list: Text (or an "Error..." message) for each image, in order
+    """
+    model, processor = _init_lightonocr()
+    if model is None or processor is None:
+        return [LIGHTONOCR_UNAVAILABLE] * len(images)
+
+    batch_size = max(1, batch_size or int(getattr(settings, "LIGHTONOCR_BATCH_SIZE", 4)))
+    buckets = {}
+    for index, img in enumerate(images):
+        buckets.setdefault(img.size, []).append(index)
+
+    texts = [""] * len(images)
+    for indexes in buckets.values():
+        for start in range(0, len(indexes), batch_size):
+            batch = indexes[start:start + batch_size]
+            try:
+                batch_texts = _lightonocr_generate(model, processor, [images[i] for i in batch])
+            except Exception as e:
+                if len(batch) == 1:
+                    logger.error(f"Error with LightOnOCR from image: {str(e)}", exc_info=True)
+                    batch_texts = [f"Error with LightOnOCR: {str(e)}"]
+                else:
+                    # e.g. a processor without batched chat templates - retry page by page
+                    logger.warning(f"Batched LightOnOCR generation failed, retrying {len(batch)} pages one at a time: {str(e)}")
+                    batch_texts = [extract_text_with_lightonocr_from_image.__wrapped__(images[i]) for i in batch]
+            for i, text in zip(batch, batch_texts):
+                texts[i] = text
+    return texts
+
+
 def extract_text_with_lightonocr(file_path, file_type="pdf"):
     """Extract text from an image (or single-page render) using LightOnOCR."""
     try:
         if not lightonocr_available:
-            return (
-                "Error: LightOnOCR is not available.\n"
-                "This requires a transformers build that includes LightOnOCR support.\n"
-                "Try installing Transformers from source: pip install git+https://github.com/huggingface/transformers"
-            )
+            return LIGHTONOCR_UNAVAILABLE
         if file_type == "pdf":
             # Prefer using the app's PDF page pipeline; this function is intended for images.
             return "Error: LightOnOCR PDF extraction is handled page-by-page. Use process_document_file() pipeline."
@@ -362,15 +425,92 @@ def extract_text_with_lightonocr(file_path, file_type="pdf"):
         logger.error(f"Error with LightOnOCR: {str(e)}", exc_info=True)
         return f"Error with LightOnOCR: {str(e)}"
 
+def lightonocr_render_scale(page):
+    """Return the render scale that brings a page's longest side to LIGHTONOCR_TARGET_LONGEST_DIM"""
+    try:
+        target_longest_dim = int(getattr(settings, "LIGHTONOCR_TARGET_LONGEST_DIM", 1540))
+    except Exception:
+        target_longest_dim = 1540
+    rect = page.rect
+    longest = max(float(rect.width), float(rect.height)) if rect else 0.0
+    scale = (target_longest_dim / longest) if longest and target_longest_dim else 2.5
+    # Clamp to a reasonable range to avoid huge renders
+    return min(max(scale, 0.5), 6.0), target_longest_dim
+
+
+def lightonocr_pdf_pages(file_path):
+    """Render the pages of a PDF and OCR them with batched LightOnOCR
+
+    Pages are rendered and recognised a window of a few batches at a time so
+    long documents are not held in memory as images all at once.
+
+    Yields:
+        tuple: (page_number, text, width, height, target_longest_dim, error) in page
+        order; error is the failure message of a page that could not be recognised
+    """
+    window = max(1, int(getattr(settings, "LIGHTONOCR_BATCH_SIZE", 4))) * 4
+    doc = fitz.open(file_path)
+    try:
+        for window_start in range(0, len(doc), window):
+            rendered = []
+            for page_num in range(window_start, min(window_start + window, len(doc))):
+                page = doc.load_page(page_num)
+                scale, target_longest_dim = lightonocr_render_scale(page)
+                
+                img = render_page(page, scale)
+                rendered.append((page_num + 1, img, target_longest_dim))
+            
+            texts = extract_text_with_lightonocr_from_images([img for _, img, _ in rendered])
+            for (page_number, img, target_longest_dim), page_text in zip(rendered, texts):
+                error = None
+                if page_text and page_text.startswith("Error"):
+                    logger.warning(f"LightOnOCR failed for page {page_number}: {page_text}")
+                    error = page_text
+                    page_text = ""
+                yield page_number, (page_text or "").strip(), img.width, img.height, target_longest_dim, error
+    finally:
+        doc.close()
+
+
+def extract_pages_with_lightonocr(file_path):
+    """OCR every page of a PDF with LightOnOCR, regardless of text layer
+    
+    Returns:
+        list: List of dictionaries with page_number, text and json_data
+    """
+    pages_data = []
+    for page_number, page_text, width, height, target_longest_dim, error in lightonocr_pdf_pages(file_path):
+        json_data = {
+            "ocr_engine": "lightonocr",
+            "page_number": page_number,
+            "text": page_text,
+            "has_ocr": True,
+            "extraction_method": "vlm",
+            "page_width": width,
+            "page_height": height,
+            "model_id": getattr(settings, "LIGHTONOCR_MODEL_ID", "lightonai/LightOnOCR-2-1B"),
+            "target_longest_dim": target_longest_dim,
+        }
+        if error:
+            json_data["ocr_error"] = error
+        pages_data.append({
+            'page_number': page_number,
+            'text': page_text,
+            'json_data': json_data,
+        })
+        logger.info(f"Extracted page {page_number} with LightOnOCR (text length: {len(page_text)})")
+    return pages_data
+
+
 def extract_text_with_tesseract(image_path):
     """Extract text from an image using Tesseract OCR"""
-    if pytesseract is None:
+    if not tesseract_available():
         return "Error: pytesseract is not installed. Install it with: pip install pytesseract"
     try:
         # Open the image with PIL
         image = Image.open(image_path)
         # Use Tesseract to extract text
-        text = pytesseract.image_to_string(image)
+        text, _ = ocr_image_with_tesseract(image)
         return text.strip()
     except Exception as e:
         error_msg = str(e)
@@ -391,6 +531,99 @@ def extract_text_with_tesseract(image_path):
         return f"Error with Tesseract OCR: {error_msg}"
 
 
+# tesserocr binds the Tesseract API in-process. Each thread keeps one API with the
+# language data loaded, so page workers (see core.parallel) stay warm between pages
+# instead of starting a tesseract process per call as pytesseract does.
+tesserocr_available = _module_available('tesserocr')
+_tesserocr_local = threading.local()
+
+
+def tesseract_available():
+    """Return True if Tesseract can be used through tesserocr or pytesseract"""
+    return tesserocr_available or pytesseract is not None
+
+
+def _tesserocr_api():
+    """Return this thread's tesserocr API, creating it on first use"""
+    api = getattr(_tesserocr_local, 'api', None)
+    if api is None:
+        import tesserocr
+        api = tesserocr.PyTessBaseAPI(lang=getattr(settings, 'TESSERACT_LANG', 'eng'))
+        _tesserocr_local.api = api
+    return api
+
+
+def _tesserocr_words(img):
+    """Recognise a PIL image once with tesserocr and return its words"""
+    import tesserocr
+    
+    api = _tesserocr_api()
+    api.SetImage(img)
+    api.Recognize()
+    
+    words = []
+    line = 0
+    iterator = api.GetIterator()
+    for word in tesserocr.iterate_level(iterator, tesserocr.RIL.WORD):
+        if word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+            line += 1
+        text = word.GetUTF8Text(tesserocr.RIL.WORD)
+        box = word.BoundingBox(tesserocr.RIL.WORD)
+        if not text or box is None:
+            continue
+        x0, y0, x1, y1 = box
+        words.append({
+            'text': text,
+            'bbox': [x0, y0, x1 - x0, y1 - y0],
+            'conf': word.Confidence(tesserocr.RIL.WORD),
+            'line': line,
+        })
+    return words
+
+
+def _pytesseract_words(img):
+    """Recognise a PIL image with a single pytesseract.image_to_data call and return its words"""
+    data = pytesseract.image_to_data(
+        img, lang=getattr(settings, 'TESSERACT_LANG', 'eng'), output_type=pytesseract.Output.DICT
+    )
+    return [
+        {
+            'text': data['text'][i],
+            'bbox': [data['left'][i], data['top'][i], data['width'][i], data['height'][i]],
+            'conf': float(data['conf'][i]),
+            'line': (data['block_num'][i], data['par_num'][i], data['line_num'][i]),
+        }
+        for i in range(len(data['text']))
+    ]
+
+
+def ocr_image_with_tesseract(img):
+    """Run Tesseract on a PIL image and return (text, blocks) with word bounding boxes
+    
+    Text and word boxes come from the same recognition pass, through tesserocr
+    when it is installed and pytesseract.image_to_data otherwise.
+    """
+    words = _tesserocr_words(img) if tesserocr_available else _pytesseract_words(img)
+    
+    lines = {}
+    blocks = []
+    for word in words:
+        text_item = word['text'].strip()
+        if text_item and int(word['conf']) > 0:
+            lines.setdefault(word['line'], []).append(text_item)
+            # Bounding box [x, y, width, height]
+            x, y, w, h = word['bbox']
+            if w > 0 and h > 0:
+                blocks.append({
+                    'type': 'text_line',
+                    'text': text_item,
+                    'bbox': [x, y, w, h],
+                    'confidence': word['conf'] / 100.0,
+                    'extraction_method': 'ocr'
+                })
+    return "\n".join(" ".join(line_words) for line_words in lines.values()), blocks
+
+
 def extract_text_with_mineru(file_path, file_type='pdf'):
     """Extract text from a PDF or image using MinerU"""
     if not mineru_available or mineru_do_parse is None:
@@ -453,6 +686,59 @@ def extract_text_with_mineru(file_path, file_type='pdf'):
         return f"Error with MinerU: {str(e)}"
 
 
+def _mineru_pages_from_middle_json(middle_json):
+    """Split MinerU middle JSON into page dictionaries with page_number, text and json_data"""
+    pages_data = []
+    # Extract page-by-page data
+    if 'pages' in middle_json:
+        for idx, page_data in enumerate(middle_json['pages'], start=1):
+            page_info = {
+                'page_number': idx,
+                'text': '',
+                'json_data': page_data  # Store full page JSON
+            }
+            
+            # Extract text from blocks
+            text_parts = []
+            if 'blocks' in page_data:
+                for block in page_data['blocks']:
+                    if 'text' in block:
+                        text_parts.append(block['text'])
+            page_info['text'] = '\n\n'.join(text_parts)
+            
+            pages_data.append(page_info)
+    else:
+        # Single page or unknown format
+        text_parts = []
+        if 'blocks' in middle_json:
+            for block in middle_json['blocks']:
+                if 'text' in block:
+                    text_parts.append(block['text'])
+        pages_data.append({
+            'page_number': 1,
+            'text': '\n\n'.join(text_parts),
+            'json_data': middle_json
+        })
+    return pages_data
+
+
+def _pymupdf_direct_pages(file_path):
+    """Page dictionaries from the PDF text layer, used when MinerU produced no pages"""
+    import fitz
+    pages_data = []
+    doc = fitz.open(file_path)
+    for page_num in range(len(doc)):
+        page = doc.load_page(page_num)
+        page_text = page.get_text()
+        pages_data.append({
+            'page_number': page_num + 1,
+            'text': page_text,
+            'json_data': {'text': page_text, 'extracted_directly': True}
+        })
+    doc.close()
+    return pages_data
+
+
 def extract_pages_with_mineru_json(file_path):
     """Extract page-by-page JSON data from PDF using MinerU
     
@@ -462,10 +748,38 @@ def extract_pages_with_mineru_json(file_path):
             - text: str
             - json_data: dict (structured MinerU output)
         Returns empty list if MinerU is not available
+    
+    PDFs longer than MINERU_WINDOW_PAGES are parsed one page window at a time
+    (see core.mineru_windows).
+    """
+    from .mineru_windows import extract_pages_with_mineru_windows, mineru_window_pages
+    
+    window_pages = mineru_window_pages()
+    if window_pages and mineru_available:
+        try:
+            with fitz.open(file_path) as doc:
+                page_count = len(doc)
+        except Exception:
+            page_count = 0
+        if page_count > window_pages:
+            return extract_pages_with_mineru_windows(file_path, window_pages)
+    return extract_pages_with_mineru_json_batch([file_path])[0]
+
+
+def extract_pages_with_mineru_json_batch(file_paths):
+    """Extract several PDFs with a single MinerU do_parse call
+    
+    Model warm-up and layout model setup are paid once for the whole batch.
+    If the batch fails, each file is retried on its own so one bad PDF does
+    not fail the others.
+    
+    Returns:
+        list: One list of page dictionaries (as extract_pages_with_mineru_json)
+        per file, in the same order. A file's list is empty if MinerU failed.
     """
     if not mineru_available or mineru_do_parse is None:
         logger.warning("MinerU is not installed. Returning empty page data.")
-        return []  # Return empty list if MinerU is not installed
+        return [[] for _ in file_paths]  # Return empty lists if MinerU is not installed
     
     try:
         import tempfile
@@ -473,18 +787,17 @@ def extract_pages_with_mineru_json(file_path):
         import json
         from pathlib import Path
         
-        # Read PDF bytes
-        with open(file_path, 'rb') as f:
-            pdf_bytes = f.read()
+        # Names must be unique within the batch; MinerU writes one output folder per name
+        pdf_file_names = [f"{index:04d}_{Path(file_path).stem}" for index, file_path in enumerate(file_paths)]
+        pdf_bytes_list = []
+        for file_path in file_paths:
+            with open(file_path, 'rb') as f:
+                pdf_bytes_list.append(f.read())
+        lang_list = ['en'] * len(file_paths)  # Default to English, can be made configurable
         
         # Create temporary output directory
         with tempfile.TemporaryDirectory() as temp_dir:
-            pdf_file_name = Path(file_path).stem
-            pdf_file_names = [pdf_file_name]
-            pdf_bytes_list = [pdf_bytes]
-            lang_list = ['en']  # Default to English, can be made configurable
-            
-            # Process PDF with MinerU
+            # Process PDFs with MinerU
             mineru_do_parse(
                 output_dir=temp_dir,
                 pdf_file_names=pdf_file_names,
@@ -497,64 +810,31 @@ def extract_pages_with_mineru_json(file_path):
                 f_dump_middle_json=True,
                 f_dump_md=True,
             )
+            del pdf_bytes_list
             
-            # Read the middle JSON output
-            middle_json_path = os.path.join(temp_dir, pdf_file_name, 'auto', 'middle_json.json')
-            pages_data = []
-            
-            if os.path.exists(middle_json_path):
-                with open(middle_json_path, 'r', encoding='utf-8') as f:
-                    middle_json = json.load(f)
-                    
-                    # Extract page-by-page data
-                    if 'pages' in middle_json:
-                        for idx, page_data in enumerate(middle_json['pages'], start=1):
-                            page_info = {
-                                'page_number': idx,
-                                'text': '',
-                                'json_data': page_data  # Store full page JSON
-                            }
-                            
-                            # Extract text from blocks
-                            text_parts = []
-                            if 'blocks' in page_data:
-                                for block in page_data['blocks']:
-                                    if 'text' in block:
-                                        text_parts.append(block['text'])
-                            page_info['text'] = '\n\n'.join(text_parts)
-                            
-                            pages_data.append(page_info)
-                    else:
-                        # Single page or unknown format
-                        text_parts = []
-                        if 'blocks' in middle_json:
-                            for block in middle_json['blocks']:
-                                if 'text' in block:
-                                    text_parts.append(block['text'])
-                        pages_data.append({
-                            'page_number': 1,
-                            'text': '\n\n'.join(text_parts),
-                            'json_data': middle_json
-                        })
-            
-            # If no pages found, try to extract from PDF directly as fallback
-            if not pages_data:
-                import fitz
-                doc = fitz.open(file_path)
-                for page_num in range(len(doc)):
-                    page = doc.load_page(page_num)
-                    page_text = page.get_text()
-                    pages_data.append({
-                        'page_number': page_num + 1,
-                        'text': page_text,
-                        'json_data': {'text': page_text, 'extracted_directly': True}
-                    })
-                doc.close()
+            results = []
+            for file_path, pdf_file_name in zip(file_paths, pdf_file_names):
+                # Read the middle JSON output
+                middle_json_path = os.path.join(temp_dir, pdf_file_name, 'auto', 'middle_json.json')
+                pages_data = []
+                if os.path.exists(middle_json_path):
+                    with open(middle_json_path, 'r', encoding='utf-8') as f:
+                        pages_data = _mineru_pages_from_middle_json(json.load(f))
+                
+                # If no pages found, try to extract from PDF directly as fallback
+                if not pages_data:
+                    pages_data = _pymupdf_direct_pages(file_path)
+                results.append(pages_data)
             
-            return pages_data
+            if len(file_paths) > 1:
+                logger.info(f"MinerU parsed {len(file_paths)} documents ({sum(len(pages) for pages in results)} pages) in one batch")
+            return results
     except Exception as e:
+        if len(file_paths) > 1:
+            logger.warning(f"MinerU batch of {len(file_paths)} documents failed, parsing them one at a time: {str(e)}")
+            return [extract_pages_with_mineru_json_batch([file_path])[0] for file_path in file_paths]
         logger.error(f"Error extracting pages with MinerU: {str(e)}", exc_info=True)
-        return []  # Return empty list on error
+        return [[]]  # Return empty list on error
 
 
 def extract_text_with_deepseek(image_path):
@@ -607,7 +887,7 @@ def extract_text_with_deepseek(image_path):
 
 
 def extract_text_with_deepseek_ollama(image_path):
-    """Extract text from an image using Ollama vision model for OCR"""
+    """Extract text from an image file (or encoded image bytes) using Ollama vision model for OCR"""
     try:
         import ollama
         
@@ -620,9 +900,12 @@ def extract_text_with_deepseek_ollama(image_path):
             import os
             os.environ['OLLAMA_HOST'] = ollama_host
         
-        # Read image file and encode to base64
-        with open(image_path, 'rb') as f:
-            image_data = f.read()
+        # Accept encoded image bytes from extract_text_with_deepseek_from_image, or read the file
+        if isinstance(image_path, bytes):
+            image_data = image_path
+        else:
+            with open(image_path, 'rb') as f:
+                image_data = f.read()
         image_base64 = base64.b64encode(image_data).decode('utf-8')
         
         # Create prompt for OCR
@@ -661,81 +944,65 @@ def extract_text_with_deepseek_ollama(image_path):
         return f"Error with DeepSeek OCR (Ollama): {str(e)}"
 
 
+def image_to_png_bytes(img):
+    """Encode a PIL image as PNG in memory for a remote OCR service
+
+    Uses fast (level 1) compression: page images are sent once, so encoding
+    time matters more than a few extra bytes on the wire.
+    """
+    buffer = BytesIO()
+    img.save(buffer, format='PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+def _remote_ocr_result_text(response, keys=('text', 'result')):
+    """Return the text from a remote OCR service's JSON answer"""
+    result = response.json()
+    if isinstance(result, dict):
+        for key in keys:
+            if key in result:
+                return result[key]
+    return str(result)
+
+
+def _deepseek_api_text(image_data, api_url):
+    """Send encoded image bytes to the DeepSeek OCR API server and return its text"""
+    # Try common API endpoints; the client remembers the one that answers
+    endpoints = [
+        f'{api_url}/api/ocr',
+        f'{api_url}/ocr',
+        f'{api_url}/api/v1/ocr',
+        f'{api_url}/recognize',
+    ]
+    try:
+        # Try JSON payload with base64 image, then multipart form data
+        response = api_client.post_first(endpoints, json={'image': base64.b64encode(image_data).decode('utf-8')})
+        if response is None:
+            response = api_client.post_first(endpoints, files={'image': ('image.png', image_data)})
+        # If all endpoints fail, try direct file upload
+        if response is None:
+            response = api_client.post_first([f'{api_url}/upload'], files={'file': ('image.png', image_data)})
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"DeepSeek OCR API request failed: {str(e)}")
+        response = None
+    
+    if response is None:
+        return f"Error: Could not connect to DeepSeek OCR API at {api_url}. Please ensure the service is running."
+    return _remote_ocr_result_text(response)
+
+
 def extract_text_with_deepseek_api(image_path, api_url='http://localhost:8001'):
     """Extract text from an image using DeepSeek OCR local API server"""
     try:
         # Read image file
         with open(image_path, 'rb') as f:
             image_data = f.read()
-        
-        # Encode image to base64
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
-        
-        # Prepare API request
-        # Try common API endpoints
-        endpoints = [
-            f'{api_url}/api/ocr',
-            f'{api_url}/ocr',
-            f'{api_url}/api/v1/ocr',
-            f'{api_url}/recognize',
-        ]
-        
-        for endpoint in endpoints:
-            try:
-                # Try JSON payload with base64 image
-                response = requests.post(
-                    endpoint,
-                    json={'image': image_base64},
-                    timeout=30
-                )
-                if response.status_code == 200:
-                    result = response.json()
-                    # Handle different response formats
-                    if isinstance(result, dict):
-                        return result.get('text', result.get('result', str(result)))
-                    return str(result)
-            except requests.exceptions.RequestException:
-                continue
-            
-            try:
-                # Try multipart form data
-                with open(image_path, 'rb') as f:
-                    files = {'image': f}
-                    response = requests.post(
-                        endpoint,
-                        files=files,
-                        timeout=30
-                    )
-                if response.status_code == 200:
-                    result = response.json()
-                    if isinstance(result, dict):
-                        return result.get('text', result.get('result', str(result)))
-                    return str(result)
-            except requests.exceptions.RequestException:
-                continue
-        
-        # If all endpoints fail, try direct file upload
-        try:
-            with open(image_path, 'rb') as f:
-                files = {'file': f}
-                response = requests.post(
-                    f'{api_url}/upload',
-                    files=files,
-                    timeout=30
-                )
-            if response.status_code == 200:
-                result = response.json()
-                if isinstance(result, dict):
-                    return result.get('text', result.get('result', str(result)))
-                return str(result)
-        except requests.exceptions.RequestException:
-            pass
-        
-        return f"Error: Could not connect to DeepSeek OCR API at {api_url}. Please ensure the service is running."
+        return _deepseek_api_text(image_data, api_url)
     except Exception as e:
         return f"Error with DeepSeek OCR API: {str(e)}"
 
 
+@memoize_page_ocr('deepseek')
 def extract_text_with_deepseek_from_image(img, api_url=None):
     """Extract text from PIL Image using DeepSeek OCR (Ollama, API, or direct)"""
     try:
@@ -749,52 +1016,10 @@ def extract_text_with_deepseek_from_image(img, api_url=None):
         # Ollama has priority - if enabled, use it exclusively
         if use_ollama:
             logger.info("Using Ollama for DeepSeek OCR (from image)")
-            # Save PIL Image to temporary file and use Ollama
-            import tempfile
-            with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
-                img.save(tmp_file.name, format='PNG')
-                tmp_path = tmp_file.name
-            try:
-                result = extract_text_with_deepseek_ollama(tmp_path)
-                # If Ollama returns an error, don't fall back to API - just return the error
-                if result and result.startswith("Error"):
-                    return result
-                return result
-            finally:
-                # Clean up temporary file
-                try:
-                    os.unlink(tmp_path)
-                except:
-                    pass
+            # If Ollama returns an error, don't fall back to API - just return the error
+            return extract_text_with_deepseek_ollama(image_to_png_bytes(img))
         elif use_api:
-            # Convert PIL Image to bytes for API
-            img_bytes = BytesIO()
-            img.save(img_bytes, format='PNG')
-            img_bytes.seek(0)
-            image_base64 = base64.b64encode(img_bytes.read()).decode('utf-8')
-            
-            endpoints = [
-                f'{api_url}/api/ocr',
-                f'{api_url}/ocr',
-                f'{api_url}/api/v1/ocr',
-            ]
-            
-            for endpoint in endpoints:
-                try:
-                    response = requests.post(
-                        endpoint,
-                        json={'image': image_base64},
-                        timeout=30
-                    )
-                    if response.status_code == 200:
-                        result = response.json()
-                        if isinstance(result, dict):
-                            return result.get('text', result.get('result', str(result)))
-                        return str(result)
-                except requests.exceptions.RequestException:
-                    continue
-            
-            return "Error: Could not connect to DeepSeek OCR API"
+            return _deepseek_api_text(image_to_png_bytes(img), api_url)
         else:
             # Use direct package (lazy initialization)
             deepseek_ocr_instance = _init_deepseek_ocr()
@@ -816,7 +1041,8 @@ def extract_text_with_deepseek_from_image(img, api_url=None):
 
 def extract_text_with_paddleocr(file_path, file_type='pdf'):
     """Extract text from a PDF or image using PaddleOCR"""
-    if not paddleocr_available or paddleocr_reader is None:
+    paddleocr_reader = _init_paddleocr()
+    if paddleocr_reader is None:
         return "Error: PaddleOCR is not installed. Install it with: pip install paddlepaddle paddleocr"
     
     try:
@@ -827,9 +1053,7 @@ def extract_text_with_paddleocr(file_path, file_type='pdf'):
             text_parts = []
             
             for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                pix = page.get_pixmap()
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+                img = render_page(doc.load_page(page_num))
                 
                 # Convert PIL Image to numpy array for PaddleOCR
                 import numpy as np
@@ -869,9 +1093,69 @@ def extract_text_with_paddleocr(file_path, file_type='pdf'):
         return f"Error with PaddleOCR: {str(e)}"
 
 
+def ocr_image_with_paddleocr(img):
+    """Run PaddleOCR on a PIL image and return (text, blocks) with line bounding boxes"""
+    import numpy as np
+    paddleocr_reader = _init_paddleocr()
+    if paddleocr_reader is None:
+        raise RuntimeError("PaddleOCR is not available")
+    result = paddleocr_reader.ocr(np.array(img), cls=True)
+    
+    blocks = []
+    text_parts = []
+    if result and result[0]:
+        for line in result[0]:
+            if line and len(line) >= 2:
+                # line[0] contains bounding box coordinates: [[x1,y1], [x2,y2], [x3,y3], [x4,y4]]
+                # line[1] contains (text, confidence)
+                bbox_coords = line[0]
+                text = line[1][0]
+                confidence = line[1][1] if len(line[1]) > 1 else 1.0
+                text_parts.append(text)
+                
+                # Convert bbox to [x, y, width, height] format
+                if bbox_coords and len(bbox_coords) >= 4:
+                    x_coords = [point[0] for point in bbox_coords]
+                    y_coords = [point[1] for point in bbox_coords]
+                    x_min = min(x_coords)
+                    y_min = min(y_coords)
+                    x_max = max(x_coords)
+                    y_max = max(y_coords)
+                    
+                    blocks.append({
+                        'type': 'text_line',
+                        'text': text,
+                        'bbox': [x_min, y_min, x_max - x_min, y_max - y_min],
+                        'confidence': confidence,
+                        'bbox_coords': bbox_coords,
+                        'extraction_method': 'ocr'
+                    })
+    return "\n".join(text_parts), blocks
+
+
+def _paddleocr_layout_page(page):
+    """Render one PDF page and return its PaddleOCR page data"""
+    img = render_page(page)
+    text, blocks = ocr_image_with_paddleocr(img)
+    
+    # Create page data structure similar to MinerU format
+    return {
+        'page_number': page.number + 1,
+        'text': text,
+        'json_data': {
+            'blocks': blocks,
+            'ocr_engine': 'paddleocr',
+            'page_width': img.width,
+            'page_height': img.height
+        }
+    }
+
+
 def extract_pages_with_paddleocr_layout(file_path):
     """Extract page-by-page data with layout information from PDF using PaddleOCR
     
+    Pages are sharded across EXTRACTION_PAGE_WORKERS['paddleocr'] processes.
+    
     Returns:
         list: List of dictionaries, each containing:
             - page_number: int
@@ -879,77 +1163,13 @@ def extract_pages_with_paddleocr_layout(file_path):
             - json_data: dict (with bounding boxes and layout information)
         Returns empty list if PaddleOCR is not available
     """
-    if not paddleocr_available or paddleocr_reader is None:
+    if _init_paddleocr() is None:
         logger.warning("PaddleOCR is not installed. Returning empty page data.")
         return []
     
     try:
-        import fitz
-        import numpy as np
-        pages_data = []
-        
-        doc = fitz.open(file_path)
-        
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            pix = page.get_pixmap()
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            img_array = np.array(img)
-            
-            # Run OCR with layout information
-            result = paddleocr_reader.ocr(img_array, cls=True)
-            
-            # Build structured data with bounding boxes
-            blocks = []
-            text_parts = []
-            
-            if result and result[0]:
-                for line in result[0]:
-                    if line and len(line) >= 2:
-                        # line[0] contains bounding box coordinates: [[x1,y1], [x2,y2], [x3,y3], [x4,y4]]
-                        # line[1] contains (text, confidence)
-                        bbox_coords = line[0]
-                        text = line[1][0]
-                        confidence = line[1][1] if len(line[1]) > 1 else 1.0
-                        
-                        # Convert bbox to [x, y, width, height] format
-                        if bbox_coords and len(bbox_coords) >= 4:
-                            x_coords = [point[0] for point in bbox_coords]
-                            y_coords = [point[1] for point in bbox_coords]
-                            x_min = min(x_coords)
-                            y_min = min(y_coords)
-                            x_max = max(x_coords)
-                            y_max = max(y_coords)
-                            
-                            bbox = [x_min, y_min, x_max - x_min, y_max - y_min]
-                        else:
-                            bbox = None
-                        
-                        blocks.append({
-                            'type': 'text_line',
-                            'text': text,
-                            'bbox': bbox,
-                            'confidence': confidence,
-                            'bbox_coords': bbox_coords
-                        })
-                        text_parts.append(text)
-            
-            # Create page data structure similar to MinerU format
-            page_info = {
-                'page_number': page_num + 1,
-                'text': '\n'.join(text_parts),
-                'json_data': {
-                    'blocks': blocks,
-                    'ocr_engine': 'paddleocr',
-                    'page_width': pix.width,
-                    'page_height': pix.height
-                }
-            }
-            
-            pages_data.append(page_info)
-        
-        doc.close()
-        return pages_data
+        from .parallel import map_pages
+        return list(map_pages(file_path, _paddleocr_layout_page, 'paddleocr'))
     except Exception as e:
         logger.error(f"Error extracting pages with PaddleOCR layout: {str(e)}", exc_info=True)
         return []
@@ -957,12 +1177,12 @@ def extract_pages_with_paddleocr_layout(file_path):
 
 def extract_text_with_trocr(file_path, file_type='pdf'):
     """Extract text from a PDF or image using TrOCR (Transformer OCR)"""
-    if not trocr_available or trocr_processor is None or trocr_model is None:
+    trocr_processor, trocr_model = _init_trocr()
+    if trocr_processor is None or trocr_model is None:
         return "Error: TrOCR is not installed. Install it with: pip install transformers torch"
     
     try:
         from PIL import Image
-        import torch
         
         if file_type == 'pdf':
             # For PDFs, convert pages to images first
@@ -971,14 +1191,10 @@ def extract_text_with_trocr(file_path, file_type='pdf'):
             text_parts = []
             
             for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                pix = page.get_pixmap()
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+                img = render_page(doc.load_page(page_num))
                 
                 # Process with TrOCR
-                pixel_values = trocr_processor(images=img, return_tensors="pt").pixel_values
-                generated_ids = trocr_model.generate(pixel_values)
-                generated_text = trocr_processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
+                generated_text, _ = ocr_image_with_trocr(img)
                 
                 text_parts.append(f"--- Page {page_num + 1} ---\n{generated_text}\n")
             
@@ -987,15 +1203,71 @@ def extract_text_with_trocr(file_path, file_type='pdf'):
         else:
             # For images
             img = Image.open(file_path).convert('RGB')
-            pixel_values = trocr_processor(images=img, return_tensors="pt").pixel_values
-            generated_ids = trocr_model.generate(pixel_values)
-            generated_text = trocr_processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
+            generated_text, _ = ocr_image_with_trocr(img)
             return generated_text.strip()
     except Exception as e:
         logger.error(f"Error with TrOCR: {str(e)}", exc_info=True)
         return f"Error with TrOCR: {str(e)}"
 
 
+def segment_text_lines(img, min_line_height=4, padding=2):
+    """Find text lines in a page image with a horizontal projection profile
+    
+    Rows containing dark pixels are grouped into bands; each band is trimmed to
+    the columns that contain ink.
+    
+    Returns:
+        list: [x, y, width, height] line boxes in image pixels, top to bottom
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return [[0, 0, img.width, img.height]]
+    
+    gray = np.asarray(img.convert('L'))
+    # Ink is anything clearly darker than the (mostly white) page background
+    ink = gray < min(160, int(gray.mean()) - 20)
+    rows = ink.any(axis=1)
+    
+    lines = []
+    band_start = None
+    for y, has_ink in enumerate(list(rows) + [False]):
+        if has_ink and band_start is None:
+            band_start = y
+        elif not has_ink and band_start is not None:
+            if y - band_start >= min_line_height:
+                columns = np.flatnonzero(ink[band_start:y].any(axis=0))
+                x0 = max(0, int(columns[0]) - padding)
+                x1 = min(img.width, int(columns[-1]) + 1 + padding)
+                y0 = max(0, band_start - padding)
+                y1 = min(img.height, y + padding)
+                lines.append([x0, y0, x1 - x0, y1 - y0])
+            band_start = None
+    return lines
+
+
+def recognize_lines_with_trocr(line_images, batch_size=None):
+    """Recognise single-line PIL images with TrOCR, TROCR_BATCH_SIZE lines per generate call
+    
+    The processor resizes every crop to the model's input size, so lines of any
+    width share a batch.
+    """
+    trocr_processor, trocr_model = _init_trocr()
+    if trocr_processor is None or trocr_model is None:
+        raise RuntimeError("TrOCR is not available")
+    import torch
+    
+    batch_size = max(1, batch_size or int(getattr(settings, 'TROCR_BATCH_SIZE', 16)))
+    texts = []
+    for start in range(0, len(line_images), batch_size):
+        batch = line_images[start:start + batch_size]
+        pixel_values = trocr_processor(images=batch, return_tensors="pt").pixel_values
+        with torch.inference_mode():
+            generated_ids = trocr_model.generate(pixel_values.to(trocr_model.device))
+        texts.extend(text.strip() for text in trocr_processor.batch_decode(generated_ids, skip_special_tokens=True))
+    return texts
+
+
 def extract_text_with_pdfplumber(file_path, file_type='pdf'):
     """Extract text from a PDF using pdfplumber library"""
     if not pdfplumber_available or pdfplumber is None:
@@ -1018,134 +1290,306 @@ def extract_text_with_pdfplumber(file_path, file_type='pdf'):
         return f"Error with pdfplumber: {str(e)}"
 
 
-def extract_text_with_donut(file_path, file_type='pdf'):
-    """Extract text from a PDF or image using Donut (Document Understanding Transformer)"""
-    if not donut_available or donut_processor is None or donut_model is None:
-        return "Error: Donut is not installed. Install it with: pip install transformers torch"
+def _pdfplumber_line_blocks(page):
+    """Group pdfplumber words into text_line blocks with [x, y, width, height] bboxes"""
+    blocks = []
+    words = page.extract_words()
+    if not words:
+        return blocks
     
-    try:
-        from PIL import Image
-        import torch
-        
-        if file_type == 'pdf':
-            # For PDFs, convert pages to images first
-            import fitz
-            doc = fitz.open(file_path)
-            text_parts = []
+    # Group words into lines based on y-coordinate similarity
+    line_groups = {}
+    for word in words:
+        y_coord = round(word.get('top', 0) / 10) * 10  # Round to nearest 10px for grouping
+        line_groups.setdefault(y_coord, []).append(word)
+    
+    # Create blocks for each line
+    for y_coord in sorted(line_groups.keys()):
+        line_words = sorted(line_groups[y_coord], key=lambda w: w.get('x0', 0))
+        line_text = ' '.join([w.get('text', '') for w in line_words if w.get('text', '').strip()])
+        if line_text.strip():
+            # Calculate bounding box for the line
+            x_min = min(w.get('x0', 0) for w in line_words)
+            y_min = min(w.get('top', 0) for w in line_words)
+            x_max = max(w.get('x1', 0) for w in line_words)
+            y_max = max(w.get('bottom', 0) for w in line_words)
             
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                pix = page.get_pixmap()
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                
-                # Process with Donut
-                pixel_values = donut_processor(images=img, return_tensors="pt").pixel_values
-                decoder_input_ids = donut_processor.tokenizer(
-                    "<s_cord-v2>", add_special_tokens=False, return_tensors="pt"
-                ).input_ids
-                
-                outputs = donut_model.generate(
-                    pixel_values,
-                    decoder_input_ids=decoder_input_ids,
-                    max_length=donut_model.decoder.config.max_position_embeddings,
-                    early_stopping=True,
-                    pad_token_id=donut_processor.tokenizer.pad_token_id,
-                    eos_token_id=donut_processor.tokenizer.eos_token_id,
-                    use_cache=True,
-                    num_beams=1,
-                    bad_words_ids=[[donut_processor.tokenizer.unk_token_id]],
-                    return_dict_in_generate=True,
-                )
-                
-                sequence = donut_processor.batch_decode(outputs.sequences)[0]
-                sequence = sequence.replace(donut_processor.tokenizer.eos_token, "").replace(
-                    donut_processor.tokenizer.pad_token, ""
-                )
-                sequence = donut_processor.token2json(sequence)
-                
-                # Extract text from JSON structure
-                text = ""
-                if isinstance(sequence, dict):
-                    # Try to extract text from common keys
-                    for key in ['text', 'text_sequence', 'texts', 'content']:
-                        if key in sequence:
-                            if isinstance(sequence[key], list):
-                                text = "\n".join(str(item) for item in sequence[key])
-                            else:
-                                text = str(sequence[key])
-                            break
-                    if not text:
-                        text = str(sequence)
-                else:
-                    text = str(sequence)
+            blocks.append({
+                'type': 'text_line',
+                'text': line_text.strip(),
+                'bbox': [x_min, y_min, x_max - x_min, y_max - y_min],
+                'extraction_method': 'direct'
+            })
+    return blocks
+
+
+def extract_pages_with_pdfplumber(file_path):
+    """Extract page-by-page text and line bounding boxes from a PDF using pdfplumber
+    
+    Returns:
+        list: List of dictionaries with page_number, text and json_data.
+        Returns empty list if pdfplumber is not available
+    """
+    if not pdfplumber_available or pdfplumber is None:
+        logger.warning("pdfplumber is not installed. Returning empty page data.")
+        return []
+    
+    pages_data = []
+    with pdfplumber.open(file_path) as pdf:
+        logger.info(f"PDF has {len(pdf.pages)} pages (pdfplumber)")
+        
+        for page_num, page in enumerate(pdf.pages, 1):
+            page_text = (page.extract_text() or '').strip()
+            
+            # Extract bounding boxes using pdfplumber words
+            try:
+                blocks = _pdfplumber_line_blocks(page)
+            except Exception as bbox_error:
+                logger.warning(f"Error extracting bounding boxes from pdfplumber for page {page_num}: {str(bbox_error)}")
+                blocks = []
+            
+            # Get page dimensions
+            try:
+                page_width = page.width
+                page_height = page.height
+            except Exception:
+                page_width = None
+                page_height = None
+            
+            # Create JSON data with bounding boxes
+            json_data = {
+                'ocr_engine': 'pdfplumber',
+                'page_number': page_num,
+                'text': page_text,
+                'has_ocr': False,
+                'extraction_method': 'direct',
+                'page_width': page_width,
+                'page_height': page_height,
+            }
+            if blocks:
+                json_data['blocks'] = blocks
+            
+            pages_data.append({
+                'page_number': page_num,
+                'text': page_text,
+                'json_data': json_data,
+            })
+    return pages_data
+
+
+class WholeDocumentResults:
+    """Per-document cache for engines that process the whole file in one call
+    
+    MinerU and pdfplumber parse every page of the PDF at once. The traditional
+    page loop asks for one page at a time, so instead of re-running the engine
+    for each page it runs it once here and hands out the per-page results.
+    Pages already extracted elsewhere (a batch run over several documents) can
+    be passed in, in which case the engine is never called.
+    """
+    
+    def __init__(self, extractor, file_path, pages=None):
+        self.extractor = extractor
+        self.file_path = file_path
+        self.runs = 0
+        self._pages = None
+        if pages is not None:
+            self._pages = {page_info['page_number']: page_info for page_info in pages}
+    
+    def pages(self):
+        """Run the engine on first use and return its list of page dictionaries"""
+        if self._pages is None:
+            self.runs += 1
+            try:
+                pages_data = self.extractor(self.file_path) or []
+            except Exception as e:
+                logger.error(f"Whole-document extraction failed for {self.file_path}: {str(e)}", exc_info=True)
+                pages_data = []
+            self._pages = {page_info['page_number']: page_info for page_info in pages_data}
+        return list(self._pages.values())
+    
+    def page_text(self, page_number):
+        """Return the text the engine produced for a 1-indexed page"""
+        self.pages()
+        page_info = self._pages.get(page_number)
+        return page_info.get('text', '') if page_info else ''
+
+
+def extract_text_with_donut(file_path, file_type='pdf'):
+    """Extract text from a PDF or image using Donut (Document Understanding Transformer)"""
+    donut_processor, donut_model = _init_donut()
+    if donut_processor is None or donut_model is None:
+        return "Error: Donut is not installed. Install it with: pip install transformers torch"
+    
+    try:
+        from PIL import Image
+        
+        if file_type == 'pdf':
+            # For PDFs, convert pages to images first and run them through Donut in batches
+            import fitz
+            doc = fitz.open(file_path)
+            text_parts = []
+            window = max(1, int(getattr(settings, 'DONUT_BATCH_SIZE', 4))) * 4
+            
+            for window_start in range(0, len(doc), window):
+                images = []
+                for page_num in range(window_start, min(window_start + window, len(doc))):
+                    images.append(render_page(doc.load_page(page_num)))
                 
-                text_parts.append(f"--- Page {page_num + 1} ---\n{text}\n")
+                texts, _ = run_donut_batch(images)
+                for offset, text in enumerate(texts):
+                    text_parts.append(f"--- Page {window_start + offset + 1} ---\n{text}\n")
             
             doc.close()
             return "\n".join(text_parts).strip()
         else:
             # For images
             img = Image.open(file_path).convert('RGB')
-            pixel_values = donut_processor(images=img, return_tensors="pt").pixel_values
-            decoder_input_ids = donut_processor.tokenizer(
-                "<s_cord-v2>", add_special_tokens=False, return_tensors="pt"
-            ).input_ids
-            
-            outputs = donut_model.generate(
-                pixel_values,
-                decoder_input_ids=decoder_input_ids,
-                max_length=donut_model.decoder.config.max_position_embeddings,
-                early_stopping=True,
-                pad_token_id=donut_processor.tokenizer.pad_token_id,
-                eos_token_id=donut_processor.tokenizer.eos_token_id,
-                use_cache=True,
-                num_beams=1,
-                bad_words_ids=[[donut_processor.tokenizer.unk_token_id]],
-                return_dict_in_generate=True,
-            )
-            
-            sequence = donut_processor.batch_decode(outputs.sequences)[0]
-            sequence = sequence.replace(donut_processor.tokenizer.eos_token, "").replace(
-                donut_processor.tokenizer.pad_token, ""
-            )
-            sequence = donut_processor.token2json(sequence)
-            
-            # Extract text from JSON structure
-            if isinstance(sequence, dict):
-                for key in ['text', 'text_sequence', 'texts', 'content']:
-                    if key in sequence:
-                        if isinstance(sequence[key], list):
-                            return "\n".join(str(item) for item in sequence[key])
-                        return str(sequence[key])
-                return str(sequence)
-            return str(sequence)
+            texts, _ = run_donut_batch([img])
+            return texts[0]
+    except Exception as e:
+        logger.error(f"Error with Donut: {str(e)}", exc_info=True)
+        return f"Error with Donut: {str(e)}"
+
+
+def _donut_sequence_text(donut_processor, sequence):
+    """Convert a decoded Donut sequence to plain text"""
+    sequence = sequence.replace(donut_processor.tokenizer.eos_token, "").replace(
+        donut_processor.tokenizer.pad_token, ""
+    )
+    sequence = donut_processor.token2json(sequence)
+    
+    # Extract text from JSON structure
+    if isinstance(sequence, dict):
+        # Try to extract text from common keys
+        for key in ['text', 'text_sequence', 'texts', 'content']:
+            if key in sequence:
+                if isinstance(sequence[key], list):
+                    return "\n".join(str(item) for item in sequence[key])
+                return str(sequence[key])
+    return str(sequence)
+
+
+def _donut_generate(donut_processor, donut_model, images, max_length):
+    """Run one Donut forward pass over images and return one text per image"""
+    import torch
+    
+    tokenizer = donut_processor.tokenizer
+    task_prompt_ids = tokenizer("<s_cord-v2>", add_special_tokens=False, return_tensors="pt").input_ids
+    pixel_values = donut_processor(images=images, return_tensors="pt").pixel_values.to(donut_model.device)
+    decoder_input_ids = task_prompt_ids.repeat(len(images), 1).to(donut_model.device)
+    
+    with torch.inference_mode():
+        outputs = donut_model.generate(
+            pixel_values,
+            decoder_input_ids=decoder_input_ids,
+            max_length=max_length,
+            pad_token_id=tokenizer.pad_token_id,
+            eos_token_id=tokenizer.eos_token_id,
+            use_cache=True,
+            num_beams=1,
+            bad_words_ids=[[tokenizer.unk_token_id]],
+            return_dict_in_generate=True,
+        )
+    return [_donut_sequence_text(donut_processor, sequence) for sequence in donut_processor.batch_decode(outputs.sequences)]
+
+
+def _donut_page_text(donut_processor, donut_model, img, max_length):
+    """Run Donut on a single image, returning an "Error..." message if it fails"""
+    try:
+        return _donut_generate(donut_processor, donut_model, [img], max_length)[0]
     except Exception as e:
         logger.error(f"Error with Donut: {str(e)}", exc_info=True)
         return f"Error with Donut: {str(e)}"
 
 
+def run_donut_batch(images, batch_size=None):
+    """Run Donut on several PIL images, DONUT_BATCH_SIZE pages per forward pass
+    
+    Each sample stops at its own end-of-sequence token; a batch finishes when
+    every sample has, or at DONUT_MAX_LENGTH tokens (0 uses the decoder maximum).
+    A batch that fails (e.g. CUDA out of memory) is retried one page at a time,
+    so only the pages that fail on their own get an "Error..." text.
+    
+    Returns:
+        tuple: (texts, timing) - one text (or "Error..." message) per image, and
+        a dict with pages, batches, seconds and seconds_per_page
+    """
+    import time
+    
+    donut_processor, donut_model = _init_donut()
+    if donut_processor is None or donut_model is None:
+        return [DONUT_UNAVAILABLE] * len(images), {'pages': len(images), 'batches': 0, 'seconds': 0.0, 'seconds_per_page': 0.0}
+    
+    batch_size = max(1, batch_size or int(getattr(settings, 'DONUT_BATCH_SIZE', 4)))
+    max_length = int(getattr(settings, 'DONUT_MAX_LENGTH', 0)) or donut_model.decoder.config.max_position_embeddings
+    
+    texts = []
+    batches = 0
+    started = time.perf_counter()
+    for start in range(0, len(images), batch_size):
+        batch = images[start:start + batch_size]
+        try:
+            batch_texts = _donut_generate(donut_processor, donut_model, batch, max_length)
+        except Exception as e:
+            if len(batch) == 1:
+                logger.error(f"Error with Donut: {str(e)}", exc_info=True)
+                batch_texts = [f"Error with Donut: {str(e)}"]
+            else:
+                logger.warning(f"Batched Donut generation failed, retrying {len(batch)} pages one at a time: {str(e)}")
+                batch_texts = [_donut_page_text(donut_processor, donut_model, img, max_length) for img in batch]
+        texts.extend(batch_texts)
+        batches += 1
+    
+    seconds = time.perf_counter() - started
+    timing = {
+        'pages': len(images),
+        'batches': batches,
+        'seconds': round(seconds, 3),
+        'seconds_per_page': round(seconds / len(images), 3) if images else 0.0,
+    }
+    logger.info(f"Donut processed {timing['pages']} page(s) in {timing['batches']} batch(es), {timing['seconds']}s ({timing['seconds_per_page']}s/page)")
+    return texts, timing
+
+
+def extract_pages_with_donut(file_path):
+    """Extract every page of a PDF, running Donut in batches on the pages without a text layer
+    
+    Returns:
+        list: List of dictionaries with page_number, text and json_data
+    """
+    return extract_pages_with_batched_ocr(
+        file_path, 'donut', lambda images: run_donut_batch(images)[0],
+        window=max(1, int(getattr(settings, 'DONUT_BATCH_SIZE', 4))) * 4,
+    )
+
+
+def olmocr_config():
+    """Return (enabled, use_api, api_url) from Django settings, overridden by the Settings model"""
+    use_api = getattr(settings, 'OLMOCR_USE_API', False)  # Default to local mode
+    api_url = getattr(settings, 'OLMOCR_API_URL', 'https://api.olmocr.com')
+    enabled = getattr(settings, 'OLMOCR_ENABLED', True)
+    
+    # Try to get from Settings model if Django settings not set
+    try:
+        from .models import Settings
+        settings_obj = Settings.get_settings()
+        if settings_obj:
+            if hasattr(settings_obj, 'olmocr_enabled'):
+                enabled = settings_obj.olmocr_enabled
+            if hasattr(settings_obj, 'olmocr_use_api'):
+                use_api = settings_obj.olmocr_use_api
+            if hasattr(settings_obj, 'olmocr_api_url') and settings_obj.olmocr_api_url:
+                api_url = settings_obj.olmocr_api_url
+    except Exception:
+        # Settings model not available or error accessing it - use Django settings
+        pass
+    return enabled, use_api, api_url
+
+
 def extract_text_with_olmocr(image_path, file_type='pdf'):
     """Extract text from an image or PDF using OLMOCR (local installation or API)"""
     try:
-        # Try to get settings from Django settings first, then from Settings model
-        use_api = getattr(settings, 'OLMOCR_USE_API', False)  # Default to local mode
-        api_url = getattr(settings, 'OLMOCR_API_URL', 'https://api.olmocr.com')
-        enabled = getattr(settings, 'OLMOCR_ENABLED', True)
-        
-        # Try to get from Settings model if Django settings not set
-        try:
-            from .models import Settings
-            settings_obj = Settings.get_settings()
-            if settings_obj:
-                if hasattr(settings_obj, 'olmocr_enabled'):
-                    enabled = settings_obj.olmocr_enabled
-                if hasattr(settings_obj, 'olmocr_use_api'):
-                    use_api = settings_obj.olmocr_use_api
-                if hasattr(settings_obj, 'olmocr_api_url') and settings_obj.olmocr_api_url:
-                    api_url = settings_obj.olmocr_api_url
-        except Exception:
-            # Settings model not available or error accessing it - use Django settings
-            pass
+        enabled, use_api, api_url = olmocr_config()
         
         if not enabled:
             return "Error: OLMOCR is disabled in settings"
@@ -1163,7 +1607,7 @@ def extract_text_with_olmocr(image_path, file_type='pdf'):
 
 
 def extract_pages_with_olmocr_json(file_path):
-    """Extract page-by-page JSON data from PDF using OLMOCR
+    """Extract page-by-page JSON data from a PDF or image using the resident OLMOCR worker
     
     Returns:
         list: List of dictionaries, each containing:
@@ -1172,409 +1616,133 @@ def extract_pages_with_olmocr_json(file_path):
             - json_data: dict (structured OLMOCR output)
         Returns empty list if OLMOCR is not available
     """
+    enabled, use_api, api_url = olmocr_config()
+    if not enabled:
+        logger.warning("OLMOCR is disabled in settings. Returning empty page data.")
+        return []
+    if use_api and file_path.lower().endswith('.pdf'):
+        # Pages go to the API concurrently; it only returns text
+        return extract_pages_with_remote_ocr(
+            file_path, 'olmocr', lambda img: extract_text_with_olmocr_from_image(img, api_url)
+        )
     if not olmocr_available:
         logger.warning("OLMOCR is not installed. Returning empty page data.")
         return []
     
+    from .olmocr_worker import olmocr_worker_pages
+    
     try:
-        import subprocess
-        import tempfile
-        import json
-        import re
-        from pathlib import Path
-        import fitz
-        
-        # Get the base filename
-        file_name = Path(file_path).stem
-        file_ext = Path(file_path).suffix.lower()
-        
-        # For PDFs, process the entire PDF at once (OLMOCR handles this better)
-        if file_ext == '.pdf':
-            doc = fitz.open(file_path)
-            total_pages = len(doc)
-            pages_data = []
-            
-            # Get page dimensions first
-            page_dimensions = []
-            for page_num in range(total_pages):
-                page = doc.load_page(page_num)
-                pix = page.get_pixmap()
-                page_dimensions.append({
-                    'width': pix.width,
-                    'height': pix.height
-                })
-            doc.close()
-            
-            # Process entire PDF with OLMOCR
-            with tempfile.TemporaryDirectory() as workspace_dir:
-                cmd = [
-                    sys.executable, '-m', 'olmocr.pipeline',
-                    workspace_dir,
-                    '--markdown',
-                    '--pdfs', file_path
-                ]
-                
-                logger.info(f"Running OLMOCR on entire PDF: {' '.join(cmd)}")
-                
-                try:
-                        result = subprocess.run(
-                            cmd,
-                            capture_output=True,
-                            text=True,
-                            timeout=600,  # 10 minute timeout for entire PDF
-                            check=False  # Don't raise exception on non-zero return
-                        )
-                        
-                        # Log detailed information about the command execution
-                        logger.info(f"OLMOCR command completed with return code: {result.returncode}")
-                        if result.returncode != 0:
-                            logger.error(f"OLMOCR command failed (return code {result.returncode})")
-                            logger.error(f"OLMOCR stderr: {result.stderr[:1000]}")  # Log first 1000 chars
-                        if result.stderr:
-                            logger.warning(f"OLMOCR stderr: {result.stderr[:1000]}")
-                        if result.stdout and not result.stdout.strip().startswith('INFO') and not result.stdout.strip().startswith('WARNING'):
-                            logger.info(f"OLMOCR stdout (first 500 chars): {result.stdout[:500]}")
-                        
-                        # If command failed, try to provide helpful error message
-                        if result.returncode != 0:
-                            error_msg = result.stderr or result.stdout or "Unknown error"
-                            if 'not found' in error_msg.lower() or 'No module named' in error_msg:
-                                logger.error("OLMOCR module not found. Install with: pip install olmocr[gpu]")
-                            elif 'timeout' in error_msg.lower():
-                                logger.error("OLMOCR processing timed out. File may be too large or system too slow.")
-                    
-                except subprocess.TimeoutExpired:
-                    logger.error("OLMOCR processing timed out")
-                    return []
-                
-                # OLMOCR outputs to workspace_dir/markdown/filename.md or nested directories
-                # Check multiple possible output locations recursively
-                output_paths = []
-                
-                # Standard locations
-                standard_paths = [
-                    os.path.join(workspace_dir, 'markdown', f"{file_name}.md"),
-                    os.path.join(workspace_dir, 'markdown', f"{Path(file_path).name}.md"),
-                    os.path.join(workspace_dir, f"{file_name}.md"),
-                    os.path.join(workspace_dir, 'markdown', f"{file_name}"),
-                    # Nested paths that OLMOCR might use
-                    os.path.join(workspace_dir, 'markdown', file_name, f"{file_name}.md"),
-                    os.path.join(workspace_dir, 'markdown', 'auto', f"{file_name}.md"),
-                    os.path.join(workspace_dir, file_name, 'markdown', f"{file_name}.md"),
-                ]
-                output_paths.extend(standard_paths)
-                
-                # Recursively search for any .md files in workspace directory
-                markdown_dir = os.path.join(workspace_dir, 'markdown')
-                if os.path.exists(markdown_dir):
-                    for root, dirs, files in os.walk(markdown_dir):
-                        for md_file in files:
-                            if md_file.endswith('.md'):
-                                output_paths.append(os.path.join(root, md_file))
-                
-                # Also check workspace root and subdirectories
-                for root, dirs, files in os.walk(workspace_dir):
-                    for md_file in files:
-                        if md_file.endswith('.md'):
-                            full_path = os.path.join(root, md_file)
-                            if full_path not in output_paths:
-                                output_paths.append(full_path)
-                
-                markdown_content = None
-                found_path = None
-                
-                for path in output_paths:
-                    if os.path.exists(path):
-                        try:
-                            with open(path, 'r', encoding='utf-8') as f:
-                                markdown_content = f.read()
-                            found_path = path
-                            logger.info(f"Found OLMOCR output at: {path}")
-                            break
-                        except Exception as e:
-                            logger.warning(f"Error reading {path}: {str(e)}")
-                            continue
-                
-                # If still no content, try reading from stdout
-                if not markdown_content and result.stdout:
-                    markdown_content = result.stdout
-                    logger.info("Using OLMOCR output from stdout")
-                
-                # Log debug information about what we found
-                if not markdown_content:
-                    logger.warning(f"OLMOCR produced no output. Checked paths: {output_paths}")
-                    logger.warning(f"OLMOCR return code: {result.returncode}")
-                    logger.warning(f"OLMOCR stdout (first 500 chars): {result.stdout[:500] if result.stdout else 'None'}")
-                    logger.warning(f"OLMOCR stderr (first 500 chars): {result.stderr[:500] if result.stderr else 'None'}")
-                    
-                    # List all files in workspace for debugging
-                    try:
-                        all_files = []
-                        for root, dirs, files in os.walk(workspace_dir):
-                            for f in files:
-                                all_files.append(os.path.relpath(os.path.join(root, f), workspace_dir))
-                        logger.info(f"Files in workspace directory: {all_files}")
-                    except Exception as e:
-                        logger.warning(f"Could not list workspace files: {str(e)}")
-                
-                # Split markdown into pages if we have page separators or use whole content
-                if markdown_content:
-                    # Try to split by page markers (OLMOCR may add page breaks)
-                    # If no clear page breaks, distribute content equally or use whole content
-                    markdown_pages = [markdown_content]  # Default: single page
-                    
-                    # Try to split by page breaks (common patterns)
-                    page_break_patterns = [
-                        r'\n\n---\s*Page\s+\d+\s*---\n\n',
-                        r'\n\n#+\s*Page\s+\d+\n\n',
-                        r'\n\n\*\*\*Page\s+\d+\*\*\*\n\n',
-                    ]
-                    
-                    for pattern in page_break_patterns:
-                        if re.search(pattern, markdown_content, re.IGNORECASE):
-                            markdown_pages = re.split(pattern, markdown_content, flags=re.IGNORECASE)
-                            markdown_pages = [p.strip() for p in markdown_pages if p.strip()]
-                            logger.info(f"Split markdown into {len(markdown_pages)} pages using pattern: {pattern}")
-                            break
-                    
-                    # If we couldn't split, use whole content for first page only
-                    if len(markdown_pages) == 1 and total_pages > 1:
-                        # Distribute content equally or just put all in first page
-                        logger.warning(f"Could not split OLMOCR output into {total_pages} pages, using whole content for page 1")
-                    
-                    # Create page data for each page
-                    for page_num in range(total_pages):
-                        page_content = markdown_pages[page_num] if page_num < len(markdown_pages) else ''
-                        dims = page_dimensions[page_num] if page_num < len(page_dimensions) else {'width': None, 'height': None}
-                        
-                        page_json = {
-                            'ocr_engine': 'olmocr',
-                            'page_number': page_num + 1,
-                            'page_width': dims.get('width'),
-                            'page_height': dims.get('height'),
-                            'text': page_content.strip() if page_content else '',
-                            'format': 'markdown',
-                            'blocks': [
-                                {
-                                    'type': 'text',
-                                    'text': page_content.strip() if page_content else '',
-                                    'format': 'markdown'
-                                }
-                            ] if page_content.strip() else []
-                        }
-                        
-                        pages_data.append({
-                            'page_number': page_num + 1,
-                            'text': page_content.strip() if page_content else '',
-                            'json_data': page_json
-                        })
-                else:
-                    # No content found, create empty pages
-                    logger.warning("No OLMOCR output found, creating empty pages")
-                    for page_num in range(total_pages):
-                        dims = page_dimensions[page_num] if page_num < len(page_dimensions) else {'width': None, 'height': None}
-                        page_json = {
-                            'ocr_engine': 'olmocr',
-                            'page_number': page_num + 1,
-                            'page_width': dims.get('width'),
-                            'page_height': dims.get('height'),
-                            'text': '',
-                            'format': 'markdown',
-                            'blocks': [],
-                            'error': 'No output from OLMOCR - check logs for details'
-                        }
-                        pages_data.append({
-                            'page_number': page_num + 1,
-                            'text': '',
-                            'json_data': page_json
-                        })
-            
-            return pages_data
-        
-        else:
-            # For single images, process directly
-            with tempfile.TemporaryDirectory() as workspace_dir:
-                cmd = [
-                    sys.executable, '-m', 'olmocr.pipeline',
-                    workspace_dir,
-                    '--markdown',
-                    '--pdfs', file_path
-                ]
-                
-                logger.info(f"Running OLMOCR on image: {' '.join(cmd)}")
-                
-                try:
-                    result = subprocess.run(
-                        cmd,
-                        capture_output=True,
-                        text=True,
-                        timeout=120
-                    )
-                    
-                    if result.returncode != 0:
-                        logger.error(f"OLMOCR command failed (return code {result.returncode}): {result.stderr}")
-                    
-                except subprocess.TimeoutExpired:
-                    logger.error("OLMOCR processing timed out")
-                    return []
-                
-                # Check multiple possible output locations
-                output_paths = [
-                    os.path.join(workspace_dir, 'markdown', f"{file_name}.md"),
-                    os.path.join(workspace_dir, 'markdown', f"{Path(file_path).name}.md"),
-                    os.path.join(workspace_dir, f"{file_name}.md"),
-                ]
-                
-                markdown_dir = os.path.join(workspace_dir, 'markdown')
-                if os.path.exists(markdown_dir):
-                    for md_file in os.listdir(markdown_dir):
-                        if md_file.endswith('.md'):
-                            output_paths.append(os.path.join(markdown_dir, md_file))
-                
-                markdown_content = None
-                for path in output_paths:
-                    if os.path.exists(path):
-                        try:
-                            with open(path, 'r', encoding='utf-8') as f:
-                                markdown_content = f.read()
-                            logger.info(f"Found OLMOCR output at: {path}")
-                            break
-                        except Exception as e:
-                            logger.warning(f"Error reading {path}: {str(e)}")
-                            continue
-                
-                if not markdown_content and result.stdout:
-                    markdown_content = result.stdout
-                
-                page_json = {
-                    'ocr_engine': 'olmocr',
-                    'page_number': 1,
-                    'text': markdown_content.strip() if markdown_content else '',
-                    'format': 'markdown',
-                    'blocks': [
-                        {
-                            'type': 'text',
-                            'text': markdown_content.strip() if markdown_content else '',
-                            'format': 'markdown'
-                        }
-                    ] if markdown_content and markdown_content.strip() else []
-                }
-                
-                return [{
-                    'page_number': 1,
-                    'text': markdown_content.strip() if markdown_content else '',
-                    'json_data': page_json
-                }]
-            
-    except subprocess.TimeoutExpired:
-        logger.error("OLMOCR processing timed out")
-        return []
-    except FileNotFoundError:
-        logger.error("OLMOCR is not installed or not found in PATH")
-        return []
+        result = olmocr_worker_pages([file_path])[0]
     except Exception as e:
         logger.error(f"Error extracting pages with OLMOCR: {str(e)}", exc_info=True)
         return []
+    if result.get('error'):
+        logger.error(f"OLMOCR worker failed for {file_path}: {result['error']}")
+        return []
+    
+    pages_data = []
+    for page in result['pages']:
+        text = page['text'].strip()
+        page_json = {
+            'ocr_engine': 'olmocr',
+            'page_number': page['page_number'],
+            'page_width': page['width'],
+            'page_height': page['height'],
+            'text': text,
+            'format': 'markdown',
+            'metadata': page.get('metadata') or {},
+            'blocks': [
+                {
+                    'type': 'text',
+                    'text': text,
+                    'format': 'markdown'
+                }
+            ] if text else []
+        }
+        pages_data.append({
+            'page_number': page['page_number'],
+            'text': text,
+            'json_data': page_json
+        })
+    logger.info(f"OLMOCR worker returned {len(pages_data)} pages for {file_path}")
+    return pages_data
+
+
+def extract_pages_with_olmocr(file_path):
+    """Extract page-by-page data from a PDF with OLMOCR
+    
+    When OLMOCR produces pages without any text, the PDF text layer (PyMuPDF) is
+    merged into its JSON instead. Returns an empty list if neither produced text.
+    """
+    pages_data = extract_pages_with_olmocr_json(file_path)
+    
+    # Check if we got any actual text content
+    has_content = any(page_info.get('text', '').strip() for page_info in pages_data) if pages_data else False
+    if has_content:
+        logger.info(f"OLMOCR extracted {len(pages_data)} pages with JSON and text content")
+        return pages_data
+    if not pages_data:
+        logger.warning("OLMOCR returned no page data")
+        return []
+    
+    # OLMOCR ran but produced no text - try fallback with PyMuPDF (direct text extraction)
+    logger.warning("OLMOCR JSON extraction produced pages but no text content. Trying fallback with PyMuPDF...")
+    fallback_pages = []
+    try:
+        doc = fitz.open(file_path)
+        for page_num in range(len(doc)):
+            page_text = (doc.load_page(page_num).get_text() or '').strip()
+            if not page_text:
+                continue
+            # Merge the PyMuPDF text into the OLMOCR JSON data
+            if page_num < len(pages_data) and pages_data[page_num].get('json_data'):
+                json_data = pages_data[page_num]['json_data']
+                json_data['text'] = page_text
+                json_data['fallback_extraction'] = 'pymupdf'
+            else:
+                json_data = {
+                    'ocr_engine': 'olmocr',
+                    'page_number': page_num + 1,
+                    'text': page_text,
+                    'fallback_extraction': 'pymupdf',
+                    'extraction_method': 'direct'
+                }
+            fallback_pages.append({'page_number': page_num + 1, 'text': page_text, 'json_data': json_data})
+        doc.close()
+    except Exception as fallback_error:
+        logger.error(f"PyMuPDF fallback extraction failed: {str(fallback_error)}")
+        return []
+    
+    if fallback_pages:
+        logger.info(f"Fallback PyMuPDF extracted text from {len(fallback_pages)} pages")
+    else:
+        logger.warning("PyMuPDF also found no text")
+    return fallback_pages
 
 
 def extract_text_with_olmocr_local(file_path, file_type='pdf'):
-    """Extract text from a PDF or image using local OLMOCR installation"""
+    """Extract text from a PDF or image using the resident OLMOCR worker"""
     if not olmocr_available:
         return "Error: OLMOCR is not installed locally. Install it with: pip install olmocr[gpu] or pip install olmocr (see docs for installation instructions)"
     
+    from .olmocr_worker import IMAGE_EXTENSIONS, olmocr_worker_pages
+    
+    file_ext = os.path.splitext(file_path)[1].lower()
+    if not (file_type == 'pdf' or file_ext == '.pdf' or file_ext in IMAGE_EXTENSIONS):
+        return f"Error: OLMOCR does not support file type: {file_ext}"
+    
     try:
-        import subprocess
-        import tempfile
-        import json
-        from pathlib import Path
-        
-        # Get the base filename
-        file_name = Path(file_path).stem
-        file_ext = Path(file_path).suffix.lower()
-        
-        # Check if file is PDF or image
-        if file_type == 'pdf' or file_ext == '.pdf':
-            input_file = file_path
-        elif file_ext in ['.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif']:
-            input_file = file_path
-        else:
-            return f"Error: OLMOCR does not support file type: {file_ext}"
-        
-        # Create temporary workspace directory
-        with tempfile.TemporaryDirectory() as workspace_dir:
-            # Determine output directory for markdown
-            output_dir = os.path.join(workspace_dir, 'markdown')
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # Run OLMOCR pipeline command using sys.executable for Python path
-            # python -m olmocr.pipeline ./localworkspace --markdown --pdfs path_to_file
-            cmd = [
-                sys.executable, '-m', 'olmocr.pipeline',
-                workspace_dir,
-                '--markdown',
-                '--pdfs', input_file
-            ]
-            
-            logger.info(f"Running OLMOCR locally: {' '.join(cmd)}")
-            
-            # Execute the command
-            try:
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=300,  # 5 minute timeout
-                    cwd=None  # Run from current directory
-                )
-            except subprocess.TimeoutExpired:
-                return "Error: OLMOCR processing timed out (exceeded 5 minutes). Try processing smaller files or increase timeout."
-            
-            if result.returncode != 0:
-                error_msg = result.stderr or result.stdout or "Unknown error"
-                logger.error(f"OLMOCR command failed (return code {result.returncode}): {error_msg}")
-                # Check for common errors
-                if 'not found' in error_msg.lower() or 'No module named' in error_msg:
-                    return "Error: OLMOCR module not found. Install it with: pip install olmocr[gpu]"
-                return f"Error running OLMOCR: {error_msg}"
-            
-            # Look for the generated markdown file
-            # OLMOCR outputs to workspace_dir/markdown/filename.md
-            markdown_file = os.path.join(output_dir, f"{file_name}.md")
-            
-            # Also check alternative paths
-            alt_paths = [
-                os.path.join(workspace_dir, 'markdown', f"{Path(file_path).name}.md"),
-                os.path.join(workspace_dir, f"{file_name}.md"),
-                os.path.join(workspace_dir, 'markdown', f"{Path(file_path).name}"),
-            ]
-            
-            markdown_content = None
-            for path in [markdown_file] + alt_paths:
-                if os.path.exists(path):
-                    try:
-                        with open(path, 'r', encoding='utf-8') as f:
-                            markdown_content = f.read()
-                        logger.info(f"Found OLMOCR output at: {path}")
-                        break
-                    except Exception as e:
-                        logger.warning(f"Error reading OLMOCR output from {path}: {str(e)}")
-                        continue
-            
-            if markdown_content:
-                return markdown_content.strip()
-            
-            # If markdown not found, try to read from stdout
-            if result.stdout and result.stdout.strip():
-                return result.stdout.strip()
-            
-            logger.warning(f"OLMOCR processed file but no output found. Checked paths: {[markdown_file] + alt_paths}")
-            return "Error: OLMOCR processed the file but no output was found. Check logs for details."
-            
-    except FileNotFoundError:
-        return "Error: Python executable not found. OLMOCR requires Python to be in PATH."
+        result = olmocr_worker_pages([file_path])[0]
     except Exception as e:
         logger.error(f"Error with OLMOCR local processing: {str(e)}", exc_info=True)
         return f"Error with OLMOCR: {str(e)}"
+    if result.get('error'):
+        return f"Error running OLMOCR: {result['error']}"
+    
+    text = "\n\n".join(page['text'].strip() for page in result['pages'] if page['text'].strip())
+    if not text:
+        return "Error: OLMOCR processed the file but returned no text."
+    return text
 
 
 def extract_text_with_olmocr_api(image_path, api_url='https://api.olmocr.com'):
@@ -1583,118 +1751,377 @@ def extract_text_with_olmocr_api(image_path, api_url='https://api.olmocr.com'):
         # Read image file
         with open(image_path, 'rb') as f:
             image_data = f.read()
-        
-        # Check file size (OLMOCR has 5MB limit)
-        if len(image_data) > 5 * 1024 * 1024:
-            return "Error: Image file is too large. OLMOCR supports files up to 5MB."
-        
-        # Encode image to base64
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
-        
-        # Prepare API request
-        # Try common API endpoints
-        endpoints = [
-            f'{api_url}/api/ocr',
-            f'{api_url}/ocr',
-            f'{api_url}/api/v1/ocr',
-            f'{api_url}/recognize',
-            f'{api_url}/extract',
-        ]
-        
-        # Try JSON payload with base64 image
-        for endpoint in endpoints:
-            try:
-                response = requests.post(
-                    endpoint,
-                    json={'image': image_base64, 'format': 'base64'},
-                    headers={'Content-Type': 'application/json'},
-                    timeout=60
-                )
-                if response.status_code == 200:
-                    result = response.json()
-                    # Handle different response formats
-                    if isinstance(result, dict):
-                        return result.get('text', result.get('result', result.get('extracted_text', str(result))))
-                    return str(result)
-            except requests.exceptions.RequestException:
-                continue
-        
-        # Try multipart form data
-        for endpoint in endpoints:
-            try:
-                with open(image_path, 'rb') as f:
-                    # Determine file extension
-                    ext = os.path.splitext(image_path)[1].lower()
-                    content_type = 'image/png' if ext == '.png' else 'image/jpeg' if ext in ['.jpg', '.jpeg'] else 'application/pdf'
-                    
-                    files = {'file': (os.path.basename(image_path), f, content_type)}
-                    response = requests.post(
-                        endpoint,
-                        files=files,
-                        timeout=60
-                    )
-                if response.status_code == 200:
-                    result = response.json()
-                    if isinstance(result, dict):
-                        return result.get('text', result.get('result', result.get('extracted_text', str(result))))
-                    return str(result)
-            except requests.exceptions.RequestException:
-                continue
-        
-        return f"Error: Could not connect to OLMOCR API at {api_url}. Please ensure the service is running and the API URL is correct."
+        ext = os.path.splitext(image_path)[1].lower()
+        content_type = 'image/png' if ext == '.png' else 'image/jpeg' if ext in ['.jpg', '.jpeg'] else 'application/pdf'
+        return _olmocr_api_text(image_data, os.path.basename(image_path), content_type, api_url)
     except Exception as e:
         return f"Error with OLMOCR API: {str(e)}"
 
 
+def _olmocr_api_text(image_data, filename, content_type, api_url):
+    """Send encoded image bytes to the OLMOCR API server and return its text"""
+    # Check file size (OLMOCR has 5MB limit)
+    if len(image_data) > 5 * 1024 * 1024:
+        return "Error: Image file is too large. OLMOCR supports files up to 5MB."
+    
+    # Try common API endpoints; the client remembers the one that answers
+    endpoints = [
+        f'{api_url}/api/ocr',
+        f'{api_url}/ocr',
+        f'{api_url}/api/v1/ocr',
+        f'{api_url}/recognize',
+        f'{api_url}/extract',
+    ]
+    
+    try:
+        # Try JSON payload with base64 image, then multipart form data
+        response = api_client.post_first(
+            endpoints,
+            json={'image': base64.b64encode(image_data).decode('utf-8'), 'format': 'base64'},
+        )
+        if response is None:
+            response = api_client.post_first(endpoints, files={'file': (filename, image_data, content_type)})
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"OLMOCR API request failed: {str(e)}")
+        response = None
+    
+    if response is None:
+        return f"Error: Could not connect to OLMOCR API at {api_url}. Please ensure the service is running and the API URL is correct."
+    return _remote_ocr_result_text(response, keys=('text', 'result', 'extracted_text'))
+
+
+@memoize_page_ocr('olmocr')
 def extract_text_with_olmocr_from_image(img, api_url=None):
     """Extract text from PIL Image using OLMOCR (local or API)"""
     try:
-        # Try to get settings from Django settings first, then from Settings model
-        use_api = getattr(settings, 'OLMOCR_USE_API', False)  # Default to local mode
-        if api_url is None:
-            api_url = getattr(settings, 'OLMOCR_API_URL', 'https://api.olmocr.com')
-        enabled = getattr(settings, 'OLMOCR_ENABLED', True)
-        
-        # Try to get from Settings model if Django settings not set
-        try:
-            from .models import Settings
-            settings_obj = Settings.get_settings()
-            if settings_obj:
-                if hasattr(settings_obj, 'olmocr_enabled'):
-                    enabled = settings_obj.olmocr_enabled
-                if hasattr(settings_obj, 'olmocr_use_api'):
-                    use_api = settings_obj.olmocr_use_api
-                if hasattr(settings_obj, 'olmocr_api_url') and settings_obj.olmocr_api_url:
-                    api_url = settings_obj.olmocr_api_url
-        except Exception:
-            # Settings model not available or error accessing it - use Django settings
-            pass
+        enabled, use_api, configured_api_url = olmocr_config()
+        api_url = api_url or configured_api_url
         
         if not enabled:
             return "Error: OLMOCR is disabled in settings"
         
-        # Save PIL Image to temporary file
-        import tempfile
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
-            img.save(tmp_file.name, format='PNG')
-            tmp_path = tmp_file.name
+        # Images are handed over in memory: PNG bytes for the API, raw pixels for the local worker
+        if use_api:
+            logger.info(f"OLMOCR from image (API): api_url={api_url}")
+            return _olmocr_api_text(image_to_png_bytes(img), 'page.png', 'image/png', api_url)
+        
+        logger.info("OLMOCR from image (local)")
+        if not olmocr_available:
+            return "Error: OLMOCR is not installed locally. Install it with: pip install olmocr[gpu] or pip install olmocr (see docs for installation instructions)"
+        from .olmocr_worker import olmocr_worker_images
+        text = olmocr_worker_images([img])[0]['text'].strip()
+        return text or "Error: OLMOCR processed the image but returned no text."
+    except Exception as e:
+        return f"Error with OLMOCR: {str(e)}"
+
+
+def pymupdf_line_blocks(text_dict):
+    """Build text_line blocks from PyMuPDF get_text("dict") output
+    
+    Spans are merged per line; bboxes use the [x, y, width, height] format.
+    """
+    blocks = []
+    if not text_dict or 'blocks' not in text_dict:
+        return blocks
+    
+    for block in text_dict['blocks']:
+        if 'lines' not in block:  # Image block
+            continue
+        for line in block['lines']:
+            line_text_parts = []
+            line_rect = None
+            
+            for span in line.get('spans', []):
+                span_text = span.get('text', '')
+                if not span_text:
+                    continue
+                line_text_parts.append(span_text)
+                
+                # bbox is [x0, y0, x1, y1] from PyMuPDF - grow the line rect to include this span
+                bbox_rect = span.get('bbox', [])
+                if bbox_rect and len(bbox_rect) == 4:
+                    if line_rect is None:
+                        line_rect = list(bbox_rect)
+                    else:
+                        line_rect = [
+                            min(line_rect[0], bbox_rect[0]),
+                            min(line_rect[1], bbox_rect[1]),
+                            max(line_rect[2], bbox_rect[2]),
+                            max(line_rect[3], bbox_rect[3]),
+                        ]
+            
+            # Add line as a block if it has text
+            line_text = ''.join(line_text_parts).strip()
+            if line_text:
+                line_bbox = None
+                if line_rect is not None:
+                    line_bbox = [line_rect[0], line_rect[1], line_rect[2] - line_rect[0], line_rect[3] - line_rect[1]]
+                blocks.append({
+                    'type': 'text_line',
+                    'text': line_text,
+                    'bbox': line_bbox,
+                    'extraction_method': 'direct'
+                })
+    return blocks
+
+
+def _donut_text_from_image(img):
+    """Run Donut on a PIL image and return the recognised text"""
+    texts, _ = run_donut_batch([img])
+    return texts[0]
+
+
+def ocr_image_with_donut(img):
+    """Run Donut on a PIL image and return (text, blocks). Donut has no bounding boxes."""
+    return _donut_text_from_image(img), []
+
+
+def ocr_image_with_trocr(img):
+    """Run TrOCR on a PIL image and return (text, blocks)
+    
+    TrOCR is trained on single text lines. With TROCR_MODE 'lines' (the default)
+    the image is segmented into lines that are recognised in batches, and each
+    line becomes a text_line block with its bbox. 'page' feeds the whole image
+    to the model in one pass and has no bounding boxes.
+    """
+    if getattr(settings, 'TROCR_MODE', 'lines') == 'page':
+        trocr_processor, trocr_model = _init_trocr()
+        if trocr_processor is None or trocr_model is None:
+            raise RuntimeError("TrOCR is not available")
+        pixel_values = trocr_processor(images=img, return_tensors="pt").pixel_values
+        generated_ids = trocr_model.generate(pixel_values)
+        return trocr_processor.batch_decode(generated_ids, skip_special_tokens=True)[0], []
+    
+    img = img.convert('RGB')
+    line_boxes = segment_text_lines(img)
+    line_texts = recognize_lines_with_trocr([img.crop((x, y, x + w, y + h)) for x, y, w, h in line_boxes])
+    
+    blocks = [
+        {
+            'type': 'text_line',
+            'text': text,
+            'bbox': bbox,
+            'extraction_method': 'ocr',
+        }
+        for bbox, text in zip(line_boxes, line_texts)
+        if text
+    ]
+    return "\n".join(block['text'] for block in blocks), blocks
+
+
+def extract_pages_with_pymupdf(file_path):
+    """Extract page-by-page text and line bounding boxes from the PDF text layer (no OCR)
+    
+    Pages are sharded across EXTRACTION_PAGE_WORKERS['pymupdf'] processes and
+    yielded in page order.
+    """
+    from .parallel import map_pages
+    return map_pages(file_path, extract_pdf_page, 'pymupdf', ocr_engine='pymupdf')
+
+
+def extract_pdf_page(page, ocr_engine, whole_document=None, ocr_result=None):
+    """Extract text and bounding boxes from one PDF page
+    
+    Uses the text layer when the page has one, otherwise OCRs a rendering of the
+    page with the given engine (see core.engines). This is the per-page step of
+    the traditional PDF path and is safe to run in a page worker process
+    (see core.parallel).
+    
+    Args:
+        page: fitz.Page to extract
+        ocr_engine: Lower-case OCR engine name
+        whole_document: WholeDocumentResults for engines that parse the whole file (MinerU, pdfplumber)
+        ocr_result: (text, blocks) already recognised for this page's rendering, used
+            instead of running the engine on it (see extract_pages_with_batched_ocr)
+    
+    Returns:
+        dict: page_number, text and json_data
+    """
+    from .engines import get_engine
+    
+    page_number = page.number + 1
+    engine = get_engine(ocr_engine)
+    
+    # Get page dimensions
+    try:
+        rect = page.rect
+        page_width = rect.width
+        page_height = rect.height
+    except Exception:
+        page_width = None
+        page_height = None
+    
+    # Try to extract text with bounding boxes directly first (works for PDFs with text layers)
+    text_dict = page.get_text("dict")
+    page_text = page.get_text()  # Plain text for backward compatibility
+    
+    # Track if OCR was used, and why it failed
+    used_ocr = False
+    ocr_error = None
+    try:
+        blocks = pymupdf_line_blocks(text_dict)
+    except Exception as bbox_error:
+        logger.warning(f"Error extracting bounding boxes from page {page_number}: {str(bbox_error)}")
+        blocks = []
+    
+    if page_text.strip():
+        pass
+    elif engine is None:
+        # Unknown OCR engine - log warning and use empty text
+        logger.warning(f"Unknown OCR engine '{ocr_engine}' for PDF page {page_number} - creating page with empty text")
+        page_text = ""
+    elif engine.whole_document:
+        # Whole-document engines run once per document; read this page's result
+        page_text = whole_document.page_text(page_number) if whole_document else ""
+        used_ocr = True
+    elif not engine.ocr_image:
+        # PyMuPDF doesn't do OCR - just leave text empty if no text layer found
+        logger.info(f"{engine.label} selected - no OCR fallback, leaving text empty for page without text layer")
+        page_text = ""
+    elif ocr_result is None and not engine.is_available():
+        logger.warning(f"{engine.label} selected but not available - skipping OCR")
+        ocr_error = f"{engine.label} is not available"
+        page_text = ""
+    else:
+        logger.info(f"Page {page_number} has no text layer, attempting OCR with engine: {ocr_engine}...")
+        # Render page to an image (batched engines have just rendered it into the render cache)
+        img = render_page(page)
+        if page_width is None:
+            page_width = img.width
+        if page_height is None:
+            page_height = img.height
         
         try:
-            if use_api:
-                logger.info(f"OLMOCR from image (API): api_url={api_url}")
-                result = extract_text_with_olmocr_api(tmp_path, api_url)
+            if ocr_result is not None:
+                page_text, ocr_blocks = ocr_result
             else:
-                logger.info("OLMOCR from image (local)")
-                result = extract_text_with_olmocr_local(tmp_path, file_type='image')
-            return result
-        finally:
-            # Clean up temporary file
-            try:
-                os.unlink(tmp_path)
-            except:
-                pass
+                page_text, ocr_blocks = engine.ocr_image(img)
+            if page_text and page_text.startswith("Error"):
+                logger.warning(f"{engine.label} failed: {page_text}")
+                ocr_error = page_text
+                page_text = ""
+            else:
+                used_ocr = True
+                blocks = ocr_blocks or blocks
+        except Exception as e:
+            logger.warning(f"OCR failed for page {page_number}: {str(e)}")
+            ocr_error = str(e) or e.__class__.__name__
+            page_text = ""  # Create page anyway, even without text
+            blocks = []
+    
+    page_text = page_text.strip() if page_text else ''
+    
+    # Create JSON data structure with bounding boxes
+    json_data = {
+        'ocr_engine': ocr_engine,
+        'page_number': page_number,
+        'text': page_text,
+        'has_ocr': used_ocr,
+        'extraction_method': 'ocr' if used_ocr else 'direct',
+        'page_width': page_width,
+        'page_height': page_height,
+    }
+    
+    # Add blocks with bounding boxes if available
+    if blocks:
+        json_data['blocks'] = blocks
+    
+    # Failed pages are kept (empty) but never cached - see process_document_file
+    if ocr_error:
+        json_data['ocr_error'] = ocr_error
+    
+    return {
+        'page_number': page_number,
+        'text': page_text,
+        'json_data': json_data,
+    }
+
+
+def _ocr_single_image(ocr_images, img, ocr_engine):
+    """Run a batch OCR callable on one image, returning an "Error..." message if it fails"""
+    try:
+        return ocr_images([img])[0]
     except Exception as e:
-        return f"Error with OLMOCR: {str(e)}"
+        logger.error(f"Error with {ocr_engine} OCR: {str(e)}", exc_info=True)
+        return f"Error with {ocr_engine} OCR: {str(e)}"
+
+
+def extract_pages_with_batched_ocr(file_path, ocr_engine, ocr_images, window=16):
+    """Extract every page of a PDF like extract_pdf_page, OCRing pages without a text layer in batches
+    
+    Pages are handled a window at a time: the renderings of the window's pages
+    without a text layer are passed together to ocr_images, which returns one
+    text per image. If the call fails, the pages are OCRed one at a time so a
+    failure is recorded (as ocr_error) only on the pages it affects.
+    
+    Returns:
+        list: List of dictionaries with page_number, text and json_data
+    """
+    doc = fitz.open(file_path)
+    try:
+        pages_data = []
+        for window_start in range(0, len(doc), window):
+            pages = [doc.load_page(page_num) for page_num in range(window_start, min(window_start + window, len(doc)))]
+            scanned = [page for page in pages if not page.get_text().strip()]
+            
+            texts = []
+            if scanned:
+                images = [render_page(page) for page in scanned]
+                try:
+                    texts = ocr_images(images)
+                except Exception as e:
+                    logger.warning(f"Batched {ocr_engine} OCR failed, retrying {len(images)} pages one at a time: {str(e)}")
+                    texts = [_ocr_single_image(ocr_images, img, ocr_engine) for img in images]
+            ocr_results = {page.number: (text, []) for page, text in zip(scanned, texts)}
+            
+            for page in pages:
+                pages_data.append(extract_pdf_page(page, ocr_engine, ocr_result=ocr_results.get(page.number)))
+        return pages_data
+    finally:
+        doc.close()
+
+
+def extract_pages_with_remote_ocr(file_path, ocr_engine, ocr_image_text):
+    """Extract every page of a PDF, sending pages without a text layer to a remote OCR service
+    
+    Up to REMOTE_OCR_CONCURRENCY pages are in flight at once, so the service
+    works on several pages in parallel instead of receiving them one by one.
+    """
+    from .api_client import map_concurrently, remote_ocr_concurrency
+    
+    workers = remote_ocr_concurrency()
+    return extract_pages_with_batched_ocr(
+        file_path, ocr_engine,
+        lambda images: map_concurrently(ocr_image_text, images, workers),
+        window=workers * 4,
+    )
+
+
+def extract_pages_with_deepseek(file_path):
+    """Extract every page of a PDF with DeepSeek OCR, OCRing pages concurrently in Ollama or API mode"""
+    if not (getattr(settings, 'DEEPSEEK_OCR_USE_OLLAMA', True) or getattr(settings, 'DEEPSEEK_OCR_USE_API', True)):
+        # The in-process model is not thread safe; use the page loop
+        return []
+    return extract_pages_with_remote_ocr(file_path, 'deepseek', extract_text_with_deepseek_from_image)
+
+
+def _pdf_page_text(page, ocr_engine):
+    """Return the text of one PDF page for extract_text_from_pdf, OCRing it if needed"""
+    # Try to extract text directly first
+    page_text = page.get_text()
+    
+    # If no text found, use OCR
+    if not page_text.strip() and ocr_engine != 'pymupdf':
+        # Render page to an image
+        img = render_page(page)
+        
+        if ocr_engine == 'deepseek':
+            page_text = extract_text_with_deepseek_from_image(img)
+        else:
+            # Default to Tesseract for other engines
+            page_text, _ = ocr_image_with_tesseract(img)
+    
+    return f"\n--- Page {page.number + 1} ---\n{page_text}\n"
 
 
 def extract_text_from_pdf(pdf_path, ocr_engine='mineru'):
@@ -1706,84 +2133,20 @@ def extract_text_from_pdf(pdf_path, ocr_engine='mineru'):
 
         # If LightOnOCR is selected, run page-by-page OCR regardless of text layer
         if ocr_engine.lower() == 'lightonocr':
-            import fitz
-            doc = fitz.open(pdf_path)
-            text_parts = []
-            try:
-                target_longest_dim = int(getattr(settings, "LIGHTONOCR_TARGET_LONGEST_DIM", 1540))
-            except Exception:
-                target_longest_dim = 1540
-
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                rect = page.rect
-                longest = max(float(rect.width), float(rect.height)) if rect else 0.0
-                scale = (target_longest_dim / longest) if longest and target_longest_dim else 2.5
-                if scale < 0.5:
-                    scale = 0.5
-                if scale > 6.0:
-                    scale = 6.0
-
-                pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale))
-                mode = "RGB" if getattr(pix, "n", 3) < 4 else "RGBA"
-                img = Image.frombytes(mode, [pix.width, pix.height], pix.samples)
-                if mode == "RGBA":
-                    img = img.convert("RGB")
-
-                page_text = extract_text_with_lightonocr_from_image(img)
-                if page_text and page_text.startswith("Error"):
-                    page_text = ""
-                text_parts.append(f"--- Page {page_num + 1} ---\n{(page_text or '').strip()}\n")
-
-            doc.close()
-            return "\n".join(text_parts).strip()
+            return "\n".join(
+                f"--- Page {page_number} ---\n{page_text}\n"
+                for page_number, page_text, _, _, _, _ in lightonocr_pdf_pages(pdf_path)
+            ).strip()
         
         # If MinerU is selected and available, use it
         if ocr_engine.lower() == 'mineru' and mineru_available and mineru_do_parse is not None:
             result = extract_text_with_mineru(pdf_path, file_type='pdf')
             return result
         
-        # If PyMuPDF is explicitly selected, use it for direct text extraction
-        if ocr_engine.lower() == 'pymupdf':
-            doc = fitz.open(pdf_path)
-            text = ""
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                page_text = page.get_text()
-                text += f"\n--- Page {page_num + 1} ---\n{page_text}\n"
-            doc.close()
-            return text.strip()
-        
-        # Otherwise, use traditional method with PyMuPDF and optional OCR
-        # Open the PDF
-        doc = fitz.open(pdf_path)
-        text = ""
-        
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            
-            # Try to extract text directly first
-            page_text = page.get_text()
-            
-            # If no text found, use OCR
-            if not page_text.strip():
-                # Render page to an image
-                pix = page.get_pixmap()
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                
-                if ocr_engine.lower() == 'tesseract':
-                    page_text = pytesseract.image_to_string(img)
-                elif ocr_engine.lower() == 'deepseek':
-                    page_text = extract_text_with_deepseek_from_image(img)
-                elif ocr_engine.lower() == 'lightonocr':
-                    page_text = extract_text_with_lightonocr_from_image(img)
-                else:
-                    # Default to Tesseract if unknown engine
-                    page_text = pytesseract.image_to_string(img)
-            
-            text += f"\n--- Page {page_num + 1} ---\n{page_text}\n"
-        
-        doc.close()
+        # Otherwise use PyMuPDF for direct text extraction, with OCR for pages without
+        # a text layer. CPU-bound engines are sharded across page worker processes.
+        from .parallel import map_pages
+        text = "".join(map_pages(pdf_path, _pdf_page_text, ocr_engine.lower(), ocr_engine=ocr_engine.lower()))
         return text.strip()
     except Exception as e:
         return f"Error processing PDF: {str(e)}"
@@ -0,0 +1,300 @@
+"""
+Resident OLMOCR worker
+
+Running `python -m olmocr.pipeline` for every document re-imports the stack
+and reloads the model weights each time, and the results then have to be
+scraped from markdown files in a temporary workspace. Instead, one worker
+process (`python manage.py run_olmocr_worker`) loads the OLMOCR checkpoint
+once and serves requests on OLMOCR_WORKER_ADDRESS.
+
+A request is a list of PDF or image paths, or of in-memory page images sent
+as raw RGB pixels. The reply contains structured per-page results. Clients
+start the worker on first use when OLMOCR_WORKER_AUTOSTART is enabled.
+"""
+import hashlib
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+from multiprocessing.connection import Client, Listener
+
+import fitz  # PyMuPDF
+from django.conf import settings
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif')
+
+# Worker started by this process (see _start_worker)
+_worker_process = None
+
+
+def worker_address():
+    """Return the worker address from OLMOCR_WORKER_ADDRESS: (host, port), or a Unix socket path"""
+    address = getattr(settings, 'OLMOCR_WORKER_ADDRESS', '127.0.0.1:8765')
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return (host or '127.0.0.1', int(port))
+    return address
+
+
+def _authkey():
+    """Shared secret for worker connections, derived from SECRET_KEY"""
+    return hashlib.sha256(f"olmocr-worker:{settings.SECRET_KEY}".encode('utf-8')).digest()
+
+
+def parse_olmocr_output(raw_text):
+    """Split OLMOCR output into (natural text, metadata)
+
+    OLMOCR checkpoints answer with YAML front matter (primary_language,
+    is_rotation_valid, rotation_correction, is_table, is_diagram) followed by
+    the page text in markdown.
+    """
+    raw_text = (raw_text or '').strip()
+    match = re.match(r'^---\s*\n(.*?)\n---\s*\n?(.*)$', raw_text, re.DOTALL)
+    if not match:
+        return raw_text, {}
+
+    metadata = {}
+    for line in match.group(1).splitlines():
+        key, sep, value = line.partition(':')
+        if not sep:
+            continue
+        value = value.strip()
+        if value.lower() in ('true', 'false'):
+            value = value.lower() == 'true'
+        elif value.lower() in ('null', 'none', ''):
+            value = None
+        elif re.fullmatch(r'-?\d+', value):
+            value = int(value)
+        metadata[key.strip()] = value
+    return match.group(2).strip(), metadata
+
+
+class OlmocrModel:
+    """The OLMOCR vision-language model, loaded once per worker process"""
+
+    def __init__(self):
+        self.model_id = getattr(settings, 'OLMOCR_MODEL_ID', 'allenai/olmOCR-2-7B-1025')
+        self.processor_id = getattr(settings, 'OLMOCR_PROCESSOR_ID', 'Qwen/Qwen2.5-VL-7B-Instruct')
+        self.target_longest_dim = getattr(settings, 'OLMOCR_TARGET_LONGEST_DIM', 1288)
+        self.max_new_tokens = getattr(settings, 'OLMOCR_MAX_NEW_TOKENS', 3000)
+        self.model = None
+        self.processor = None
+        self.prompt = None
+
+    def load(self):
+        import torch
+        from transformers import AutoProcessor, Qwen2_5_VLForConditionalGeneration
+
+        try:
+            from olmocr.prompts import build_no_anchoring_v4_yaml_prompt
+            self.prompt = build_no_anchoring_v4_yaml_prompt()
+        except ImportError:
+            self.prompt = (
+                "Attached is one page of a document. Return the plain text representation of "
+                "this page as if you were reading it naturally, in markdown."
+            )
+
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        dtype = torch.bfloat16 if device == 'cuda' else torch.float32
+        self.model = Qwen2_5_VLForConditionalGeneration.from_pretrained(
+            self.model_id, torch_dtype=dtype
+        ).to(device).eval()
+        self.processor = AutoProcessor.from_pretrained(self.processor_id)
+        logger.info(f"OLMOCR model loaded: {self.model_id} on {device}")
+
+    def render(self, page):
+        """Render a fitz page with its longest side at OLMOCR_TARGET_LONGEST_DIM"""
+        from .render_cache import render_page
+
+        longest = max(page.rect.width, page.rect.height) or 1
+        return render_page(page, self.target_longest_dim / longest)
+
+    def recognize(self, img):
+        """Return the raw OLMOCR output for a page image"""
+        import torch
+
+        img = img.convert('RGB')
+        if max(img.size) != self.target_longest_dim:
+            ratio = self.target_longest_dim / max(img.size)
+            img = img.resize((max(1, round(img.width * ratio)), max(1, round(img.height * ratio))))
+
+        messages = [{
+            "role": "user",
+            "content": [
+                {"type": "text", "text": self.prompt},
+                {"type": "image"},
+            ],
+        }]
+        text = self.processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        inputs = self.processor(text=[text], images=[img], padding=True, return_tensors="pt")
+        inputs = {key: value.to(self.model.device) for key, value in inputs.items()}
+
+        with torch.inference_mode():
+            output_ids = self.model.generate(**inputs, max_new_tokens=self.max_new_tokens, do_sample=False)
+        generated_ids = output_ids[:, inputs['input_ids'].shape[1]:]
+        return self.processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
+
+
+def _page_result(model, img, page_number, width, height):
+    text, metadata = parse_olmocr_output(model.recognize(img))
+    return {
+        'page_number': page_number,
+        'text': text,
+        'width': width,
+        'height': height,
+        'metadata': metadata,
+    }
+
+
+def process_file(model, file_path):
+    """Run OLMOCR on every page of a PDF or on an image
+
+    Returns:
+        dict: {'pages': [{'page_number', 'text', 'width', 'height', 'metadata'}]}
+        or {'pages': [], 'error': message}
+    """
+    try:
+        if file_path.lower().endswith(IMAGE_EXTENSIONS):
+            img = Image.open(file_path).convert('RGB')
+            return {'pages': [_page_result(model, img, 1, img.width, img.height)]}
+
+        pages = []
+        with fitz.open(file_path) as doc:
+            for page in doc:
+                pages.append(_page_result(
+                    model, model.render(page), page.number + 1,
+                    round(page.rect.width), round(page.rect.height),
+                ))
+        return {'pages': pages}
+    except Exception as e:
+        logger.error(f"OLMOCR failed for {file_path}: {str(e)}", exc_info=True)
+        return {'pages': [], 'error': str(e)}
+
+
+class OlmocrWorkerServer:
+    """Serve OLMOCR requests from other processes with a model that stays loaded
+
+    Requests are handled one connection at a time, so the GPU is never shared
+    between requests; other clients wait in the listen backlog.
+    """
+
+    def __init__(self, model, address=None):
+        self.model = model
+        self.listener = Listener(address or worker_address(), authkey=_authkey())
+        self.address = self.listener.address
+
+    def handle(self, request):
+        command = request.get('command')
+        if command == 'ping':
+            return {'ok': True}
+        if command == 'process':
+            started = time.perf_counter()
+            results = [process_file(self.model, file_path) for file_path in request.get('files', [])]
+            pages = sum(len(result['pages']) for result in results)
+            logger.info(f"OLMOCR worker processed {len(results)} file(s), {pages} page(s) in {time.perf_counter() - started:.1f}s")
+            return {'ok': True, 'results': results}
+        if command == 'images':
+            # Raw RGB pixels sent by olmocr_worker_images; no file or encoding in between
+            pages = []
+            for page_number, (size, samples) in enumerate(request.get('images', []), start=1):
+                img = Image.frombytes('RGB', tuple(size), samples)
+                pages.append(_page_result(self.model, img, page_number, img.width, img.height))
+            return {'ok': True, 'pages': pages}
+        return {'ok': False, 'error': f"Unknown command: {command}"}
+
+    def serve_forever(self):
+        logger.info(f"OLMOCR worker listening on {self.address}")
+        try:
+            while True:
+                try:
+                    conn = self.listener.accept()
+                except Exception as e:
+                    logger.warning(f"Rejected OLMOCR worker connection: {str(e)}")
+                    continue
+                with conn:
+                    try:
+                        request = conn.recv()
+                    except EOFError:
+                        continue
+                    if request.get('command') == 'shutdown':
+                        conn.send({'ok': True})
+                        break
+                    conn.send(self.handle(request))
+        finally:
+            self.listener.close()
+
+
+def _start_worker():
+    """Start `manage.py run_olmocr_worker` in the background unless this process already did"""
+    global _worker_process
+
+    if _worker_process is not None and _worker_process.poll() is None:
+        return
+    manage_py = os.path.join(settings.BASE_DIR, 'manage.py')
+    logger.info("Starting resident OLMOCR worker")
+    _worker_process = subprocess.Popen(
+        [sys.executable, manage_py, 'run_olmocr_worker'],
+        cwd=settings.BASE_DIR,
+        start_new_session=True,
+    )
+
+
+def _connect(address):
+    """Connect to the worker, starting it if OLMOCR_WORKER_AUTOSTART is enabled"""
+    try:
+        return Client(address, authkey=_authkey())
+    except (ConnectionRefusedError, FileNotFoundError):
+        if not getattr(settings, 'OLMOCR_WORKER_AUTOSTART', True):
+            raise
+
+    _start_worker()
+    deadline = time.monotonic() + getattr(settings, 'OLMOCR_WORKER_START_TIMEOUT', 600)
+    while True:
+        # The worker only listens once its model is loaded
+        try:
+            return Client(address, authkey=_authkey())
+        except (ConnectionRefusedError, FileNotFoundError):
+            if time.monotonic() > deadline or (_worker_process is not None and _worker_process.poll() is not None):
+                raise RuntimeError("OLMOCR worker did not start - run `python manage.py run_olmocr_worker` to see why")
+            time.sleep(1)
+
+
+def _request(request, timeout, address=None):
+    with _connect(address or worker_address()) as conn:
+        conn.send(request)
+        if not conn.poll(timeout):
+            raise TimeoutError("OLMOCR worker did not answer in time")
+        reply = conn.recv()
+    if not reply.get('ok'):
+        raise RuntimeError(reply.get('error', 'OLMOCR worker failed'))
+    return reply
+
+
+def olmocr_worker_images(images, address=None):
+    """Run OLMOCR on PIL images with the resident worker, sending their raw RGB pixels
+
+    Returns:
+        list: One {'page_number', 'text', 'width', 'height', 'metadata'} dict per image
+    """
+    payload = []
+    for img in images:
+        img = img.convert('RGB')
+        payload.append((img.size, img.tobytes()))
+    timeout = getattr(settings, 'OLMOCR_WORKER_TIMEOUT', 600) * max(1, len(payload))
+    return _request({'command': 'images', 'images': payload}, timeout, address)['pages']
+
+
+def olmocr_worker_pages(file_paths, address=None):
+    """Run OLMOCR on several PDFs or images with the resident worker
+
+    Returns:
+        list: One {'pages': [...], 'error'?: str} result per file, in order
+    """
+    request = {'command': 'process', 'files': [os.path.abspath(path) for path in file_paths]}
+    timeout = getattr(settings, 'OLMOCR_WORKER_TIMEOUT', 600) * max(1, len(file_paths))
+    return _request(request, timeout, address)['results']
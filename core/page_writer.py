@@ -0,0 +1,87 @@
+"""
+Batched page persistence
+
+Extraction produces pages one at a time. Writing each one with get_or_create
+and save() costs several queries per page, and on SQLite every write contends
+with readers. PageWriter buffers pages and upserts them in batches with
+bulk_create(update_conflicts=True) on (document, page_number).
+
+After each batch the document's stored page_count and text_length are
+recounted, so list views never have to count pages or load their text. Each
+page's layout summary (core.layout) is built as it is buffered, and its
+blocks are copied into the Block table (core.blocks). Each batch also counts
+as a heartbeat of the extraction job being run (core.jobs).
+"""
+import logging
+
+from django.conf import settings
+from django.db import connection
+
+from .blocks import index_page_blocks
+from .jobs import heartbeat
+from .layout import build_layout_summary
+from .models import Page
+
+logger = logging.getLogger(__name__)
+
+
+class PageWriter:
+    """Buffer extracted pages for a document and write them in batches
+
+    Pages are flushed automatically whenever PAGE_WRITE_BATCH_SIZE pages are
+    buffered, so streaming extractors write as they go. Call flush() (or use the
+    writer as a context manager) once extraction finishes.
+    """
+
+    def __init__(self, document, batch_size=None):
+        self.document = document
+        self.batch_size = max(1, batch_size or getattr(settings, 'PAGE_WRITE_BATCH_SIZE', 100))
+        self.pages_written = 0
+        self._pending = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
+    def add(self, page_number, text='', json_data=None):
+        """Buffer a page. A later add() for the same page number replaces the earlier one."""
+        json_data = json_data if json_data is not None else {}
+        self._pending[page_number] = Page(
+            document=self.document,
+            page_number=page_number,
+            text=text or '',
+            json_data=json_data,
+            layout_summary=build_layout_summary(json_data, page_number),
+        )
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def add_page(self, page_info):
+        """Buffer a page dictionary with page_number, text and json_data keys"""
+        self.add(page_info['page_number'], page_info.get('text', ''), page_info.get('json_data', {}))
+
+    def flush(self):
+        """Write buffered pages, updating rows that already exist. Returns the number written."""
+        if not self._pending:
+            return 0
+
+        pages = list(self._pending.values())
+        self._pending = {}
+        upsert_options = {
+            'update_conflicts': True,
+            'update_fields': ['text', 'json_data', 'layout_summary', 'updated_at'],
+        }
+        # MySQL/MariaDB upsert on any unique key and reject an explicit target
+        if connection.features.supports_update_conflicts_with_target:
+            upsert_options['unique_fields'] = ['document', 'page_number']
+        Page.objects.bulk_create(pages, batch_size=self.batch_size, **upsert_options)
+        index_page_blocks(self.document, pages)
+        self.document.update_page_stats()
+        heartbeat()
+
+        self.pages_written += len(pages)
+        logger.info(f"Wrote {len(pages)} page(s) for document {self.document.pk} ({self.pages_written} total)")
+        return len(pages)
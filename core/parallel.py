@@ -0,0 +1,145 @@
+"""
+Page-sharded parallel extraction
+
+CPU-bound page engines (PyMuPDF, Tesseract, PaddleOCR) handle one page at a
+time. map_pages() splits a PDF into contiguous page ranges, and each range is
+processed by a worker process that opens its own fitz document. Results are
+yielded back in page order.
+
+Worker counts are configured per engine with EXTRACTION_PAGE_WORKERS.
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Process pools are kept alive between documents so workers only pay the
+# Django setup and model loading cost once
+_executors = {}
+
+
+def page_workers(engine):
+    """Return the number of page worker processes configured for an engine
+
+    A value of 0 uses every CPU core. Engines that are not configured run
+    sequentially in the calling process.
+    """
+    configured = getattr(settings, 'EXTRACTION_PAGE_WORKERS', {}) or {}
+    workers = configured.get((engine or '').lower(), 1)
+    if workers is None or workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def _init_worker():
+    """Set up Django in a freshly spawned worker process"""
+    # Parallelism comes from the pool - keep Tesseract from starting its own
+    # OpenMP threads in every worker
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _get_executor(workers):
+    """Return a shared process pool with the given number of workers"""
+    executor = _executors.get(workers)
+    if executor is None:
+        # spawn rather than fork: the parent may hold model threads and DB connections
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        )
+        _executors[workers] = executor
+    return executor
+
+
+def shutdown_executors():
+    """Shut down all shared page worker pools"""
+    while _executors:
+        _, executor = _executors.popitem()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+atexit.register(shutdown_executors)
+
+
+def _run_shard(file_path, start, stop, page_func, kwargs):
+    """Worker entry point: run page_func on pages [start, stop) of the PDF"""
+    doc = fitz.open(file_path)
+    try:
+        return [page_func(doc.load_page(page_num), **kwargs) for page_num in range(start, stop)]
+    finally:
+        doc.close()
+
+
+def map_pages(file_path, page_func, engine, **kwargs):
+    """Run page_func(page, **kwargs) on every page of a PDF and yield the results in page order
+
+    page_func and kwargs must be picklable (module-level function, plain data)
+    when more than one worker is configured for the engine.
+    """
+    doc = fitz.open(file_path)
+    total_pages = len(doc)
+    workers = min(page_workers(engine), total_pages)
+
+    if workers <= 1:
+        try:
+            for page_num in range(total_pages):
+                yield page_func(doc.load_page(page_num), **kwargs)
+        finally:
+            doc.close()
+        return
+    doc.close()
+
+    shard_size = max(1, getattr(settings, 'EXTRACTION_PAGE_SHARD_SIZE', 8))
+    # Keep every worker busy on short documents
+    shard_size = min(shard_size, -(-total_pages // workers))
+    shards = [(start, min(start + shard_size, total_pages)) for start in range(0, total_pages, shard_size)]
+    logger.info(f"Extracting {total_pages} pages with {engine} across {workers} workers ({len(shards)} shards)")
+
+    executor = _get_executor(workers)
+    futures = [executor.submit(_run_shard, file_path, start, stop, page_func, kwargs) for start, stop in shards]
+    try:
+        for future in futures:
+            for result in future.result():
+                yield result
+    except Exception:
+        for future in futures:
+            future.cancel()
+        if getattr(executor, '_broken', False):
+            _executors.pop(workers, None)
+        raise
+
+
+def run_in_workers(func, args_list, workers):
+    """Run func(*args) for each args tuple and yield the results in order
+
+    With more than one worker the calls run in the shared page worker pool, so
+    func and its arguments must be picklable.
+    """
+    workers = min(workers, len(args_list))
+    if workers <= 1:
+        for args in args_list:
+            yield func(*args)
+        return
+
+    executor = _get_executor(workers)
+    futures = [executor.submit(func, *args) for args in args_list]
+    try:
+        for future in futures:
+            yield future.result()
+    except Exception:
+        for future in futures:
+            future.cancel()
+        if getattr(executor, '_broken', False):
+            _executors.pop(workers, None)
+        raise
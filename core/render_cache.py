@@ -0,0 +1,133 @@
+"""
+Shared page render cache
+
+Thumbnails, OCR engines (1x), LightOnOCR and OLMOCR (their target sizes) all
+rasterize the same PDF pages, often many times for one document. render_page
+keeps the raw pixmap of every rendering on disk, keyed by file hash, page
+number, scale and colorspace, so each one is produced once and is then read
+back by memory-mapping the file.
+
+The cache is bounded by RENDER_CACHE_MAX_BYTES; the least recently used
+renderings are evicted first.
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+
+import fitz  # PyMuPDF
+from django.conf import settings
+from PIL import Image
+
+from .extraction_cache import DiskCache, _disk_cache, file_sha256
+
+logger = logging.getLogger(__name__)
+
+# Entry header: magic, width, height, channels
+HEADER = struct.Struct('<4sIII')
+MAGIC = b'PIX1'
+
+COLORSPACES = {
+    'rgb': (fitz.csRGB, 'RGB'),
+    'gray': (fitz.csGRAY, 'L'),
+}
+
+# {(path, size, mtime): sha256} so each page render doesn't rehash the whole file
+_file_hashes = {}
+
+
+class PixmapCache(DiskCache):
+    """Raw page pixmaps on disk, read through mmap, with size-bounded LRU eviction"""
+
+    suffix = '.pix'
+
+    def get_image(self, key):
+        """Return the cached rendering for key as a PIL image, or None on a miss"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                magic, width, height, channels = HEADER.unpack_from(mm)
+                length = width * height * channels
+                if magic != MAGIC or channels not in (1, 3) or len(mm) != HEADER.size + length:
+                    raise ValueError("bad pixmap header")
+                with memoryview(mm) as view, view[HEADER.size:] as samples:
+                    img = Image.frombytes('L' if channels == 1 else 'RGB', (width, height), samples)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"Discarding unreadable render cache entry {path}: {str(e)}")
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return img
+
+    def set_image(self, key, width, height, channels, samples):
+        """Store raw pixmap samples (width * height * channels bytes)"""
+        def write(f):
+            f.write(HEADER.pack(MAGIC, width, height, channels))
+            f.write(samples)
+        self._write(key, write, binary=True)
+
+
+def get_render_cache():
+    """Return the configured render cache, or None if it is disabled"""
+    if not getattr(settings, 'RENDER_CACHE_ENABLED', True):
+        return None
+    directory = getattr(settings, 'RENDER_CACHE_DIR', None)
+    if not directory:
+        return None
+    return _disk_cache(directory, getattr(settings, 'RENDER_CACHE_MAX_BYTES', 1024 ** 3), PixmapCache)
+
+
+def _cached_file_sha256(file_path):
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    if key not in _file_hashes:
+        _file_hashes[key] = file_sha256(file_path)
+    return _file_hashes[key]
+
+
+def render_cache_key(file_path, page_number, scale, colorspace='rgb'):
+    """Build the render cache key for a page of a file"""
+    key_data = {
+        'file': _cached_file_sha256(file_path),
+        'page': page_number,
+        'scale': f"{scale:.4f}",
+        'colorspace': colorspace,
+    }
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def render_page(page, scale=1.0, colorspace='rgb'):
+    """Return a fitz page rendered at scale as a PIL image ('RGB' or 'L')
+
+    Pages of documents opened from a file are served from the render cache;
+    documents opened from memory are always rendered.
+    """
+    fitz_colorspace, mode = COLORSPACES[colorspace]
+    cache = get_render_cache()
+    file_path = getattr(page.parent, 'name', '') if page.parent is not None else ''
+
+    key = None
+    if cache is not None and file_path and os.path.isfile(file_path):
+        try:
+            key = render_cache_key(file_path, page.number + 1, scale, colorspace)
+            img = cache.get_image(key)
+        except OSError as e:
+            logger.warning(f"Render cache lookup failed: {str(e)}")
+            key = img = None
+        if img is not None:
+            return img
+
+    pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), colorspace=fitz_colorspace, alpha=False)
+    if key is not None:
+        try:
+            cache.set_image(key, pix.width, pix.height, pix.n, pix.samples)
+        except OSError as e:
+            logger.warning(f"Could not store render cache entry: {str(e)}")
+    return Image.frombytes(mode, (pix.width, pix.height), pix.samples)
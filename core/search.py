@@ -0,0 +1,360 @@
+"""
+Full-text search over extracted page text
+
+The index lives in the database and is kept current by the database itself,
+so pages are indexed as they are written, updated or deleted (PageWriter
+upserts, reprocessing, admin edits) without any application hooks:
+
+- SQLite: an FTS5 table (core_page_fts) over core_page.text, maintained by
+  triggers and ranked with bm25
+- PostgreSQL: a generated tsvector column (core_page.search_vector) with a
+  GIN index, ranked with ts_rank_cd
+
+Other databases, or SQLite builds without FTS5, fall back to LIKE queries.
+Both index backends are created by migration 0014 from the statements below;
+`manage.py search_index --rebuild` re-creates the SQLite triggers (Django
+drops them when it rebuilds the core_page table for a schema change) and
+reindexes every page.
+
+search_pages returns a lazy SearchResults that can be handed to Django's
+Paginator; only the requested page of hits is fetched and snippeted.
+"""
+import html
+import logging
+import re
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+logger = logging.getLogger(__name__)
+
+# Snippet highlight markers, replaced with <mark> after the snippet is escaped
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+FTS_TABLE = 'core_page_fts'
+
+SQLITE_INSTALL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text, content='core_page', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON core_page BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON core_page BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF text ON core_page BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+]
+
+SQLITE_REBUILD = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+
+SQLITE_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRES_INSTALL = [
+    """
+    ALTER TABLE core_page ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(text, ''))) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS core_page_search_vector ON core_page USING GIN (search_vector)",
+]
+
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS core_page_search_vector",
+    "ALTER TABLE core_page DROP COLUMN IF EXISTS search_vector",
+]
+
+# A quoted phrase, or a word with an optional trailing * for prefix search
+QUERY_TOKEN = re.compile(r'"([^"]*)"|(\w+\*?)')
+WORD = re.compile(r'\w+')
+
+
+def query_terms(query):
+    """Split a user query into (words, is_prefix, is_phrase) terms, dropping search syntax"""
+    terms = []
+    for phrase, word in QUERY_TOKEN.findall(query or ''):
+        if phrase:
+            words = WORD.findall(phrase)
+            if words:
+                terms.append((words, False, len(words) > 1))
+        elif word:
+            terms.append(([word.rstrip('*')], word.endswith('*'), False))
+    return terms
+
+
+def _highlight(snippet):
+    """Escape a snippet and turn the highlight markers into <mark> tags"""
+    return html.escape(snippet or '').replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def _document_filter(document_ids, column):
+    if document_ids is None:
+        return '', []
+    document_ids = [int(document_id) for document_id in document_ids]
+    if not document_ids:
+        return ' AND 1 = 0', []
+    return f" AND {column} IN ({', '.join(['%s'] * len(document_ids))})", document_ids
+
+
+def _hit(row):
+    page_id, document_id, page_number, title, snippet, score = row
+    return {
+        'page_id': page_id,
+        'document_id': document_id,
+        'document_title': title,
+        'page_number': page_number,
+        'snippet': _highlight(snippet),
+        'score': score,
+    }
+
+
+class Fts5Backend:
+    """SQLite FTS5 index, ranked by bm25"""
+
+    name = 'fts5'
+
+    def match_expression(self, query):
+        parts = []
+        for words, prefix, _phrase in query_terms(query):
+            parts.append('"' + ' '.join(words) + '"' + ('*' if prefix else ''))
+        return ' '.join(parts)
+
+    def count(self, query, document_ids=None):
+        match = self.match_expression(query)
+        if not match:
+            return 0
+        where, params = _document_filter(document_ids, 'p.document_id')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT count(*) FROM {FTS_TABLE} JOIN core_page p ON p.id = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s{where}",
+                [match, *params],
+            )
+            return cursor.fetchone()[0]
+
+    def search(self, query, limit, offset=0, document_ids=None):
+        match = self.match_expression(query)
+        if not match:
+            return []
+        where, params = _document_filter(document_ids, 'p.document_id')
+        snippet_tokens = getattr(settings, 'SEARCH_SNIPPET_WORDS', 24)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT p.id, p.document_id, p.page_number, d.title, "
+                f"snippet({FTS_TABLE}, 0, %s, %s, '…', %s), -{FTS_TABLE}.rank "
+                f"FROM {FTS_TABLE} "
+                f"JOIN core_page p ON p.id = {FTS_TABLE}.rowid "
+                f"JOIN core_document d ON d.id = p.document_id "
+                f"WHERE {FTS_TABLE} MATCH %s{where} "
+                f"ORDER BY {FTS_TABLE}.rank LIMIT %s OFFSET %s",
+                [MARK_START, MARK_END, min(64, snippet_tokens), match, *params, limit, offset],
+            )
+            return [_hit(row) for row in cursor.fetchall()]
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            for statement in SQLITE_INSTALL:
+                cursor.execute(statement)
+            cursor.execute(SQLITE_REBUILD)
+
+    def optimize(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+class PostgresBackend:
+    """PostgreSQL tsvector column with a GIN index, ranked by ts_rank_cd"""
+
+    name = 'postgresql'
+    config = 'simple'
+
+    def tsquery(self, query):
+        """Return a to_tsquery expression: phrases with <->, prefixes with :*, terms ANDed"""
+        parts = []
+        for words, prefix, _phrase in query_terms(query):
+            words = [word.lower() for word in words]
+            parts.append(' <-> '.join(words) + (':*' if prefix else ''))
+        return ' & '.join(f'({part})' for part in parts)
+
+    def count(self, query, document_ids=None):
+        tsquery = self.tsquery(query)
+        if not tsquery:
+            return 0
+        where, params = _document_filter(document_ids, 'p.document_id')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT count(*) FROM core_page p "
+                f"WHERE p.search_vector @@ to_tsquery('{self.config}', %s){where}",
+                [tsquery, *params],
+            )
+            return cursor.fetchone()[0]
+
+    def search(self, query, limit, offset=0, document_ids=None):
+        tsquery = self.tsquery(query)
+        if not tsquery:
+            return []
+        where, params = _document_filter(document_ids, 'p.document_id')
+        words = getattr(settings, 'SEARCH_SNIPPET_WORDS', 24)
+        options = f"StartSel={MARK_START}, StopSel={MARK_END}, MaxWords={words}, MinWords={max(1, words // 2)}, MaxFragments=2"
+        with connection.cursor() as cursor:
+            # Rank and page first so ts_headline only runs on the returned hits
+            cursor.execute(
+                f"WITH q AS (SELECT to_tsquery('{self.config}', %s) AS query), "
+                f"hits AS ("
+                f"  SELECT p.id, ts_rank_cd(p.search_vector, q.query) AS score FROM core_page p, q "
+                f"  WHERE p.search_vector @@ q.query{where} "
+                f"  ORDER BY score DESC LIMIT %s OFFSET %s"
+                f") "
+                f"SELECT p.id, p.document_id, p.page_number, d.title, "
+                f"ts_headline('{self.config}', p.text, q.query, %s), hits.score "
+                f"FROM hits JOIN core_page p ON p.id = hits.id JOIN core_document d ON d.id = p.document_id, q "
+                f"ORDER BY hits.score DESC",
+                [tsquery, *params, limit, offset, options],
+            )
+            return [_hit(row) for row in cursor.fetchall()]
+
+    def rebuild(self):
+        # The generated column is always current; refresh planner statistics instead
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE core_page")
+
+    def optimize(self):
+        with connection.cursor() as cursor:
+            cursor.execute("VACUUM ANALYZE core_page")
+
+
+class LikeBackend:
+    """Unindexed fallback: every term must appear in the page text (case-insensitive)"""
+
+    name = 'like'
+
+    def queryset(self, query, document_ids=None):
+        from .models import Page
+
+        terms = query_terms(query)
+        if not terms:
+            return Page.objects.none()
+        pages = Page.objects.all()
+        for words, _prefix, _phrase in terms:
+            pages = pages.filter(text__icontains=' '.join(words))
+        if document_ids is not None:
+            pages = pages.filter(document_id__in=document_ids)
+        return pages
+
+    def count(self, query, document_ids=None):
+        return self.queryset(query, document_ids).count()
+
+    def search(self, query, limit, offset=0, document_ids=None):
+        needles = [' '.join(words).lower() for words, _prefix, _phrase in query_terms(query)]
+        pages = (
+            self.queryset(query, document_ids)
+            .select_related('document')
+            .only('id', 'document_id', 'document__title', 'page_number', 'text')
+            .order_by('document_id', 'page_number')[offset:offset + limit]
+        )
+        return [
+            _hit((page.pk, page.document_id, page.page_number, page.document.title, self.snippet(page.text, needles), 0.0))
+            for page in pages
+        ]
+
+    def snippet(self, text, needles, width=None):
+        """Return the text around the first match with the matches marked"""
+        width = width or getattr(settings, 'SEARCH_SNIPPET_WORDS', 24) * 6
+        lowered = text.lower()
+        positions = [lowered.find(needle) for needle in needles if needle]
+        positions = [position for position in positions if position >= 0]
+        start = max(0, min(positions, default=0) - width // 2)
+        end = min(len(text), start + width)
+        fragment = text[start:end]
+        for needle in needles:
+            fragment = re.sub(re.escape(needle), lambda m: f"{MARK_START}{m.group(0)}{MARK_END}", fragment, flags=re.IGNORECASE)
+        return ('…' if start else '') + fragment + ('…' if end < len(text) else '')
+
+    def rebuild(self):
+        pass
+
+    def optimize(self):
+        pass
+
+
+_backends = {}
+
+
+def _fts5_installed():
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            return cursor.fetchone() is not None
+    except DatabaseError:
+        return False
+
+
+def get_search_backend():
+    """Return the search backend for the default database (SEARCH_BACKEND='like' forces the fallback)"""
+    choice = getattr(settings, 'SEARCH_BACKEND', 'auto')
+    key = (connection.alias, connection.vendor, choice)
+    if key not in _backends:
+        backend = LikeBackend()
+        if choice != 'like':
+            if connection.vendor == 'sqlite' and _fts5_installed():
+                backend = Fts5Backend()
+            elif connection.vendor == 'postgresql':
+                backend = PostgresBackend()
+        logger.info(f"Using {backend.name} page search backend")
+        _backends[key] = backend
+    return _backends[key]
+
+
+class SearchResults:
+    """Lazy search results; supports len() and slicing, so it works with Paginator"""
+
+    def __init__(self, query, document_ids=None, backend=None):
+        self.query = query
+        self.document_ids = document_ids
+        self.backend = backend or get_search_backend()
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.backend.count(self.query, self.document_ids)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start = index.start or 0
+            stop = index.stop if index.stop is not None else self.count()
+            if stop <= start:
+                return []
+            return self.backend.search(self.query, stop - start, start, self.document_ids)
+        hits = self.backend.search(self.query, 1, index, self.document_ids)
+        if not hits:
+            raise IndexError(index)
+        return hits[0]
+
+
+def search_pages(query, document_ids=None):
+    """Search page text. Returns SearchResults of hit dicts, best match first:
+
+    page_id, document_id, document_title, page_number, snippet (HTML with the
+    matches in <mark>), score (higher is better)
+    """
+    return SearchResults(query, document_ids)
@@ -1,11 +1,12 @@
 """
 Django signals for automatic document processing
 """
-from django.db.models.signals import post_save, pre_save
-from django.dispatch import receiver
 from django.db import transaction
-from .models import Document
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .models import Document, Page
 import logging
+import weakref
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +17,7 @@ _original_ocr_engine = {}
 @receiver(post_save, sender=Document)
 def auto_process_document(sender, instance, created, **kwargs):
     """
-    Automatically process document file when saved.
+    Automatically queue extraction of the document file when saved.
     This triggers extraction for documents created via admin, API, or any other method.
     """
     # Only process if document has a file
@@ -43,22 +44,14 @@ def auto_process_document(sender, instance, created, **kwargs):
     if created or not has_pages or ocr_engine_changed:
         try:
             # Import here to avoid circular imports
-            from .views import process_document_file
-            
-            # Delete existing pages if reprocessing (use transaction only for delete)
-            if has_pages:
-                with transaction.atomic():
-                    instance.pages.all().delete()
+            from .jobs import schedule_extraction
             
-            # Process the document (this may take a while for large files)
-            # Don't wrap this in transaction.atomic() as it can cause SQLite locking issues
-            # during long-running OCR operations. The process_document_file function
-            # will handle its own database operations.
-            process_document_file(instance)
-            
-            logger.info(f"Successfully processed document {instance.id} ({instance.title})")
+            # Extraction runs in a background worker (run_extraction_workers) once the
+            # save has committed, so the admin save or HTTP request returns right away.
+            # Existing pages are deleted by the worker when reprocessing.
+            schedule_extraction(instance, reprocess=has_pages)
         except Exception as e:
-            logger.error(f"Error processing document {instance.id}: {str(e)}", exc_info=True)
+            logger.error(f"Error scheduling extraction for document {instance.id}: {str(e)}", exc_info=True)
             # Don't raise exception to avoid breaking the save operation
             # The error will be logged but document will still be saved
 
@@ -91,3 +84,53 @@ def set_file_type_and_track_ocr_engine(sender, instance, **kwargs):
     if not instance.ocr_engine:
         instance.ocr_engine = 'mineru'
 
+
+@receiver(post_delete, sender=Document)
+def delete_thumbnails(sender, instance, **kwargs):
+    """Remove the page thumbnails of a deleted document"""
+    from .thumbnails import delete_document_thumbnails
+    delete_document_thumbnails(instance.pk)
+
+
+@receiver(post_save, sender=Page)
+def update_document_page_stats(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Keep the document's page_count and text_length current when a single page is edited"""
+    # Pages written by PageWriter use bulk_create and are counted there
+    if raw or (not created and update_fields is not None and 'text' not in update_fields):
+        return
+    instance.document.update_page_stats()
+
+
+# Documents already scheduled for a recount, per delete() call (origin)
+_recounts_scheduled = weakref.WeakKeyDictionary()
+
+
+def _recount_page_stats(document_id):
+    Document(pk=document_id).update_page_stats()
+
+
+@receiver(post_delete, sender=Page)
+def update_document_page_stats_on_delete(sender, instance, origin=None, **kwargs):
+    """Recount the document's page_count and text_length once pages are deleted
+
+    The recount runs once per document and delete() call, after the delete
+    commits, rather than once per page.
+    """
+    if isinstance(origin, Document) or getattr(origin, 'model', None) is Document:
+        # The document itself is being deleted
+        return
+    scheduled = _recounts_scheduled.setdefault(origin if origin is not None else instance, set())
+    if instance.document_id in scheduled:
+        return
+    scheduled.add(instance.document_id)
+    document_id = instance.document_id
+    transaction.on_commit(lambda: _recount_page_stats(document_id))
+
+
+@receiver(post_save, sender=Page)
+def update_page_blocks(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Re-index a page's blocks when its JSON data is edited"""
+    if raw or (not created and update_fields is not None and 'json_data' not in update_fields):
+        return
+    from .blocks import index_page_blocks
+    index_page_blocks(instance.document, [instance])
@@ -0,0 +1,237 @@
+"""
+Spatial queries over block rectangles
+
+Questions like "what text sits in the top-right 20% of page 1 of every
+capital call notice" are answered from the Block table (core.blocks) using
+each block's rectangle normalized to its page (nx0, ny0, nx1, ny1 in 0..1,
+origin top left), so the same region works across page sizes and engines:
+
+    Block.objects.filter(document__title__icontains="capital call").on_page(1).in_region(0.8, 0, 1, 0.2)
+
+The rectangles are indexed by the database:
+
+- SQLite: an R*Tree table (core_block_rtree) maintained by triggers on core_block
+- PostgreSQL: a GiST index on box(point(nx0, ny0), point(nx1, ny1))
+
+Both are created by migration 0015 from the statements below. Other databases,
+or SQLite builds without R*Tree, compare the columns directly. Django drops the
+triggers when it rebuilds core_block for a schema change on SQLite;
+`manage.py spatial_index --rebuild` re-creates them.
+
+nearest_blocks and anchor_neighbors find the blocks closest to an anchor,
+e.g. the value to the right of an "Amount due" label. The spatial index covers
+the whole corpus, so these read the anchor's page through the page index
+instead, and anchor_neighbors loads the pages of all its anchors in one query.
+"""
+import logging
+
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+RTREE_TABLE = 'core_block_rtree'
+
+DIRECTIONS = ('right', 'left', 'above', 'below')
+
+SQLITE_INSTALL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {RTREE_TABLE} USING rtree(id, x0, x1, y0, y1)",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {RTREE_TABLE}_insert AFTER INSERT ON core_block WHEN new.nx0 IS NOT NULL BEGIN
+        INSERT INTO {RTREE_TABLE} VALUES (new.id, new.nx0, new.nx1, new.ny0, new.ny1);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {RTREE_TABLE}_delete AFTER DELETE ON core_block BEGIN
+        DELETE FROM {RTREE_TABLE} WHERE id = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {RTREE_TABLE}_update AFTER UPDATE OF nx0, ny0, nx1, ny1 ON core_block BEGIN
+        DELETE FROM {RTREE_TABLE} WHERE id = old.id;
+        INSERT INTO {RTREE_TABLE} SELECT new.id, new.nx0, new.nx1, new.ny0, new.ny1 WHERE new.nx0 IS NOT NULL;
+    END
+    """,
+]
+
+SQLITE_LOAD = f"INSERT INTO {RTREE_TABLE} SELECT id, nx0, nx1, ny0, ny1 FROM core_block WHERE nx0 IS NOT NULL"
+
+SQLITE_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {RTREE_TABLE}_update",
+    f"DROP TRIGGER IF EXISTS {RTREE_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {RTREE_TABLE}_insert",
+    f"DROP TABLE IF EXISTS {RTREE_TABLE}",
+]
+
+POSTGRES_INSTALL = [
+    "CREATE INDEX IF NOT EXISTS core_block_region ON core_block USING GIST (box(point(nx0, ny0), point(nx1, ny1)))",
+]
+
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS core_block_region",
+]
+
+_rtree_installed = {}
+
+
+def rtree_installed():
+    """Return True if the SQLite R*Tree block index exists"""
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.alias not in _rtree_installed:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [RTREE_TABLE])
+                _rtree_installed[connection.alias] = cursor.fetchone() is not None
+        except DatabaseError:
+            _rtree_installed[connection.alias] = False
+    return _rtree_installed[connection.alias]
+
+
+def rebuild_rtree():
+    """Re-create the SQLite R*Tree triggers and reload the index from core_block. Returns False if unavailable."""
+    if connection.vendor != 'sqlite':
+        return False
+    try:
+        with connection.cursor() as cursor:
+            for statement in SQLITE_INSTALL:
+                cursor.execute(statement)
+            cursor.execute(f"DELETE FROM {RTREE_TABLE}")
+            cursor.execute(SQLITE_LOAD)
+    except DatabaseError as e:
+        logger.warning(f"Could not build the block R*Tree index: {str(e)}")
+        return False
+    _rtree_installed[connection.alias] = True
+    return True
+
+
+def region_filter(x0, y0, x1, y1, contained=False):
+    """Return a Q selecting blocks that overlap (or lie inside) a rectangle in 0..1 page coordinates"""
+    x0, x1 = sorted((float(x0), float(x1)))
+    y0, y1 = sorted((float(y0), float(y1)))
+    if rtree_installed():
+        if contained:
+            where, params = "x0 >= %s AND x1 <= %s AND y0 >= %s AND y1 <= %s", [x0, x1, y0, y1]
+        else:
+            where, params = "x0 <= %s AND x1 >= %s AND y0 <= %s AND y1 >= %s", [x1, x0, y1, y0]
+        return Q(pk__in=RawSQL(f"SELECT id FROM {RTREE_TABLE} WHERE {where}", params))
+    if connection.vendor == 'postgresql':
+        operator = '<@' if contained else '&&'
+        return Q(pk__in=RawSQL(
+            f"SELECT id FROM core_block WHERE box(point(nx0, ny0), point(nx1, ny1)) {operator} box(point(%s, %s), point(%s, %s))",
+            [x0, y0, x1, y1],
+        ))
+    if contained:
+        return Q(nx0__gte=x0, nx1__lte=x1, ny0__gte=y0, ny1__lte=y1)
+    return Q(nx0__lte=x1, nx1__gte=x0, ny0__lte=y1, ny1__gte=y0)
+
+
+def blocks_in_region(x0, y0, x1, y1, contained=False, document_ids=None, page_number=None, kind=None):
+    """Return the blocks in a page region, optionally limited to documents, a page number and a kind"""
+    from .models import Block
+
+    blocks = Block.objects.in_region(x0, y0, x1, y1, contained=contained)
+    if document_ids is not None:
+        blocks = blocks.filter(document_id__in=document_ids)
+    if page_number is not None:
+        blocks = blocks.on_page(page_number)
+    if kind is not None:
+        blocks = blocks.filter(kind=kind)
+    return blocks
+
+
+def _gap(a, b):
+    """Return the (dx, dy) gap between two rectangles; 0 where they overlap"""
+    dx = max(0.0, b.nx0 - a.nx1, a.nx0 - b.nx1)
+    dy = max(0.0, b.ny0 - a.ny1, a.ny0 - b.ny1)
+    return dx, dy
+
+
+def _in_direction(anchor, block, direction):
+    """Return True if block lies in direction from anchor and shares its row (left/right) or column (above/below)"""
+    shares_row = block.ny0 < anchor.ny1 and block.ny1 > anchor.ny0
+    shares_column = block.nx0 < anchor.nx1 and block.nx1 > anchor.nx0
+    if direction == 'right':
+        return shares_row and block.nx0 >= anchor.nx1 - 1e-6
+    if direction == 'left':
+        return shares_row and block.nx1 <= anchor.nx0 + 1e-6
+    if direction == 'below':
+        return shares_column and block.ny0 >= anchor.ny1 - 1e-6
+    if direction == 'above':
+        return shares_column and block.ny1 <= anchor.ny0 + 1e-6
+    return True
+
+
+def _check_direction(direction):
+    if direction is not None and direction not in DIRECTIONS:
+        raise ValueError(f"direction must be one of {', '.join(DIRECTIONS)}")
+
+
+def _rank(anchor, candidates, direction, limit, max_distance):
+    """Return the candidates within max_distance of anchor in direction, nearest first"""
+    ranked = []
+    for block in candidates:
+        if block.pk == anchor.pk or not _in_direction(anchor, block, direction):
+            continue
+        dx, dy = _gap(anchor, block)
+        distance = (dx * dx + dy * dy) ** 0.5
+        if distance <= max_distance:
+            ranked.append((distance, block.ordinal, block))
+    ranked.sort(key=lambda item: item[:2])
+    return [block for _distance, _ordinal, block in ranked[:limit]]
+
+
+def nearest_blocks(anchor, direction=None, limit=5, max_distance=0.25, kind=None):
+    """Return the blocks on the anchor's page closest to it, nearest first
+
+    direction ('right', 'left', 'above', 'below') keeps only blocks on that
+    side in the same row or column. Only blocks within max_distance (in page
+    fractions) are considered.
+    """
+    from .models import Block
+
+    _check_direction(direction)
+    if anchor.nx0 is None:
+        return []
+
+    # The window is compared on the page's own blocks, not looked up corpus-wide
+    candidates = Block.objects.filter(
+        page_id=anchor.page_id,
+        nx0__lte=anchor.nx1 + max_distance,
+        nx1__gte=anchor.nx0 - max_distance,
+        ny0__lte=anchor.ny1 + max_distance,
+        ny1__gte=anchor.ny0 - max_distance,
+    )
+    if kind is not None:
+        candidates = candidates.filter(kind=kind)
+    return _rank(anchor, candidates, direction, limit, max_distance)
+
+
+def anchor_neighbors(text, document_ids=None, page_number=None, direction=None, limit=1, max_distance=0.25):
+    """Find blocks containing text and the blocks nearest each of them
+
+    Runs two queries: one for the anchors and one for the blocks of their pages.
+
+    Returns:
+        list: (anchor block, [nearest blocks]) for every anchor with a rectangle
+    """
+    from .models import Block
+
+    _check_direction(direction)
+    anchors = Block.objects.containing(text).filter(nx0__isnull=False).select_related('page')
+    if document_ids is not None:
+        anchors = anchors.filter(document_id__in=document_ids)
+    if page_number is not None:
+        anchors = anchors.on_page(page_number)
+    anchors = list(anchors)
+    if not anchors:
+        return []
+
+    page_blocks = {}
+    for block in Block.objects.filter(page_id__in={anchor.page_id for anchor in anchors}, nx0__isnull=False):
+        page_blocks.setdefault(block.page_id, []).append(block)
+    return [
+        (anchor, _rank(anchor, page_blocks.get(anchor.page_id, []), direction, limit, max_distance))
+        for anchor in anchors
+    ]
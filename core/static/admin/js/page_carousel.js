@@ -38,6 +38,50 @@
         });
     }
     
+    function loadPagePreview($, $form) {
+        // Fetch the image URL and JSON of a page once, when it is first shown
+        var $item = $form.find('.page-preview-carousel-item');
+        var url = $item.data('preview-url');
+        if (!url || $item.data('preview-state')) {
+            return;
+        }
+        $item.data('preview-state', 'loading');
+        
+        $.getJSON(url).done(function(data) {
+            var $image = $item.find('.page-preview-image').empty();
+            if (data.thumbnail_url) {
+                $('<img>', {
+                    src: data.thumbnail_url,
+                    alt: 'Page ' + data.page_number,
+                    css: {'max-width': '100%', 'width': '100%', 'height': 'auto', 'border': '1px solid #ddd', 'border-radius': '4px', 'display': 'block'}
+                }).appendTo($image);
+            } else {
+                $('<p>', {text: 'PDF preview only available for PDF documents', css: {'color': '#999'}}).appendTo($image);
+            }
+            
+            var $json = $item.find('.page-preview-json').empty();
+            if (data.json_data) {
+                var $box = $('<div>', {
+                    css: {'background': '#f5f5f5', 'border': '1px solid #ddd', 'border-radius': '4px', 'padding': '12px', 'max-height': '600px', 'overflow-y': 'auto', 'font-family': 'monospace', 'font-size': '12px', 'width': '100%', 'box-sizing': 'border-box'}
+                });
+                // text() escapes the JSON
+                $('<pre>', {css: {'margin': '0', 'white-space': 'pre-wrap', 'word-wrap': 'break-word'}})
+                    .text(JSON.stringify(data.json_data, null, 2))
+                    .appendTo($box);
+                $box.appendTo($json);
+            } else {
+                $('<p>', {text: 'No JSON data available', css: {'color': '#999'}}).appendTo($json);
+            }
+            $item.data('preview-state', 'loaded');
+        }).fail(function() {
+            $item.find('.page-preview-image, .page-preview-json').empty().append(
+                $('<p>', {text: 'Error loading preview', css: {'color': 'red'}})
+            );
+            // Allow a retry the next time the page is shown
+            $item.data('preview-state', null);
+        });
+    }
+    
     function initPageCarousel($) {
         // Find inline groups that contain page inlines
         var $inlineGroups = $('.inline-group').filter(function() {
@@ -135,9 +179,13 @@
                     item.$form.hide();
                 });
                 
-                // Show current form
+                // Show current form and load its preview (and the next page's, ahead of time)
                 if (formsWithPageNum[currentIndex]) {
                     formsWithPageNum[currentIndex].$form.show();
+                    loadPagePreview($, formsWithPageNum[currentIndex].$form);
+                }
+                if (formsWithPageNum[currentIndex + 1]) {
+                    loadPagePreview($, formsWithPageNum[currentIndex + 1].$form);
                 }
                 
                 // Update buttons
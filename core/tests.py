@@ -1,11 +1,31 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
-from .models import Document, Page
+from .models import Document, Page, ExtractionJob
+from .jobs import enqueue_extraction, claim_next_job, run_job
+from .page_writer import PageWriter
 import os
 import tempfile
 
 
+# Keep every on-disk cache out of the checkout; test classes may still override these
+_cache_root = tempfile.mkdtemp()
+_cache_settings = override_settings(
+    EXTRACTION_CACHE_DIR=os.path.join(_cache_root, 'extraction'),
+    PAGE_OCR_CACHE_DIR=os.path.join(_cache_root, 'page_ocr'),
+    RENDER_CACHE_DIR=os.path.join(_cache_root, 'render'),
+    MINERU_CHECKPOINT_DIR=os.path.join(_cache_root, 'mineru_windows'),
+)
+
+
+def setUpModule():
+    _cache_settings.enable()
+
+
+def tearDownModule():
+    _cache_settings.disable()
+
+
 class DocumentModelTest(TestCase):
     """Test cases for Document model"""
     
@@ -82,6 +102,296 @@ class PageModelTest(TestCase):
             )
 
 
+class PageLayoutSummaryTest(TestCase):
+    """Test cases for stored page layout summaries"""
+    
+    def setUp(self):
+        self.document = Document.objects.create(title="Layout Document", ocr_engine="mineru")
+        self.json_data = {'blocks': [
+            {'type': 'title', 'text': "Invoice", 'bbox': [0, 0, 10, 10]},
+            {'type': 'text', 'text': "Due in 30 days"},
+            {'type': 'table', 'html': "<table></table>", 'bbox': [0, 20, 10, 30]},
+            {'type': 'interline_equation', 'text': "x"},
+            {'type': 'text', 'text': "Thank you"},
+        ]}
+    
+    def test_summary_is_stored_on_write(self):
+        """Test that PageWriter and save() store the layout summary"""
+        with PageWriter(self.document) as writer:
+            writer.add(1, "Invoice", self.json_data)
+        Page.objects.create(document=self.document, page_number=2, text="", json_data={'blocks': []})
+        
+        summary = self.document.pages.get(page_number=1).layout_summary
+        self.assertEqual(summary['blocks'], 5)
+        self.assertEqual(summary['counts'], {'table': 1, 'formula': 0, 'heading': 1, 'paragraph': 2, 'bbox': 2})
+        self.assertEqual(summary['offsets']['table'], [2])
+        self.assertEqual([summary['type_names'][t] for t in summary['types']], [b['type'] for b in self.json_data['blocks']])
+        self.assertEqual(self.document.pages.get(page_number=2).layout_summary['blocks'], 0)
+    
+    def test_accessors_read_summary(self):
+        """Test that layout counts don't need json_data once the summary is stored"""
+        Page.objects.create(document=self.document, page_number=1, text="", json_data=self.json_data)
+        page = Page.objects.defer('json_data').get(document=self.document, page_number=1)
+        
+        with self.assertNumQueries(0):
+            structure = page.get_layout_structure(include_blocks=False)
+        self.assertEqual(structure['tables_count'], 1)
+        self.assertEqual(structure['paragraphs_count'], 2)
+        self.assertTrue(structure['has_layout'])
+        self.assertEqual([b['text'] for b in page.get_headings()], ["Invoice"])
+        self.assertEqual(page.extract_text_by_type('TEXT'), ["Due in 30 days", "Thank you"])
+        self.assertEqual(len(page.get_bounding_boxes()), 2)
+    
+    def test_pages_without_summary_compute_it(self):
+        """Test that pages written before summaries were stored still answer layout queries"""
+        from django.core.management import call_command
+        from io import StringIO
+        
+        page = Page.objects.create(document=self.document, page_number=1, text="", json_data=self.json_data)
+        Page.objects.filter(pk=page.pk).update(layout_summary={})
+        page = Page.objects.get(pk=page.pk)
+        self.assertEqual(len(page.get_tables()), 1)
+        
+        call_command('backfill_page_stats', '--layout', stdout=StringIO())
+        self.assertEqual(Page.objects.get(pk=page.pk).layout_summary['counts']['table'], 1)
+
+
+class BlockIndexTest(TestCase):
+    """Test cases for the normalized Block table"""
+    
+    def setUp(self):
+        self.document = Document.objects.create(title="Capital call", ocr_engine="mineru")
+    
+    def test_blocks_are_written_with_pages(self):
+        """Test that PageWriter indexes blocks and rewriting a page replaces them"""
+        from .models import Block
+        
+        with PageWriter(self.document) as writer:
+            writer.add(1, "", {'blocks': [
+                {'type': 'title', 'text': "Capital Call Notice", 'bbox': [10, 20, 110, 40]},
+                {'type': 'table', 'html': "<table></table>", 'bbox': [10, 50, 200, 150], 'score': 0.9},
+            ]})
+            writer.add(2, "", {'ocr_engine': 'pymupdf', 'blocks': [
+                {'type': 'text_line', 'text': "Amount due", 'bbox': [5, 5, 50, 10]},
+            ]})
+        
+        self.assertEqual(Block.objects.filter(document=self.document).count(), 3)
+        table = Block.objects.tables().from_engine('mineru').get()
+        self.assertEqual((table.x0, table.y0, table.x1, table.y1), (10, 50, 200, 150))
+        self.assertEqual(table.confidence, 0.9)
+        self.assertEqual(Block.objects.headings().containing("capital").get().ordinal, 0)
+        # [x, y, width, height] bboxes become corner coordinates
+        line = Block.objects.get(engine='pymupdf')
+        self.assertEqual((line.x1, line.y1), (55, 15))
+        
+        with PageWriter(self.document) as writer:
+            writer.add(1, "", {'blocks': [{'type': 'text', 'text': "Replaced"}]})
+        self.assertEqual(list(Block.objects.filter(page__page_number=1).values_list('text', flat=True)), ["Replaced"])
+    
+    def test_backfill_blocks(self):
+        """Test that backfill_page_stats --blocks indexes pages written before the Block table"""
+        from django.core.management import call_command
+        from io import StringIO
+        from .models import Block
+        
+        Page.objects.bulk_create([
+            Page(document=self.document, page_number=1, json_data={'blocks': [{'type': 'table', 'bbox': [0, 0, 1, 1]}]}),
+        ])
+        call_command('backfill_page_stats', '--blocks', stdout=StringIO())
+        self.assertEqual(Block.objects.tables().count(), 1)
+    
+    def test_bbox_format_follows_page_json(self):
+        """Test that a MinerU document's fallback pages keep their [x, y, width, height] bboxes"""
+        from .models import Block
+        
+        with PageWriter(self.document) as writer:
+            # MinerU middle JSON - corner coordinates
+            writer.add(1, "", {'page_size': [200, 100], 'para_blocks': [], 'blocks': [
+                {'type': 'title', 'text': "Notice", 'bbox': [10, 20, 60, 30]},
+            ]})
+            # extract_pdf_page fallback with the document's engine name
+            writer.add(2, "", {'ocr_engine': 'mineru', 'extraction_method': 'direct', 'page_width': 200, 'page_height': 100, 'blocks': [
+                {'type': 'text_line', 'text': "Amount due", 'bbox': [10, 20, 50, 10]},
+            ]})
+        
+        for page_number in (1, 2):
+            block = Block.objects.on_page(page_number).get()
+            self.assertEqual((block.x0, block.y0, block.x1, block.y1), (10, 20, 60, 30))
+            self.assertEqual((block.nx0, block.ny0, block.nx1, block.ny1), (0.05, 0.2, 0.3, 0.3))
+    
+    @override_settings(BLOCK_INDEX_ENABLED=False)
+    def test_disabled(self):
+        """Test that no blocks are written when the index is disabled"""
+        from .models import Block
+        
+        with PageWriter(self.document) as writer:
+            writer.add(1, "", {'blocks': [{'type': 'text', 'text': "Skipped"}]})
+        self.assertFalse(Block.objects.exists())
+
+
+class BlockSpatialTest(TestCase):
+    """Test cases for region and nearest-anchor queries over block rectangles"""
+    
+    def setUp(self):
+        self.document = Document.objects.create(title="Capital Call Notice", ocr_engine="pymupdf")
+        with PageWriter(self.document) as writer:
+            writer.add(1, "", {'ocr_engine': 'pymupdf', 'page_width': 600, 'page_height': 800, 'blocks': [
+                {'type': 'text_line', 'text': "Fund III", 'bbox': [500, 20, 80, 20]},
+                {'type': 'text_line', 'text': "Amount due", 'bbox': [50, 400, 100, 20]},
+                {'type': 'text_line', 'text': "250,000 USD", 'bbox': [200, 400, 100, 20]},
+                {'type': 'text_line', 'text': "Due date", 'bbox': [50, 440, 100, 20]},
+            ]})
+            writer.add(2, "", {'ocr_engine': 'mineru', 'page_size': [600, 800], 'blocks': [
+                {'type': 'text', 'text': "Page two header", 'bbox': [480, 10, 590, 40]},
+            ]})
+    
+    def _texts(self, blocks):
+        return sorted(block.text for block in blocks)
+    
+    def test_region_queries(self):
+        """Test that blocks are found by normalized page region"""
+        from .models import Block
+        from .spatial import blocks_in_region, rtree_installed
+        
+        self.assertTrue(rtree_installed())
+        line = Block.objects.get(text="Amount due")
+        self.assertAlmostEqual(line.nx0, 50 / 600)
+        self.assertAlmostEqual(line.ny1, 420 / 800)
+        
+        top_right = Block.objects.filter(document__title__icontains="capital call").in_region(0.8, 0, 1, 0.2)
+        self.assertEqual(self._texts(top_right), ["Fund III", "Page two header"])
+        self.assertEqual(self._texts(blocks_in_region(0.8, 0, 1, 0.2, page_number=1)), ["Fund III"])
+        self.assertEqual(self._texts(blocks_in_region(0, 0.45, 0.3, 0.6, contained=True)), ["Amount due", "Due date"])
+    
+    def test_index_follows_block_rewrites(self):
+        """Test that rewriting a page replaces its blocks in the spatial index"""
+        from .spatial import blocks_in_region
+        
+        with PageWriter(self.document) as writer:
+            writer.add(1, "", {'ocr_engine': 'pymupdf', 'page_width': 600, 'page_height': 800, 'blocks': [
+                {'type': 'text_line', 'text': "Moved", 'bbox': [0, 700, 100, 20]},
+            ]})
+        self.assertEqual(self._texts(blocks_in_region(0.8, 0, 1, 0.2, page_number=1)), [])
+        self.assertEqual(self._texts(blocks_in_region(0, 0.8, 1, 1)), ["Moved"])
+    
+    def test_nearest_anchor(self):
+        """Test that the value next to a label is found"""
+        from .spatial import anchor_neighbors
+        
+        with self.assertNumQueries(2):
+            [(anchor, right)] = anchor_neighbors("amount due", direction='right')
+        self.assertEqual(anchor.text, "Amount due")
+        self.assertEqual(self._texts(right), ["250,000 USD"])
+        [(_anchor, below)] = anchor_neighbors("amount due", direction='below')
+        self.assertEqual(self._texts(below), ["Due date"])
+    
+    def test_nearest_blocks_stay_on_the_page(self):
+        """Test that nearest_blocks only reads the anchor's page, not the spatial index"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import Block
+        from .spatial import nearest_blocks
+        
+        anchor = Block.objects.get(text="Amount due")
+        with CaptureQueriesContext(connection) as queries:
+            nearest = nearest_blocks(anchor, limit=5)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('core_block_rtree', queries[0]['sql'])
+        self.assertEqual([block.text for block in nearest], ["Due date", "250,000 USD"])
+    
+    def test_rebuild_rtree(self):
+        """Test that spatial_index --rebuild restores the R*Tree after its triggers are lost"""
+        from django.core.management import call_command
+        from django.db import connection
+        from io import StringIO
+        from .spatial import blocks_in_region
+        
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER core_block_rtree_insert")
+            cursor.execute("DELETE FROM core_block_rtree")
+        out = StringIO()
+        call_command('spatial_index', '--rebuild', stdout=out)
+        self.assertIn('Rebuilt the block spatial index', out.getvalue())
+        self.assertEqual(self._texts(blocks_in_region(0.8, 0, 1, 0.2, page_number=1)), ["Fund III"])
+    
+    def test_column_fallback(self):
+        """Test that region queries without the R*Tree give the same answer"""
+        from unittest import mock
+        from . import spatial
+        
+        with mock.patch.object(spatial, 'rtree_installed', return_value=False):
+            self.assertEqual(self._texts(spatial.blocks_in_region(0.8, 0, 1, 0.2)), ["Fund III", "Page two header"])
+
+
+class PageSearchTest(TestCase):
+    """Test cases for full-text page search"""
+    
+    def setUp(self):
+        from .search import _backends
+        _backends.clear()
+        self.client = Client()
+        self.notice = Document.objects.create(title="Capital Call Notice", ocr_engine="pymupdf")
+        self.report = Document.objects.create(title="Quarterly Report", ocr_engine="pymupdf")
+        with PageWriter(self.notice) as writer:
+            writer.add(1, "Capital call notice for Fund III. Amount due: 250,000 USD")
+            writer.add(2, "Wire instructions <b>for</b> the capital call")
+        with PageWriter(self.report) as writer:
+            writer.add(1, "Quarterly distribution summary")
+    
+    def test_index_follows_page_writes(self):
+        """Test that pages are found as they are written, rewritten and deleted"""
+        from .search import get_search_backend, search_pages
+        
+        self.assertEqual(get_search_backend().name, 'fts5')
+        self.assertEqual(search_pages("capital call").count(), 2)
+        self.assertEqual(search_pages('"amount due"').count(), 1)
+        self.assertEqual(search_pages("distrib*").count(), 1)
+        
+        with PageWriter(self.report) as writer:
+            writer.add(1, "Capital account statement")
+        self.assertEqual(search_pages("distribution").count(), 0)
+        self.assertEqual(search_pages("capital").count(), 3)
+        
+        self.notice.pages.all().delete()
+        self.assertEqual(search_pages("capital").count(), 1)
+    
+    def test_results_are_ranked_and_highlighted(self):
+        """Test that hits carry escaped snippets with the matches marked"""
+        from .search import search_pages
+        
+        results = search_pages("wire capital", document_ids=[self.notice.pk])
+        hit = results[0:10][0]
+        self.assertEqual((hit['document_id'], hit['page_number']), (self.notice.pk, 2))
+        self.assertIn("<mark>Wire</mark>", hit['snippet'])
+        self.assertIn("&lt;b&gt;", hit['snippet'])
+        self.assertEqual(search_pages("capital", document_ids=[self.report.pk]).count(), 0)
+    
+    def test_like_fallback(self):
+        """Test that the LIKE backend finds the same pages"""
+        from .search import search_pages
+        
+        with self.settings(SEARCH_BACKEND='like'):
+            results = search_pages("capital call")
+            self.assertEqual(results.count(), 2)
+            self.assertIn("<mark>Capital</mark> <mark>call</mark>", results[0:1][0]['snippet'])
+    
+    def test_search_views(self):
+        """Test the paginated search page and JSON endpoint"""
+        response = self.client.get('/search/', {'q': 'capital'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Capital Call Notice")
+        
+        with self.settings(SEARCH_RESULTS_PER_PAGE=1):
+            response = self.client.get('/search/', {'q': 'capital', 'document': self.notice.pk})
+        self.assertContains(response, f"?q=capital&amp;document={self.notice.pk}&amp;page=2")
+        
+        response = self.client.get('/api/search/', {'q': 'capital', 'per_page': 1, 'page': 2})
+        data = response.json()
+        self.assertEqual((data['total'], data['num_pages'], data['page']), (2, 2, 2))
+        self.assertEqual(len(data['results']), 1)
+        self.assertEqual(self.client.get('/api/search/').status_code, 400)
+
+
 class DocumentViewsTest(TestCase):
     """Test cases for document views"""
     
@@ -140,3 +450,1134 @@ class OCRUtilsTest(TestCase):
         except ImportError as e:
             # Some OCR engines may not be installed - that's okay
             self.assertIsNotNone(e)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), EXTRACTION_ASYNC=True, EXTRACTION_CACHE_ENABLED=False)
+class ExtractionJobTest(TestCase):
+    """Test cases for the background extraction job queue"""
+    
+    def _create_document(self):
+        return Document.objects.create(
+            title="Queued Document",
+            file=SimpleUploadedFile("queued.png", b"not really an image"),
+            ocr_engine="tesseract"
+        )
+    
+    def test_save_queues_job_on_commit(self):
+        """Test that saving a document queues a job instead of processing inline"""
+        with self.captureOnCommitCallbacks(execute=True):
+            document = self._create_document()
+        
+        jobs = ExtractionJob.objects.filter(document=document)
+        self.assertEqual(jobs.count(), 1)
+        self.assertEqual(jobs.first().status, ExtractionJob.STATUS_PENDING)
+        self.assertFalse(document.pages.exists())
+    
+    def test_claim_next_job_is_exclusive(self):
+        """Test that a job can only be claimed once"""
+        document = self._create_document()
+        job = enqueue_extraction(document)
+        
+        claimed = claim_next_job('worker-1')
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.status, ExtractionJob.STATUS_RUNNING)
+        self.assertEqual(claimed.attempts, 1)
+        self.assertIsNone(claim_next_job('worker-2'))
+    
+    def test_failed_job_is_retried_then_failed(self):
+        """Test that failing jobs are requeued until max_attempts is reached"""
+        document = self._create_document()
+        os.remove(document.file.path)
+        job = enqueue_extraction(document)
+        job.max_attempts = 2
+        job.save()
+        
+        self.assertFalse(run_job(claim_next_job('worker-1')))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExtractionJob.STATUS_PENDING)
+        self.assertIn('File not found', job.error)
+        
+        self.assertFalse(run_job(claim_next_job('worker-1')))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExtractionJob.STATUS_FAILED)
+    
+    def test_stale_jobs_are_judged_by_heartbeat(self):
+        """Test that only running jobs without a recent heartbeat are requeued"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .jobs import requeue_stale_jobs
+        
+        job = enqueue_extraction(self._create_document())
+        claim_next_job('worker-1')
+        long_ago = timezone.now() - timedelta(hours=12)
+        ExtractionJob.objects.filter(pk=job.pk).update(started_at=long_ago)
+        
+        self.assertEqual(requeue_stale_jobs(stale_after=3600), 0)
+        
+        ExtractionJob.objects.filter(pk=job.pk).update(heartbeat_at=long_ago)
+        self.assertEqual(requeue_stale_jobs(stale_after=3600), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExtractionJob.STATUS_PENDING)
+    
+    def test_requeued_job_is_not_marked_succeeded_by_first_worker(self):
+        """Test that a worker whose job was requeued and reclaimed leaves it to the new worker"""
+        from unittest import mock
+        from . import views
+        
+        job = enqueue_extraction(self._create_document())
+        first = claim_next_job('worker-1')
+        
+        def take_over(document, **kwargs):
+            # requeue_stale_jobs gave up on worker-1 and worker-2 claimed the job
+            ExtractionJob.objects.filter(pk=job.pk).update(status=ExtractionJob.STATUS_PENDING)
+            claim_next_job('worker-2')
+        
+        with mock.patch.object(views, 'process_document_file', side_effect=take_over):
+            self.assertFalse(run_job(first))
+        
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExtractionJob.STATUS_RUNNING)
+        self.assertEqual(job.worker_id, 'worker-2')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), EXTRACTION_CACHE_ENABLED=False)
+class WholeDocumentEngineTest(TestCase):
+    """Regression test: whole-document engines run once per document in the page loop"""
+    
+    def _create_scanned_pdf(self, page_count):
+        import fitz
+        pdf = fitz.open()
+        for _ in range(page_count):
+            pdf.new_page()
+        pdf_bytes = pdf.tobytes()
+        pdf.close()
+        return Document.objects.create(
+            title=f"Scan {page_count}",
+            file=SimpleUploadedFile(f"scan_{page_count}.pdf", pdf_bytes),
+            ocr_engine="pdfplumber"
+        )
+    
+    def _process(self, page_count):
+        """Process a PDF without a text layer and return the number of times the engine ran"""
+        from unittest import mock
+        from . import ocr_utils
+        from .views import process_document_file
+        
+        document = self._create_scanned_pdf(page_count)
+        
+        def fake_extractor(file_path):
+            return [{'page_number': n, 'text': f"page {n}"} for n in range(1, page_count + 1)]
+        
+        with mock.patch.object(ocr_utils, 'pdfplumber_available', False), \
+                mock.patch.object(ocr_utils, 'extract_pages_with_pdfplumber', side_effect=fake_extractor) as extractor:
+            process_document_file(document)
+        
+        self.assertEqual(document.pages.count(), page_count)
+        self.assertEqual(document.pages.get(page_number=page_count).text, f"page {page_count}")
+        return extractor.call_count
+    
+    def test_engine_runs_once_per_document(self):
+        """Test that the page loop reads every page from a single engine run, whatever the page count"""
+        self.assertEqual(self._process(5), 1)
+        self.assertEqual(self._process(20), 1)
+
+
+class ParallelPagesTest(TestCase):
+    """Test cases for page-sharded parallel extraction"""
+    
+    def test_parallel_results_match_sequential_order(self):
+        """Test that sharding pages across worker processes returns the same ordered results"""
+        import fitz
+        from .ocr_utils import extract_pdf_page
+        from .parallel import map_pages
+        
+        pdf = fitz.open()
+        for n in range(1, 8):
+            pdf.new_page().insert_text((72, 72), f"Page number {n}")
+        file_path = os.path.join(tempfile.mkdtemp(), "pages.pdf")
+        pdf.save(file_path)
+        pdf.close()
+        
+        with override_settings(EXTRACTION_PAGE_WORKERS={'pymupdf': 1}):
+            sequential = list(map_pages(file_path, extract_pdf_page, 'pymupdf', ocr_engine='pymupdf'))
+        with override_settings(EXTRACTION_PAGE_WORKERS={'pymupdf': 2}, EXTRACTION_PAGE_SHARD_SIZE=3):
+            parallel = list(map_pages(file_path, extract_pdf_page, 'pymupdf', ocr_engine='pymupdf'))
+        
+        self.assertEqual([page['page_number'] for page in parallel], list(range(1, 8)))
+        self.assertEqual(parallel, sequential)
+        self.assertEqual(parallel[2]['text'], "Page number 3")
+        self.assertEqual(parallel[2]['json_data']['blocks'][0]['text'], "Page number 3")
+
+
+class PageWriterTest(TestCase):
+    """Test cases for batched page persistence"""
+    
+    def setUp(self):
+        self.document = Document.objects.create(title="Batched Document", ocr_engine="tesseract")
+    
+    def test_writes_in_batches(self):
+        """Test that pages are flushed whenever a batch fills up"""
+        writer = PageWriter(self.document, batch_size=2)
+        writer.add(1, "One", {'page_number': 1})
+        self.assertEqual(self.document.pages.count(), 0)
+        writer.add(2, "Two", {'page_number': 2})
+        self.assertEqual(self.document.pages.count(), 2)
+        writer.add(3, "Three", {'page_number': 3})
+        writer.flush()
+        self.assertEqual(self.document.pages.count(), 3)
+        self.assertEqual(writer.pages_written, 3)
+    
+    def test_rewrite_updates_existing_pages(self):
+        """Test that writing existing page numbers updates them instead of duplicating"""
+        Page.objects.create(document=self.document, page_number=1, text="Old", json_data={'old': True})
+        
+        with PageWriter(self.document) as writer:
+            writer.add(1, "New", {'page_number': 1})
+            writer.add(2, "Second", {'page_number': 2})
+        
+        self.assertEqual(self.document.pages.count(), 2)
+        page = self.document.pages.get(page_number=1)
+        self.assertEqual(page.text, "New")
+        self.assertEqual(page.json_data, {'page_number': 1})
+
+
+class DocumentPageStatsTest(TestCase):
+    """Test cases for the stored page_count and text_length of documents"""
+    
+    def setUp(self):
+        self.document = Document.objects.create(title="Counted Document", ocr_engine="tesseract")
+    
+    def test_page_writer_updates_stats(self):
+        """Test that writing pages stores the page count and text length"""
+        with PageWriter(self.document, batch_size=2) as writer:
+            writer.add(1, "Hello")
+            writer.add(2, "World!")
+            writer.add(3, "")
+        
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.page_count, 3)
+        self.assertEqual(self.document.text_length, 11)
+    
+    def test_deleting_pages_updates_stats(self):
+        """Test that deleting pages recounts the document once per delete, after commit"""
+        with PageWriter(self.document) as writer:
+            writer.add(1, "Hello")
+            writer.add(2, "World!")
+            for page_number in range(3, 23):
+                writer.add(page_number, "Bye")
+        
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.document.pages.get(page_number=2).delete()
+        self.assertEqual(len(callbacks), 1)
+        self.document.refresh_from_db()
+        self.assertEqual((self.document.page_count, self.document.text_length), (21, 65))
+        
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.document.pages.filter(page_number__gte=3).delete()
+        self.assertEqual(len(callbacks), 1)
+        self.document.refresh_from_db()
+        self.assertEqual((self.document.page_count, self.document.text_length), (1, 5))
+    
+    def test_deleting_document_skips_recount(self):
+        """Test that pages deleted along with their document are not recounted"""
+        with PageWriter(self.document) as writer:
+            for page_number in range(1, 21):
+                writer.add(page_number, "Page")
+        
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.document.delete()
+        self.assertEqual(callbacks, [])
+        self.assertFalse(Page.objects.exists())
+    
+    def test_list_queries_fall_back_for_uncounted_documents(self):
+        """Test that with_page_stats counts pages of documents without stored stats"""
+        Page.objects.bulk_create([
+            Page(document=self.document, page_number=1, text="abc"),
+            Page(document=self.document, page_number=2, text="de"),
+        ])
+        Document.objects.filter(pk=self.document.pk).update(page_count=None, text_length=None)
+        
+        with self.assertNumQueries(1):
+            document = Document.objects.with_page_stats().get(pk=self.document.pk)
+            self.assertEqual(document.total_pages, 2)
+            self.assertEqual(document.total_text_length, 5)
+    
+    def test_backfill_command(self):
+        """Test that backfill_page_stats stores stats for uncounted documents"""
+        from django.core.management import call_command
+        from io import StringIO
+        
+        Page.objects.bulk_create([Page(document=self.document, page_number=1, text="Backfilled")])
+        Document.objects.filter(pk=self.document.pk).update(page_count=None, text_length=None)
+        
+        call_command('backfill_page_stats', stdout=StringIO())
+        
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.page_count, 1)
+        self.assertEqual(self.document.text_length, 10)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), EXTRACTION_CACHE_DIR=tempfile.mkdtemp())
+class ExtractionCacheTest(TestCase):
+    """Test cases for the content-addressed extraction cache"""
+    
+    def setUp(self):
+        import fitz
+        pdf = fitz.open()
+        pdf.new_page().insert_text((72, 72), "Vendor statement")
+        self.pdf_bytes = pdf.tobytes()
+        pdf.close()
+    
+    def _create_pdf_document(self, title):
+        return Document.objects.create(
+            title=title,
+            file=SimpleUploadedFile("statement.pdf", self.pdf_bytes),
+            ocr_engine="pymupdf"
+        )
+    
+    def test_same_file_is_restored_from_cache(self):
+        """Test that a re-uploaded file restores its pages without running extraction"""
+        from unittest import mock
+        from . import views
+        from .extraction_cache import get_extraction_cache
+        
+        get_extraction_cache().clear()
+        first = self._create_pdf_document("First upload")
+        views.process_document_file(first)
+        self.assertEqual(first.pages.get(page_number=1).text, "Vendor statement")
+        
+        second = self._create_pdf_document("Second upload")
+        with mock.patch.object(views, '_extract_document_pages') as extract:
+            views.process_document_file(second)
+        extract.assert_not_called()
+        self.assertEqual(second.pages.get(page_number=1).text, "Vendor statement")
+        self.assertEqual(second.pages.get(page_number=1).json_data['extraction_method'], 'direct')
+        
+        with mock.patch.object(views, '_extract_document_pages') as extract:
+            views.process_document_file(second, use_cache=False)
+        extract.assert_called_once()
+
+    @override_settings(EXTRACTION_PAGE_WORKERS={'tesseract': 1})
+    def test_extraction_with_failed_pages_is_not_cached(self):
+        """Test that a page whose OCR failed keeps the whole extraction out of the cache"""
+        import fitz
+        from unittest import mock
+        from . import ocr_utils, views
+        from .extraction_cache import get_extraction_cache, load_cached_pages
+
+        pdf = fitz.open()
+        pdf.new_page().insert_text((72, 72), "Vendor statement")
+        pdf.new_page()  # No text layer - needs OCR
+        document = Document.objects.create(
+            title="Partly scanned",
+            file=SimpleUploadedFile("scanned.pdf", pdf.tobytes()),
+            ocr_engine="tesseract"
+        )
+        pdf.close()
+
+        get_extraction_cache().clear()
+        with mock.patch.object(ocr_utils, 'tesseract_available', return_value=True), \
+                mock.patch.object(ocr_utils, 'ocr_image_with_tesseract', return_value=("Error: OCR request timed out", [])):
+            views.process_document_file(document)
+
+        self.assertEqual(document.pages.get(page_number=1).text, "Vendor statement")
+        self.assertEqual(document.pages.get(page_number=2).json_data['ocr_error'], "Error: OCR request timed out")
+        self.assertIsNone(load_cached_pages(views.document_cache_key(document)))
+
+    @override_settings(EXTRACTION_ASYNC=False)
+    def test_reprocess_bypasses_cache(self):
+        """Test that reprocessing re-runs extraction instead of restoring cached pages"""
+        from unittest import mock
+        from . import views
+        from .extraction_cache import get_extraction_cache
+        from .jobs import schedule_extraction
+
+        get_extraction_cache().clear()
+        document = self._create_pdf_document("Reprocessed")
+        self.assertEqual(document.pages.count(), 1)
+
+        with mock.patch.object(views, '_extract_document_pages', return_value=0) as extract:
+            schedule_extraction(document, reprocess=True)
+        extract.assert_called_once()
+
+    def test_key_depends_on_engine_settings(self):
+        """Test that changing an engine setting changes the cache key"""
+        from .extraction_cache import extraction_cache_key
+        
+        document = self._create_pdf_document("Keyed")
+        key = extraction_cache_key(document.file.path, 'lightonocr')
+        self.assertNotEqual(key, extraction_cache_key(document.file.path, 'tesseract'))
+        with override_settings(LIGHTONOCR_TARGET_LONGEST_DIM=2000):
+            self.assertNotEqual(key, extraction_cache_key(document.file.path, 'lightonocr'))
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used entries are evicted first"""
+        import time
+        from .extraction_cache import DiskCache
+        
+        cache = DiskCache(tempfile.mkdtemp(), max_bytes=250)
+        cache.set('aa1', {'value': 'x' * 80})
+        cache.set('bb2', {'value': 'y' * 80})
+        old = time.time() - 60
+        os.utime(cache._path('aa1'), (old, old))
+        os.utime(cache._path('bb2'), (old - 60, old - 60))
+        self.assertIsNotNone(cache.get('bb2'))  # Touch - now most recently used
+        cache.set('cc3', {'value': 'z' * 80})
+        
+        self.assertIsNone(cache.get('aa1'))
+        self.assertIsNotNone(cache.get('bb2'))
+        self.assertIsNotNone(cache.get('cc3'))
+    
+    def test_eviction_leaves_headroom(self):
+        """Test that a full cache is not rescanned on every write past the limit"""
+        from unittest import mock
+        from .extraction_cache import DiskCache
+        
+        cache = DiskCache(tempfile.mkdtemp(), max_bytes=2000)
+        cache.set('k00', {'value': 'x' * 80})
+        entry_bytes = cache.size()[1]
+        n = 1
+        while (n + 1) * entry_bytes <= 2000:
+            cache.set(f'k{n:02d}', {'value': 'x' * 80})
+            n += 1
+        
+        with mock.patch.object(cache, '_entries', wraps=cache._entries) as scans:
+            for n in range(n, n + 3):
+                cache.set(f'k{n:02d}', {'value': 'x' * 80})
+        
+        # The first write past the limit evicts down to 90%; the next ones fit
+        self.assertEqual(scans.call_count, 1)
+        self.assertLessEqual(cache.size()[1], 2000)
+    
+    def test_identical_page_images_are_memoized(self):
+        """Test that OCR of an identical rendered page is served from the page memo"""
+        from PIL import Image
+        from .extraction_cache import memoize_page_ocr, page_ocr_cache_stats, reset_page_ocr_cache_stats
+        
+        calls = []
+        
+        @memoize_page_ocr('lightonocr')
+        def fake_ocr(img):
+            calls.append(img.size)
+            return "Terms and conditions"
+        
+        reset_page_ocr_cache_stats()
+        with override_settings(PAGE_OCR_CACHE_DIR=tempfile.mkdtemp()):
+            self.assertEqual(fake_ocr(Image.new("RGB", (40, 30), "white")), "Terms and conditions")
+            self.assertEqual(fake_ocr(Image.new("RGB", (40, 30), "white")), "Terms and conditions")
+            fake_ocr(Image.new("RGB", (40, 30), "black"))
+        
+        self.assertEqual(len(calls), 2)
+        stats = page_ocr_cache_stats()['lightonocr']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+
+class EngineRegistryTest(TestCase):
+    """Test the OCR engine registry"""
+    
+    def test_import_does_not_load_models(self):
+        """Test that importing ocr_utils leaves every model unloaded"""
+        from . import ocr_utils
+        
+        self.assertEqual(ocr_utils.model_manager.loaded(), [])
+    
+    def test_engine_capabilities(self):
+        """Test engine lookup and declared capabilities"""
+        from .engines import get_engine
+        
+        self.assertIsNone(get_engine('nonexistent'))
+        self.assertTrue(get_engine('MinerU').whole_document)
+        self.assertFalse(get_engine('pymupdf').image)
+        self.assertTrue(get_engine('pymupdf').is_available())
+        self.assertEqual(get_engine('deepseek').device, 'remote')
+        self.assertIsNotNone(get_engine('tesseract').ocr_image)
+
+
+class FakeTensor:
+    """Stands in for a CPU torch tensor of a given size in bytes"""
+    
+    def __init__(self, size):
+        self.size = size
+        self.device = type('Device', (), {'type': 'cpu'})()
+    
+    def numel(self):
+        return self.size
+    
+    def element_size(self):
+        return 1
+
+
+class FakeModel:
+    """Stands in for a torch module of a given size"""
+    
+    def __init__(self, size):
+        self.size = size
+    
+    def parameters(self):
+        return [FakeTensor(self.size)]
+    
+    def buffers(self):
+        return []
+
+
+class ModelManagerTest(TestCase):
+    """Test model residency limits"""
+    
+    def test_budget_evicts_least_recently_used(self):
+        """Test that loading past the budget unloads the least recently used model"""
+        from .model_manager import ModelManager, MB
+        
+        manager = ModelManager(memory_budget=100 * MB, gpu_memory_budget=0, idle_timeout=0)
+        manager.get('a', lambda: FakeModel(40 * MB))
+        manager.get('b', lambda: FakeModel(40 * MB))
+        manager.get('a', lambda: self.fail("a should still be loaded"))
+        manager.get('c', lambda: FakeModel(40 * MB))
+        
+        self.assertEqual([model['name'] for model in manager.loaded()], ['a', 'c'])
+        self.assertEqual(manager.loaded()[1]['ram_bytes'], 40 * MB)
+    
+    @override_settings(MODEL_FOOTPRINT_ESTIMATES_MB={'c': (40, 0)})
+    def test_room_is_made_before_loading(self):
+        """Test that models are unloaded before the incoming one loads, not after"""
+        from .model_manager import ModelManager, MB
+        
+        manager = ModelManager(memory_budget=100 * MB, gpu_memory_budget=0, idle_timeout=0)
+        manager.get('a', lambda: FakeModel(40 * MB))
+        manager.get('b', lambda: FakeModel(40 * MB))
+        
+        resident_during_load = []
+        
+        def load(size):
+            resident_during_load.append([model['name'] for model in manager.loaded()])
+            return FakeModel(size)
+        
+        # First load of c: sized from the estimate
+        manager.get('c', lambda: load(40 * MB))
+        self.assertEqual(resident_during_load, [['b']])
+        
+        # Reload of a: sized from its measured footprint
+        manager.get('a', lambda: load(40 * MB))
+        self.assertEqual(resident_during_load[1], ['c'])
+        self.assertEqual(manager.expected_footprint('b'), (40 * MB, 0))
+    
+    def test_idle_models_are_unloaded(self):
+        """Test that models unused for longer than the idle timeout are unloaded"""
+        from .model_manager import ModelManager
+        
+        manager = ModelManager(memory_budget=0, gpu_memory_budget=0, idle_timeout=60)
+        manager.get('paddleocr', lambda: object())
+        self.assertEqual(manager.unload_idle(), 0)
+        
+        manager._models['paddleocr'].last_used -= 120
+        self.assertEqual(manager.unload_idle(), 1)
+        self.assertEqual(manager.loaded(), [])
+        self.assertIsNone(manager.get('missing', lambda: None))
+
+
+@override_settings(PAGE_OCR_CACHE_ENABLED=False, LIGHTONOCR_BATCH_SIZE=2)
+class LightOnOCRBatchTest(TestCase):
+    """Test batched LightOnOCR generation"""
+    
+    def test_batches_group_pages_by_size(self):
+        """Test that same-sized pages are generated together and outputs keep page order"""
+        from unittest import mock
+        from PIL import Image
+        from . import ocr_utils
+        
+        batches = []
+        
+        def fake_generate(model, processor, images):
+            batches.append([img.size for img in images])
+            return [f"{img.size[0]}x{img.size[1]}:{img.getpixel((0, 0))[0]}" for img in images]
+        
+        images = [
+            Image.new("RGB", (20, 30), (1, 1, 1)),
+            Image.new("RGB", (30, 20), (2, 2, 2)),
+            Image.new("RGB", (20, 30), (3, 3, 3)),
+            Image.new("RGB", (20, 30), (4, 4, 4)),
+        ]
+        with mock.patch.object(ocr_utils, '_init_lightonocr', return_value=(object(), object())), \
+                mock.patch.object(ocr_utils, '_lightonocr_generate', side_effect=fake_generate):
+            texts = ocr_utils.extract_text_with_lightonocr_from_images(images)
+            single = [ocr_utils.extract_text_with_lightonocr_from_image(img) for img in images]
+        
+        self.assertEqual(texts, ["20x30:1", "30x20:2", "20x30:3", "20x30:4"])
+        self.assertEqual(texts, single)
+        self.assertEqual(batches[:3], [[(20, 30), (20, 30)], [(20, 30)], [(30, 20)]])
+
+
+@override_settings(TROCR_MODE='lines')
+class TrOCRLinesTest(TestCase):
+    """Test TrOCR line segmentation"""
+    
+    def test_lines_are_segmented_and_keep_bboxes(self):
+        """Test that each text line is recognised separately and becomes a block"""
+        from unittest import mock
+        from PIL import Image, ImageDraw
+        from . import ocr_utils
+        
+        img = Image.new("RGB", (200, 100), "white")
+        draw = ImageDraw.Draw(img)
+        draw.rectangle([20, 10, 150, 24], fill="black")
+        draw.rectangle([30, 50, 120, 62], fill="black")
+        
+        self.assertEqual(ocr_utils.segment_text_lines(img), [[18, 8, 135, 19], [28, 48, 95, 17]])
+        
+        recognised = []
+        
+        def fake_recognize(line_images):
+            recognised.append([line.size for line in line_images])
+            return ["first line", "second line"]
+        
+        with mock.patch.object(ocr_utils, 'recognize_lines_with_trocr', side_effect=fake_recognize):
+            text, blocks = ocr_utils.ocr_image_with_trocr(img)
+        
+        self.assertEqual(recognised, [[(135, 19), (95, 17)]])
+        self.assertEqual(text, "first line\nsecond line")
+        self.assertEqual([block['bbox'] for block in blocks], [[18, 8, 135, 19], [28, 48, 95, 17]])
+    
+    @override_settings(TROCR_MODE='page')
+    def test_page_mode_without_model_raises(self):
+        """Test that page mode reports a missing TrOCR model instead of calling None"""
+        from unittest import mock
+        from PIL import Image
+        from . import ocr_utils
+        
+        with mock.patch.object(ocr_utils, '_init_trocr', return_value=(None, None)):
+            with self.assertRaisesMessage(RuntimeError, "TrOCR is not available"):
+                ocr_utils.ocr_image_with_trocr(Image.new("RGB", (20, 10), "white"))
+
+
+@override_settings(DONUT_BATCH_SIZE=2)
+class DonutBatchTest(TestCase):
+    """Test batched Donut extraction of multi-page PDFs"""
+    
+    def test_scanned_pages_are_batched(self):
+        """Test that pages without a text layer are OCRed together and text layers are kept"""
+        import fitz
+        from unittest import mock
+        from . import ocr_utils
+        
+        pdf = fitz.open()
+        for page_num in range(5):
+            page = pdf.new_page()
+            if page_num == 1:
+                page.insert_text((72, 72), "Typed page")
+        path = os.path.join(tempfile.mkdtemp(), "report.pdf")
+        pdf.save(path)
+        pdf.close()
+        
+        batches = []
+        
+        def fake_run(images, batch_size=None):
+            batches.append(len(images))
+            return [f"scanned {len(batches)}.{i}" for i in range(len(images))], {}
+        
+        with mock.patch.object(ocr_utils, 'run_donut_batch', side_effect=fake_run):
+            pages = ocr_utils.extract_pages_with_donut(path)
+        
+        self.assertEqual(batches, [4])
+        self.assertEqual([page['text'] for page in pages], ["scanned 1.0", "Typed page", "scanned 1.1", "scanned 1.2", "scanned 1.3"])
+        self.assertTrue(pages[0]['json_data']['has_ocr'])
+        self.assertFalse(pages[1]['json_data']['has_ocr'])
+    
+    def _scanned_pdf(self, page_count):
+        import fitz
+        pdf = fitz.open()
+        for _ in range(page_count):
+            pdf.new_page()
+        path = os.path.join(tempfile.mkdtemp(), "scanned.pdf")
+        pdf.save(path)
+        pdf.close()
+        return path
+    
+    def test_failed_batch_is_retried_page_by_page(self):
+        """Test that a failing batch only marks the pages that also fail on their own"""
+        from unittest import mock
+        from . import ocr_utils
+        
+        calls = []
+        
+        def fake_generate(processor, model, images, max_length):
+            calls.append(len(images))
+            if len(images) > 1:
+                raise RuntimeError("CUDA out of memory")
+            if len(calls) == 3:
+                raise ValueError("token2json failed")
+            return [f"page text {len(calls)}"]
+        
+        model = mock.Mock()
+        model.decoder.config.max_position_embeddings = 512
+        with mock.patch.object(ocr_utils, '_init_donut', return_value=(mock.Mock(), model)), \
+                mock.patch.object(ocr_utils, '_donut_generate', side_effect=fake_generate):
+            pages = ocr_utils.extract_pages_with_donut(self._scanned_pdf(3))
+        
+        self.assertEqual(calls, [2, 1, 1, 1])
+        self.assertEqual([page['text'] for page in pages], ["page text 2", "", "page text 4"])
+        self.assertNotIn('ocr_error', pages[0]['json_data'])
+        self.assertEqual(pages[1]['json_data']['ocr_error'], "Error with Donut: token2json failed")
+        self.assertNotIn('ocr_error', pages[2]['json_data'])
+    
+    def test_unavailable_model_marks_pages(self):
+        """Test that Donut failing to load is recorded per page instead of failing the extraction"""
+        from unittest import mock
+        from . import ocr_utils
+        
+        with mock.patch.object(ocr_utils, '_init_donut', return_value=(None, None)):
+            pages = ocr_utils.extract_pages_with_donut(self._scanned_pdf(2))
+        
+        self.assertEqual([page['json_data']['ocr_error'] for page in pages], [ocr_utils.DONUT_UNAVAILABLE] * 2)
+
+
+class TesseractSinglePassTest(TestCase):
+    """Test that Tesseract text and word boxes come from one recognition call"""
+    
+    def test_text_and_boxes_from_image_to_data(self):
+        """Test that image_to_data alone produces line-separated text and word blocks"""
+        from unittest import mock
+        from PIL import Image
+        from . import ocr_utils
+        
+        fake_pytesseract = mock.Mock()
+        fake_pytesseract.image_to_data.return_value = {
+            'text': ['', 'Hello', 'world', 'Second', '~'],
+            'conf': ['-1', '96', '91', '88', '-1'],
+            'left': [0, 10, 60, 10, 0],
+            'top': [0, 10, 10, 40, 0],
+            'width': [100, 40, 45, 60, 0],
+            'height': [100, 12, 12, 12, 0],
+            'block_num': [0, 1, 1, 1, 1],
+            'par_num': [0, 1, 1, 1, 1],
+            'line_num': [0, 1, 1, 2, 2],
+        }
+        
+        with mock.patch.object(ocr_utils, 'pytesseract', fake_pytesseract), \
+                mock.patch.object(ocr_utils, 'tesserocr_available', False):
+            text, blocks = ocr_utils.ocr_image_with_tesseract(Image.new("RGB", (100, 100), "white"))
+        
+        self.assertEqual(text, "Hello world\nSecond")
+        self.assertEqual([block['bbox'] for block in blocks], [[10, 10, 40, 12], [60, 10, 45, 12], [10, 40, 60, 12]])
+        self.assertEqual(fake_pytesseract.image_to_data.call_count, 1)
+        fake_pytesseract.image_to_string.assert_not_called()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), EXTRACTION_CACHE_ENABLED=False,
+                   MINERU_BATCH_MAX_PAGES=5, MINERU_BATCH_MAX_DOCUMENTS=16)
+class MinerUBatchTest(TestCase):
+    """Test multi-document MinerU batching in the extraction worker"""
+    
+    def _create_document(self, name, page_count):
+        import fitz
+        pdf = fitz.open()
+        for _ in range(page_count):
+            pdf.new_page()
+        pdf_bytes = pdf.tobytes()
+        pdf.close()
+        return Document.objects.create(
+            title=name,
+            file=SimpleUploadedFile(f"{name}.pdf", pdf_bytes),
+            file_type="pdf",
+            ocr_engine="mineru"
+        )
+    
+    def test_worker_parses_documents_in_one_call(self):
+        """Test that queued MinerU documents within the page budget share one MinerU call"""
+        from unittest import mock
+        from . import ocr_utils
+        from .jobs import run_worker
+        
+        documents = [self._create_document(name, pages) for name, pages in [("a", 2), ("b", 3), ("c", 2)]]
+        for document in documents:
+            enqueue_extraction(document)
+        
+        calls = []
+        
+        def fake_batch(file_paths):
+            calls.append(len(file_paths))
+            results = []
+            for file_path in file_paths:
+                name = os.path.basename(file_path).split('.')[0].split('_')[0]
+                page_count = {"a": 2, "b": 3, "c": 2}[name]
+                results.append([{'page_number': n, 'text': f"{name} {n}", 'json_data': {}} for n in range(1, page_count + 1)])
+            return results
+        
+        with mock.patch.object(ocr_utils, 'mineru_available', True), \
+                mock.patch.object(ocr_utils, 'extract_pages_with_mineru_json_batch', side_effect=fake_batch):
+            self.assertEqual(run_worker(worker_id='w', once=True), 3)
+        
+        # a + b fill the 5-page budget; c is parsed on its own
+        self.assertEqual(calls, [2, 1])
+        self.assertEqual(list(documents[1].pages.order_by('page_number').values_list('text', flat=True)), ["b 1", "b 2", "b 3"])
+        self.assertEqual(documents[2].pages.count(), 2)
+        self.assertFalse(ExtractionJob.objects.exclude(status=ExtractionJob.STATUS_SUCCEEDED).exists())
+
+
+@override_settings(MINERU_WINDOW_PAGES=2, MINERU_WINDOW_WORKERS=1)
+class MinerUWindowTest(TestCase):
+    """Test windowed MinerU extraction of long PDFs"""
+    
+    def setUp(self):
+        import fitz
+        pdf = fitz.open()
+        for page_num in range(5):
+            pdf.new_page().insert_text((72, 72), f"Page {page_num + 1}")
+        self.path = os.path.join(tempfile.mkdtemp(), "filing.pdf")
+        pdf.save(self.path)
+        pdf.close()
+        self.parsed = []
+        self.fail_first_page = None
+    
+    def fake_batch(self, file_paths):
+        """Stand-in for MinerU returning each window page's text layer"""
+        import fitz
+        with fitz.open(file_paths[0]) as window:
+            texts = [page.get_text().strip() for page in window]
+        self.parsed.append(texts[0])
+        if texts[0] == self.fail_first_page:
+            return [[]]
+        return [[{'page_number': n, 'text': text, 'json_data': {'page_idx': n - 1}} for n, text in enumerate(texts, start=1)]]
+    
+    def _extract(self):
+        from unittest import mock
+        from . import ocr_utils
+        
+        with mock.patch.object(ocr_utils, 'mineru_available', True), \
+                mock.patch.object(ocr_utils, 'extract_pages_with_mineru_json_batch', side_effect=self.fake_batch):
+            return ocr_utils.extract_pages_with_mineru_json(self.path)
+    
+    def test_windows_are_rebased_in_page_order(self):
+        """Test that windows are parsed separately and pages are renumbered for the whole document"""
+        with self.settings(MINERU_CHECKPOINT_DIR=tempfile.mkdtemp()):
+            pages = self._extract()
+        
+        self.assertEqual(self.parsed, ["Page 1", "Page 3", "Page 5"])
+        self.assertEqual([page['page_number'] for page in pages], [1, 2, 3, 4, 5])
+        self.assertEqual([page['text'] for page in pages], [f"Page {n}" for n in range(1, 6)])
+        self.assertEqual(pages[3]['json_data']['page_idx'], 3)
+    
+    def test_failed_window_is_retried_alone(self):
+        """Test that after a window fails only that window is parsed again"""
+        with self.settings(MINERU_CHECKPOINT_DIR=tempfile.mkdtemp()):
+            self.fail_first_page = "Page 3"
+            self.assertEqual(self._extract(), [])
+            self.assertEqual(self.parsed, ["Page 1", "Page 3", "Page 5", "Page 3"])
+            
+            self.parsed = []
+            self.fail_first_page = None
+            pages = self._extract()
+        
+        self.assertEqual(self.parsed, ["Page 3"])
+        self.assertEqual([page['text'] for page in pages], [f"Page {n}" for n in range(1, 6)])
+
+
+class OlmocrWorkerTest(TestCase):
+    """Test the resident OLMOCR worker protocol with a stand-in model"""
+    
+    def setUp(self):
+        import fitz
+        import threading
+        from .olmocr_worker import OlmocrModel, OlmocrWorkerServer
+        
+        class FakeModel(OlmocrModel):
+            calls = 0
+            
+            def recognize(self, img):
+                FakeModel.calls += 1
+                return f"---\nprimary_language: en\nis_table: false\nrotation_correction: 0\n---\n# Page {FakeModel.calls}\n{max(img.size)}px"
+        
+        self.model = FakeModel()
+        self.server = OlmocrWorkerServer(self.model, ('127.0.0.1', 0))
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        
+        self.temp_dir = tempfile.mkdtemp()
+        self.paths = []
+        for name, page_count in (('a.pdf', 2), ('b.pdf', 1)):
+            doc = fitz.open()
+            for _ in range(page_count):
+                doc.new_page(width=612, height=792)
+            path = os.path.join(self.temp_dir, name)
+            doc.save(path)
+            doc.close()
+            self.paths.append(path)
+    
+    def tearDown(self):
+        from multiprocessing.connection import Client
+        from .olmocr_worker import _authkey
+        
+        with Client(self.server.address, authkey=_authkey()) as conn:
+            conn.send({'command': 'shutdown'})
+            conn.recv()
+        self.thread.join(5)
+    
+    def test_several_files_in_one_request(self):
+        """Test that one request returns structured pages for every file without reloading the model"""
+        from .olmocr_worker import olmocr_worker_pages
+        
+        results = olmocr_worker_pages(self.paths + [os.path.join(self.temp_dir, 'missing.pdf')], address=self.server.address)
+        
+        self.assertEqual([len(result['pages']) for result in results], [2, 1, 0])
+        self.assertIn('error', results[2])
+        first = results[0]['pages'][0]
+        self.assertEqual(first['text'], "# Page 1\n1288px")
+        self.assertEqual((first['width'], first['height']), (612, 792))
+        self.assertEqual(first['metadata'], {'primary_language': 'en', 'is_table': False, 'rotation_correction': 0})
+        self.assertEqual(results[1]['pages'][0]['page_number'], 1)
+    
+    def test_images_sent_in_memory(self):
+        """Test that PIL images reach the worker as raw pixels"""
+        from PIL import Image
+        from .olmocr_worker import olmocr_worker_images
+        
+        pages = olmocr_worker_images([Image.new('L', (100, 50), 255)], address=self.server.address)
+        
+        self.assertEqual(len(pages), 1)
+        self.assertEqual((pages[0]['width'], pages[0]['height']), (100, 50))
+        self.assertTrue(pages[0]['text'].endswith("100px"))
+    
+    def test_page_json_from_worker(self):
+        """Test that extract_pages_with_olmocr_json builds page JSON from the worker reply"""
+        from unittest import mock
+        from . import ocr_utils
+        
+        host, port = self.server.address
+        with mock.patch.object(ocr_utils, 'olmocr_available', True), \
+                self.settings(OLMOCR_WORKER_ADDRESS=f"{host}:{port}", OLMOCR_WORKER_AUTOSTART=False):
+            pages = ocr_utils.extract_pages_with_olmocr_json(self.paths[0])
+        
+        self.assertEqual([page['page_number'] for page in pages], [1, 2])
+        json_data = pages[1]['json_data']
+        self.assertEqual(json_data['ocr_engine'], 'olmocr')
+        self.assertEqual(json_data['page_width'], 612)
+        self.assertEqual(json_data['blocks'], [{'type': 'text', 'text': "# Page 2\n1288px", 'format': 'markdown'}])
+        self.assertEqual(json_data['metadata']['primary_language'], 'en')
+
+
+class RenderCacheTest(TestCase):
+    """Test the shared page render cache"""
+    
+    def setUp(self):
+        import fitz
+        
+        self.path = os.path.join(tempfile.mkdtemp(), 'render.pdf')
+        doc = fitz.open()
+        for n in range(2):
+            doc.new_page(width=200, height=100).insert_text((20, 50), f"Page {n + 1}")
+        doc.save(self.path)
+        doc.close()
+    
+    def test_renders_are_reused(self):
+        """Test that a page rendered once is read back from the cache at the same scale"""
+        import fitz
+        from unittest import mock
+        from .render_cache import get_render_cache, render_page
+        
+        with self.settings(RENDER_CACHE_DIR=tempfile.mkdtemp()), fitz.open(self.path) as doc:
+            first = render_page(doc[0], 1.5)
+            gray = render_page(doc[0], 1.5, colorspace='gray')
+            with mock.patch.object(fitz.Page, 'get_pixmap', side_effect=AssertionError("rendered again")):
+                cached = render_page(doc[0], 1.5)
+            self.assertEqual(get_render_cache().size()[0], 2)
+        
+        self.assertEqual((first.mode, first.size), ('RGB', (300, 150)))
+        self.assertEqual(gray.mode, 'L')
+        self.assertEqual(cached.tobytes(), first.tobytes())
+    
+    def test_least_recently_used_renders_are_evicted(self):
+        """Test that the cache stays within its size limit"""
+        import fitz
+        from .render_cache import get_render_cache, render_page
+        
+        # One 200x100 RGB page at 1x is 60,000 bytes
+        with self.settings(RENDER_CACHE_DIR=tempfile.mkdtemp(), RENDER_CACHE_MAX_BYTES=100000), fitz.open(self.path) as doc:
+            render_page(doc[0])
+            render_page(doc[1])
+            entries, total_bytes = get_render_cache().size()
+        
+        self.assertEqual(entries, 1)
+        self.assertLessEqual(total_bytes, 100000)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), EXTRACTION_CACHE_ENABLED=False, RENDER_CACHE_DIR=tempfile.mkdtemp())
+class ThumbnailTest(TestCase):
+    """Test page thumbnails generated during extraction and served with cache validators"""
+    
+    def setUp(self):
+        import fitz
+        pdf = fitz.open()
+        for n in range(2):
+            pdf.new_page(width=600, height=800).insert_text((72, 72), f"Thumbnail page {n + 1}")
+        pdf_bytes = pdf.tobytes()
+        pdf.close()
+        self.document = Document.objects.create(
+            title="Thumbnails",
+            file=SimpleUploadedFile("thumbnails.pdf", pdf_bytes),
+            file_type="pdf",
+            ocr_engine="pymupdf"
+        )
+    
+    def test_thumbnails_written_during_extraction(self):
+        """Test that extraction stores a thumbnail per page and size"""
+        from PIL import Image
+        from django.core.files.storage import default_storage
+        from .views import process_document_file
+        
+        with self.settings(THUMBNAIL_SIZES={'small': 120, 'large': 300}):
+            process_document_file(self.document)
+        
+        page = self.document.pages.get(page_number=2)
+        self.assertEqual(set(page.thumbnails), {'small', 'large'})
+        with Image.open(default_storage.path(page.thumbnails['small'])) as img:
+            self.assertEqual(img.size, (120, 160))
+    
+    def test_thumbnail_view_supports_conditional_requests(self):
+        """Test that thumbnails are generated on first request and revalidated with ETags"""
+        page = Page.objects.create(document=self.document, page_number=1, text="Thumbnail page 1")
+        
+        response = self.client.get(page.thumbnail_url('small'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(response['Content-Type'], ('image/webp', 'image/png'))
+        self.assertIn('max-age', response['Cache-Control'])
+        self.assertTrue(response['Last-Modified'])
+        page.refresh_from_db()
+        self.assertIn('small', page.thumbnails)
+        
+        response = self.client.get(page.thumbnail_url('small'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(page.thumbnail_url('huge')).status_code, 404)
+
+
+class DocumentAdminPageCarouselTest(TestCase):
+    """Test that the Document admin renders page stubs and loads previews on demand"""
+    
+    def setUp(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass123')
+        self.client.force_login(admin_user)
+        self.document = Document.objects.create(title="Carousel", file_type="pdf", ocr_engine="pymupdf")
+        for n in range(1, 4):
+            Page.objects.create(document=self.document, page_number=n, text=f"full text {n}", json_data={'marker': f"json-{n}"})
+    
+    def test_change_view_renders_stubs_only(self):
+        """Test that page text and JSON are not part of the change view"""
+        response = self.client.get(f'/admin/core/document/{self.document.pk}/change/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'data-preview-url', count=3)
+        self.assertNotContains(response, 'json-2')
+        self.assertNotContains(response, 'full text 2')
+    
+    def test_page_preview_endpoint(self):
+        """Test that the carousel endpoint returns one page's JSON"""
+        response = self.client.get(f'/admin/core/document/{self.document.pk}/pages/2/preview/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['page_number'], 2)
+        self.assertEqual(data['json_data'], {'marker': 'json-2'})
+        self.assertIsNone(data['thumbnail_url'])
+        self.assertEqual(self.client.get(f'/admin/core/document/{self.document.pk}/pages/9/preview/').status_code, 404)
+
+
+class ApiClientTest(TestCase):
+    """Test the pooled remote OCR client"""
+    
+    class FakeResponse:
+        def __init__(self, status_code, payload=None, headers=None):
+            self.status_code = status_code
+            self.payload = payload
+            self.headers = headers or {}
+        
+        def json(self):
+            return self.payload
+        
+        def close(self):
+            pass
+    
+    def _client(self, responses):
+        from unittest import mock
+        from .api_client import ApiClient
+        
+        client = ApiClient(max_retries=2, backoff=0.01, max_connections_per_host=2, timeout=1)
+        client._session = mock.Mock()
+        client._session.post.side_effect = responses
+        return client
+    
+    def test_retries_with_backoff(self):
+        """Test that 503s and connection errors are retried and Retry-After is honoured"""
+        import requests
+        from unittest import mock
+        
+        client = self._client([
+            self.FakeResponse(503, headers={'Retry-After': '2'}),
+            requests.exceptions.ConnectionError(),
+            self.FakeResponse(200, {'text': 'ok'}),
+        ])
+        with mock.patch('core.api_client.time.sleep') as sleep:
+            response = client.post('http://ocr.local/api/ocr', json={})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client._session.post.call_count, 3)
+        self.assertEqual(sleep.call_args_list[0], mock.call(2))
+    
+    def test_post_first_remembers_endpoint(self):
+        """Test that the endpoint that answered is tried first next time"""
+        client = self._client([
+            self.FakeResponse(404),
+            self.FakeResponse(200, {'text': 'first'}),
+            self.FakeResponse(200, {'text': 'second'}),
+        ])
+        endpoints = ['http://ocr.local/api/ocr', 'http://ocr.local/ocr']
+        
+        self.assertEqual(client.post_first(endpoints, json={}).json(), {'text': 'first'})
+        self.assertEqual(client.post_first(endpoints, json={}).json(), {'text': 'second'})
+        self.assertEqual(client._session.post.call_args_list[2].args[0], 'http://ocr.local/ocr')
+    
+    def test_page_images_are_encoded_in_memory(self):
+        """Test that DeepSeek OCR page images are sent as PNG bytes without temporary files"""
+        import tempfile as tempfile_module
+        from unittest import mock
+        from PIL import Image
+        from . import ocr_utils
+        
+        with self.settings(DEEPSEEK_OCR_USE_OLLAMA=True, PAGE_OCR_CACHE_ENABLED=False), \
+                mock.patch.object(tempfile_module, 'NamedTemporaryFile', side_effect=AssertionError("temp file")), \
+                mock.patch.object(ocr_utils, 'extract_text_with_deepseek_ollama', return_value="page text") as ollama:
+            text = ocr_utils.extract_text_with_deepseek_from_image(Image.new('RGB', (20, 10), 'white'))
+        
+        self.assertEqual(text, "page text")
+        self.assertTrue(ollama.call_args.args[0].startswith(b'\x89PNG'))
+    
+    def test_pages_are_sent_concurrently(self):
+        """Test that remote OCR pages of a scanned PDF are in flight together, in page order"""
+        import fitz
+        import threading
+        import time
+        from unittest import mock
+        from . import ocr_utils
+        
+        path = os.path.join(tempfile.mkdtemp(), 'scanned.pdf')
+        doc = fitz.open()
+        for _ in range(6):
+            doc.new_page()
+        doc.save(path)
+        doc.close()
+        
+        lock = threading.Lock()
+        in_flight = {'now': 0, 'max': 0, 'calls': 0}
+        
+        def fake_ocr(img):
+            with lock:
+                in_flight['now'] += 1
+                in_flight['calls'] += 1
+                in_flight['max'] = max(in_flight['max'], in_flight['now'])
+                call = in_flight['calls']
+            time.sleep(0.05)
+            with lock:
+                in_flight['now'] -= 1
+            return f"text {call}"
+        
+        with self.settings(REMOTE_OCR_CONCURRENCY=3, PAGE_OCR_CACHE_ENABLED=False), \
+                mock.patch.object(ocr_utils, 'extract_text_with_deepseek_from_image', side_effect=fake_ocr):
+            pages = ocr_utils.extract_pages_with_deepseek(path)
+        
+        self.assertEqual([page['page_number'] for page in pages], list(range(1, 7)))
+        self.assertTrue(all(page['text'].startswith('text') for page in pages))
+        self.assertEqual(in_flight['max'], 3)
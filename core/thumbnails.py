@@ -0,0 +1,157 @@
+"""
+Page thumbnails
+
+Previews used to render every page to PNG on each request and inline it as
+base64. Thumbnails are now written once per page at the widths in
+THUMBNAIL_SIZES when a document is extracted, stored under
+MEDIA_ROOT/pages/thumbnails/<document id>/, and served by views.page_thumbnail
+with ETag and Last-Modified headers so browsers and proxies can cache them.
+Pages extracted before thumbnails existed get theirs on first request.
+"""
+import logging
+import os
+import shutil
+from io import BytesIO
+
+import fitz  # PyMuPDF
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = 'pages/thumbnails'
+CONTENT_TYPES = {'webp': 'image/webp', 'png': 'image/png'}
+
+
+def thumbnail_sizes():
+    """Return {size name: width in pixels}"""
+    return getattr(settings, 'THUMBNAIL_SIZES', {'small': 240, 'large': 1200})
+
+
+def thumbnail_format():
+    """Return 'webp', or 'png' if WebP is not configured or Pillow was built without it"""
+    image_format = getattr(settings, 'THUMBNAIL_FORMAT', 'webp').lower()
+    if image_format == 'webp' and not features.check('webp'):
+        return 'png'
+    return image_format if image_format in CONTENT_TYPES else 'png'
+
+
+def _thumbnail_name(document_id, page_number, size, image_format):
+    return f"{THUMBNAIL_DIR}/{document_id}/{page_number:05d}-{size}.{image_format}"
+
+
+def _save_thumbnail(img, width, name, image_format):
+    """Scale img down to width (never up), encode it and store it under name"""
+    if img.width > width:
+        img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+    buffer = BytesIO()
+    if image_format == 'webp':
+        img.save(buffer, format='WEBP', quality=getattr(settings, 'THUMBNAIL_QUALITY', 80), method=4)
+    else:
+        img.save(buffer, format='PNG', optimize=True)
+    # Names are fixed per page and size, so replace the previous file
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def _page_thumbnails(document_id, page_number, source, sizes, image_format):
+    """Write the thumbnails for one page. source(width) returns an image at least that wide."""
+    thumbnails = {}
+    for size, width in sizes.items():
+        thumbnails[size] = _save_thumbnail(
+            source(width), width, _thumbnail_name(document_id, page_number, size, image_format), image_format
+        )
+    return thumbnails
+
+
+def generate_thumbnails(document, page_numbers=None, sizes=None):
+    """Write thumbnails for a document's pages
+
+    Returns:
+        dict: {page_number: {size name: storage name}} for the pages that exist in the file
+    """
+    from .render_cache import render_page
+
+    sizes = sizes or thumbnail_sizes()
+    image_format = thumbnail_format()
+    results = {}
+
+    if document.file_type == 'pdf':
+        with fitz.open(document.file.path) as doc:
+            numbers = page_numbers or range(1, len(doc) + 1)
+            for page_number in numbers:
+                if not 1 <= page_number <= len(doc):
+                    continue
+                page = doc.load_page(page_number - 1)
+                page_width = page.rect.width or 1
+                results[page_number] = _page_thumbnails(
+                    document.pk, page_number,
+                    lambda width: render_page(page, width / page_width),
+                    sizes, image_format,
+                )
+    elif document.file_type == 'image' and (page_numbers is None or 1 in page_numbers):
+        with Image.open(document.file.path) as img:
+            img = img.convert('RGB')
+            results[1] = _page_thumbnails(document.pk, 1, lambda width: img, sizes, image_format)
+    return results
+
+
+def generate_document_thumbnails(document):
+    """Write thumbnails for every extracted page of a document and record them on the pages
+
+    Thumbnails are a convenience for previews, so failures are logged rather than raised.
+    """
+    from .models import Page
+
+    if not getattr(settings, 'THUMBNAILS_ENABLED', True) or not document.file:
+        return 0
+    try:
+        thumbnails = generate_thumbnails(document)
+    except Exception as e:
+        logger.warning(f"Could not generate thumbnails for document {document.pk}: {str(e)}", exc_info=True)
+        return 0
+
+    pages = list(document.pages.filter(page_number__in=thumbnails).only('id', 'page_number', 'thumbnails'))
+    for page in pages:
+        page.thumbnails = thumbnails[page.page_number]
+    Page.objects.bulk_update(pages, ['thumbnails'], batch_size=getattr(settings, 'PAGE_WRITE_BATCH_SIZE', 100))
+    logger.info(f"Generated thumbnails for {len(pages)} page(s) of document {document.pk}")
+    return len(pages)
+
+
+def page_thumbnail_path(page, size):
+    """Return the file path of a page's thumbnail, generating it if it doesn't exist yet
+
+    Returns None if the size is unknown or the page can't be rendered.
+    """
+    if size not in thumbnail_sizes():
+        return None
+    name = (page.thumbnails or {}).get(size)
+    if name and default_storage.exists(name):
+        return default_storage.path(name)
+
+    document = page.document
+    if not document.file:
+        return None
+    try:
+        generated = generate_thumbnails(document, page_numbers=[page.page_number]).get(page.page_number)
+    except Exception as e:
+        logger.warning(f"Could not generate thumbnail for page {page.pk}: {str(e)}")
+        return None
+    if not generated:
+        return None
+    page.thumbnails = generated
+    page.save(update_fields=['thumbnails'])
+    return default_storage.path(generated[size])
+
+
+def thumbnail_content_type(path):
+    return CONTENT_TYPES.get(os.path.splitext(path)[1].lstrip('.').lower(), 'application/octet-stream')
+
+
+def delete_document_thumbnails(document_id):
+    """Remove every thumbnail of a document"""
+    shutil.rmtree(os.path.join(settings.MEDIA_ROOT, THUMBNAIL_DIR, str(document_id)), ignore_errors=True)
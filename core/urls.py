@@ -14,4 +14,9 @@ urlpatterns = [
     
     # Page Preview URLs
     path('pages/<int:pk>/preview/', views.page_preview, name='page_preview'),
+    path('pages/<int:pk>/thumbnail/<str:size>/', views.page_thumbnail, name='page_thumbnail'),
+    
+    # Full-text search
+    path('search/', views.search, name='search'),
+    path('api/search/', views.search_api, name='search_api'),
 ]
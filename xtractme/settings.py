@@ -170,6 +170,9 @@ else:
 # Tesseract OCR Configuration
 # Set TESSERACT_CMD in .env file if Tesseract is not in PATH
 TESSERACT_CMD = os.getenv('TESSERACT_CMD', None)
+# Language data used for OCR. Install tesserocr to keep Tesseract loaded in each page
+# worker instead of starting a tesseract process for every page.
+TESSERACT_LANG = os.getenv('TESSERACT_LANG', 'eng')
 
 # LightOnOCR Configuration (Transformers)
 # Note: LightOnOCR support may require a newer/installed-from-source Transformers build.
@@ -181,6 +184,126 @@ LIGHTONOCR_PROMPT = os.getenv(
     'LIGHTONOCR_PROMPT',
     'Please extract and return all text visible in this image. Return only the text.',
 )
+# Pages of the same rendered size are generated together in batches of this many
+LIGHTONOCR_BATCH_SIZE = int(os.getenv('LIGHTONOCR_BATCH_SIZE', '4'))
+
+# TrOCR Configuration
+# 'lines' segments each page into text lines and recognises them in batches (with line
+# bounding boxes); 'page' passes the whole page to the model at once
+TROCR_MODE = os.getenv('TROCR_MODE', 'lines')
+TROCR_BATCH_SIZE = int(os.getenv('TROCR_BATCH_SIZE', '16'))
+
+# Donut Configuration
+# Pages decoded together per forward pass
+DONUT_BATCH_SIZE = int(os.getenv('DONUT_BATCH_SIZE', '4'))
+# Maximum decoded tokens per page; 0 uses the decoder's max_position_embeddings
+DONUT_MAX_LENGTH = int(os.getenv('DONUT_MAX_LENGTH', '0'))
+
+# Background Extraction Configuration
+# When True, saving a document queues an ExtractionJob that is processed by
+# `python manage.py run_extraction_workers`. Set to False to extract inline (development).
+EXTRACTION_ASYNC = os.getenv('EXTRACTION_ASYNC', 'True').lower() == 'true'
+EXTRACTION_JOB_MAX_ATTEMPTS = int(os.getenv('EXTRACTION_JOB_MAX_ATTEMPTS', '3'))
+# Running jobs whose worker has not reported progress (a written page batch) for this long
+# are assumed to belong to a dead worker and are requeued
+EXTRACTION_JOB_STALE_SECONDS = int(os.getenv('EXTRACTION_JOB_STALE_SECONDS', str(6 * 60 * 60)))
+EXTRACTION_WORKER_POLL_INTERVAL = float(os.getenv('EXTRACTION_WORKER_POLL_INTERVAL', '2.0'))
+
+# Page-parallel extraction: worker processes per engine for the PyMuPDF, Tesseract and
+# PaddleOCR page loops. 1 runs pages sequentially, 0 uses every CPU core. Each PaddleOCR
+# worker loads its own model, so size that pool to the available memory.
+EXTRACTION_PAGE_WORKERS = {
+    'pymupdf': int(os.getenv('EXTRACTION_PAGE_WORKERS_PYMUPDF', '1')),
+    'tesseract': int(os.getenv('EXTRACTION_PAGE_WORKERS_TESSERACT', '0')),
+    'paddleocr': int(os.getenv('EXTRACTION_PAGE_WORKERS_PADDLEOCR', '1')),
+}
+# Number of consecutive pages handed to a worker at a time
+EXTRACTION_PAGE_SHARD_SIZE = int(os.getenv('EXTRACTION_PAGE_SHARD_SIZE', '8'))
+# Extracted pages are buffered and upserted in batches of this many rows
+PAGE_WRITE_BATCH_SIZE = int(os.getenv('PAGE_WRITE_BATCH_SIZE', '100'))
+# Copy each written page's layout blocks into the Block table (see core/blocks.py) so
+# tables, headings and bboxes can be queried in the database
+BLOCK_INDEX_ENABLED = os.getenv('BLOCK_INDEX_ENABLED', 'True').lower() == 'true'
+BLOCK_WRITE_BATCH_SIZE = int(os.getenv('BLOCK_WRITE_BATCH_SIZE', '1000'))
+
+# Full-text page search (see core/search.py): 'auto' uses SQLite FTS5 or PostgreSQL
+# tsvector indexes, 'like' forces unindexed LIKE queries
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
+SEARCH_RESULTS_PER_PAGE = int(os.getenv('SEARCH_RESULTS_PER_PAGE', '20'))
+# Approximate length of result snippets in words
+SEARCH_SNIPPET_WORDS = int(os.getenv('SEARCH_SNIPPET_WORDS', '24'))
+# MinerU documents are parsed together in one do_parse call, up to this many pages and
+# documents per batch (MINERU_BATCH_MAX_PAGES=0 parses each document on its own)
+MINERU_BATCH_MAX_PAGES = int(os.getenv('MINERU_BATCH_MAX_PAGES', '200'))
+MINERU_BATCH_MAX_DOCUMENTS = int(os.getenv('MINERU_BATCH_MAX_DOCUMENTS', '16'))
+# PDFs longer than MINERU_WINDOW_PAGES are parsed in windows of that many pages, up to
+# MINERU_WINDOW_WORKERS windows at once (0 disables windowing). Finished windows are
+# checkpointed so a failed window can be retried on its own.
+MINERU_WINDOW_PAGES = int(os.getenv('MINERU_WINDOW_PAGES', '100'))
+MINERU_WINDOW_WORKERS = int(os.getenv('MINERU_WINDOW_WORKERS', '1'))
+MINERU_CHECKPOINT_DIR = os.getenv('MINERU_CHECKPOINT_DIR', str(BASE_DIR / 'cache' / 'mineru_windows'))
+
+# OLMOCR runs in one resident worker process (`python manage.py run_olmocr_worker`) that
+# keeps the model loaded. Extraction processes send it file paths over this address and
+# start it on first use when OLMOCR_WORKER_AUTOSTART is True.
+OLMOCR_WORKER_ADDRESS = os.getenv('OLMOCR_WORKER_ADDRESS', '127.0.0.1:8765')
+OLMOCR_WORKER_AUTOSTART = os.getenv('OLMOCR_WORKER_AUTOSTART', 'True').lower() == 'true'
+# Seconds to wait for the worker to load its model, and per file for a reply
+OLMOCR_WORKER_START_TIMEOUT = int(os.getenv('OLMOCR_WORKER_START_TIMEOUT', '600'))
+OLMOCR_WORKER_TIMEOUT = int(os.getenv('OLMOCR_WORKER_TIMEOUT', '600'))
+OLMOCR_MODEL_ID = os.getenv('OLMOCR_MODEL_ID', 'allenai/olmOCR-2-7B-1025')
+OLMOCR_PROCESSOR_ID = os.getenv('OLMOCR_PROCESSOR_ID', 'Qwen/Qwen2.5-VL-7B-Instruct')
+# Pages are rendered with their longest side at this many pixels
+OLMOCR_TARGET_LONGEST_DIM = int(os.getenv('OLMOCR_TARGET_LONGEST_DIM', '1288'))
+OLMOCR_MAX_NEW_TOKENS = int(os.getenv('OLMOCR_MAX_NEW_TOKENS', '3000'))
+
+# Remote OCR services (DeepSeek OCR API / Ollama, OLMOCR API) share one keep-alive HTTP client.
+# Up to REMOTE_OCR_CONCURRENCY pages of a document are sent at once, with at most
+# REMOTE_OCR_MAX_CONNECTIONS_PER_HOST requests in flight per host from each process.
+REMOTE_OCR_CONCURRENCY = int(os.getenv('REMOTE_OCR_CONCURRENCY', '8'))
+REMOTE_OCR_MAX_CONNECTIONS_PER_HOST = int(os.getenv('REMOTE_OCR_MAX_CONNECTIONS_PER_HOST', '8'))
+REMOTE_OCR_CONNECT_TIMEOUT = float(os.getenv('REMOTE_OCR_CONNECT_TIMEOUT', '5'))
+REMOTE_OCR_READ_TIMEOUT = float(os.getenv('REMOTE_OCR_READ_TIMEOUT', '120'))
+# Connection errors, timeouts and 429/5xx answers are retried with jittered exponential backoff
+REMOTE_OCR_MAX_RETRIES = int(os.getenv('REMOTE_OCR_MAX_RETRIES', '3'))
+REMOTE_OCR_BACKOFF = float(os.getenv('REMOTE_OCR_BACKOFF', '0.5'))
+
+# Extraction cache: results are stored on disk keyed by file hash, OCR engine and engine
+# settings, so re-uploaded or reprocessed files are restored without running OCR again
+EXTRACTION_CACHE_ENABLED = os.getenv('EXTRACTION_CACHE_ENABLED', 'True').lower() == 'true'
+EXTRACTION_CACHE_DIR = os.getenv('EXTRACTION_CACHE_DIR', str(BASE_DIR / 'cache' / 'extraction'))
+# Least recently used entries are evicted once the cache grows past this size
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv('EXTRACTION_CACHE_MAX_MB', '2048')) * 1024 * 1024
+# Page OCR memo: LightOnOCR, DeepSeek and OLMOCR results per rendered page image, so
+# identical pages (cover sheets, disclosures) across documents are only OCRed once
+PAGE_OCR_CACHE_ENABLED = os.getenv('PAGE_OCR_CACHE_ENABLED', 'True').lower() == 'true'
+PAGE_OCR_CACHE_DIR = os.getenv('PAGE_OCR_CACHE_DIR', str(BASE_DIR / 'cache' / 'page_ocr'))
+PAGE_OCR_CACHE_MAX_BYTES = int(os.getenv('PAGE_OCR_CACHE_MAX_MB', '1024')) * 1024 * 1024
+# Render cache: raw page pixmaps keyed by file hash, page, scale and colorspace, shared by
+# previews, the admin and OCR engines so each page is only rasterized once per scale
+RENDER_CACHE_ENABLED = os.getenv('RENDER_CACHE_ENABLED', 'True').lower() == 'true'
+RENDER_CACHE_DIR = os.getenv('RENDER_CACHE_DIR', str(BASE_DIR / 'cache' / 'render'))
+RENDER_CACHE_MAX_BYTES = int(os.getenv('RENDER_CACHE_MAX_MB', '2048')) * 1024 * 1024
+# Page thumbnails are written during extraction at these widths (pixels) and served by
+# /pages/<id>/thumbnail/<size>/ with ETag/Last-Modified headers
+THUMBNAILS_ENABLED = os.getenv('THUMBNAILS_ENABLED', 'True').lower() == 'true'
+THUMBNAIL_SIZES = {
+    'small': int(os.getenv('THUMBNAIL_SMALL_WIDTH', '240')),
+    'large': int(os.getenv('THUMBNAIL_LARGE_WIDTH', '1200')),
+}
+THUMBNAIL_FORMAT = os.getenv('THUMBNAIL_FORMAT', 'webp')  # webp or png
+THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', '80'))
+THUMBNAIL_CACHE_MAX_AGE = int(os.getenv('THUMBNAIL_CACHE_MAX_AGE', '3600'))
+
+# Local OCR models (PaddleOCR, TrOCR, Donut, LightOnOCR) are unloaded, least recently used
+# first, when loading another model exceeds these budgets. 0 disables a budget.
+MODEL_MEMORY_BUDGET_MB = int(os.getenv('MODEL_MEMORY_BUDGET_MB', '0'))
+MODEL_GPU_MEMORY_BUDGET_MB = int(os.getenv('MODEL_GPU_MEMORY_BUDGET_MB', '0'))
+# Expected (RAM MB, VRAM MB) of a model before its first load in a worker, so room is
+# made for it in advance, e.g. {'lightonocr': (500, 2200)}. Later loads use the measured size.
+MODEL_FOOTPRINT_ESTIMATES_MB = {}
+# Unload models that have not been used for this many seconds (0 keeps them loaded)
+MODEL_IDLE_TIMEOUT = int(os.getenv('MODEL_IDLE_TIMEOUT', '900'))
 
 # Logging Configuration
 LOGGING = {
@@ -282,6 +405,11 @@ UNFOLD = {
                         "icon": "insert_drive_file",
                         "link": reverse_lazy("admin:core_page_changelist"),
                     },
+                    {
+                        "title": _("Extraction Jobs"),
+                        "icon": "pending_actions",
+                        "link": reverse_lazy("admin:core_extractionjob_changelist"),
+                    },
                     {
                         "title": _("Prompts"),
                         "icon": "psychology",